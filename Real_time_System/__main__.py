@@ -0,0 +1,109 @@
+"""
+Điểm vào chung của hệ thống: python -m Real_time_System <lệnh> [tham số của lệnh]
+
+Mỗi lệnh chỉ import module của nó khi được gọi, nên `--help` và các lệnh nhẹ
+không phải trả chi phí import pandas/FiinQuantX của các lệnh khác.
+"""
+import argparse
+import importlib
+import os
+import re
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Lệnh -> (module, mô tả, ngân sách thời gian import nguội tính bằng ms)
+COMMANDS = {
+    'run': ('main', 'Chạy luồng cảnh báo real-time', 300),
+    'backtest': ('backtest', 'Backtest chiến lược trên dữ liệu lịch sử', 1500),
+    'brain': ('ml_brain', "Chạy 'Bộ não ML' cập nhật ngưỡng chiến lược", 1500),
+    'replay': ('replay', 'Phát lại tick từ file log hoặc kho tick qua bộ phát hiện tín hiệu', 300),
+    'schedule': ('scheduler', "Chạy lịch tự động cho 'Bộ não ML'", 1500),
+    'profile': ('profiler_control', 'Chụp profile của tiến trình stream đang chạy', 300),
+}
+
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _measure_import(module: str):
+    """
+    Import module trong một tiến trình Python mới với `-X importtime`.
+
+    Returns:
+        tuple: (tổng thời gian ms, danh sách (ms, package) import trực tiếp nặng nhất),
+               hoặc chuỗi mô tả lỗi nếu import thất bại.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PACKAGE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'lỗi không xác định'
+        return last_line
+
+    total_ms = 0.0
+    direct = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if not match:
+            continue
+        # Mỗi cấp lồng nhau thụt thêm 2 khoảng trắng: 1 = cấp cao nhất, 3 = import trực tiếp
+        depth = len(match.group(3))
+        cumulative_ms = int(match.group(2)) / 1000.0
+        if depth == 1:
+            total_ms += cumulative_ms
+        elif depth == 3:
+            direct.append((cumulative_ms, match.group(4)))
+    return total_ms, sorted(direct, reverse=True)
+
+
+def print_import_report():
+    """In thời gian import nguội của từng lệnh so với ngân sách."""
+    width = max(len(module) for module, *_ in COMMANDS.values())
+    print(f"{'Lệnh':<10} {'Module':<{width}} {'Import (ms)':>12} {'Ngân sách':>10}  Trạng thái  Nặng nhất")
+    for command, (module, _, budget_ms) in COMMANDS.items():
+        result = _measure_import(module)
+        if isinstance(result, str):
+            print(f"{command:<10} {module:<{width}} {'-':>12} {budget_ms:>10}  LỖI        {result}")
+            continue
+        total_ms, heaviest = result
+        status = 'OK' if total_ms <= budget_ms else 'VƯỢT'
+        top = ', '.join(f"{name} {ms:.0f}" for ms, name in heaviest[:3])
+        print(f"{command:<10} {module:<{width}} {total_ms:>12.1f} {budget_ms:>10}  {status:<10} {top}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m Real_time_System',
+        description='Hệ thống cảnh báo tín hiệu giao dịch.',
+        epilog='Dùng "<lệnh> --help" để xem tham số của từng lệnh.',
+    )
+    parser.add_argument('--import-report', action='store_true', help='In thời gian import nguội của từng lệnh rồi thoát')
+    parser.add_argument('command', nargs='?', choices=list(COMMANDS), help=' | '.join(
+        f"{name}: {desc}" for name, (_, desc, _) in COMMANDS.items()
+    ))
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.import_report:
+        print_import_report()
+        return
+    if not args.command:
+        parser.print_help()
+        return
+
+    # Các module dùng import phẳng (import config, ...) nên cần thư mục gói trong sys.path
+    if PACKAGE_DIR not in sys.path:
+        sys.path.insert(0, PACKAGE_DIR)
+
+    module_name = COMMANDS[args.command][0]
+    sys.argv[0] = f'python -m Real_time_System {args.command}'
+    module = importlib.import_module(module_name)
+    module.main(args.args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,16 @@
 import streamlit as st
+import altair as alt
 import pandas as pd
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-from config import CSV_FILE
+from contextlib import closing
+from config import SIGNAL_DB_FILE
+from signal_store import COLUMNS, distinct_values, open_reader, query_signals, summarize_signals
+from chart_data import INTRADAY_RESOLUTIONS, build_chart_series, chart_tickers, load_daily_bars, load_intraday_bars
+from downsample import DEFAULT_MAX_POINTS
+from live_snapshot import read_snapshot
+from rules import ACTIVE_GROUPS
 
 # --- Cấu hình trang ---
 st.set_page_config(
@@ -71,28 +78,53 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Hàm tải và cache dữ liệu ---
-@st.cache_data(ttl=60)
-def load_data():
-    if not os.path.exists(CSV_FILE) or os.path.getsize(CSV_FILE) == 0:
-        return pd.DataFrame(columns=['timestamp', 'ticker', 'signal', 'price', 'details'])
+# Mọi bộ lọc được chuyển thành truy vấn SQL có chỉ mục trên kho SQLite (signal_store.py),
+# mỗi lần truy vấn mở một kết nối chỉ đọc riêng nên không chặn tiến trình ghi.
+PAGE_SIZE = 200
+
+def _query(fn, default, *args, **kwargs):
+    conn = open_reader(SIGNAL_DB_FILE)
+    if conn is None:
+        return default
     try:
-        # Đọc CSV, bỏ qua các dòng comment bắt đầu bằng '#' và chỉ định rõ tên cột
-        df = pd.read_csv(
-            CSV_FILE, 
-            comment='#',
-            names=['timestamp', 'ticker', 'signal', 'price', 'details'],
-            header=None
-        )
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-        
-        df.dropna(subset=['timestamp'], inplace=True)
-        
-        df = df.sort_values(by='timestamp', ascending=False)
-        return df
+        with closing(conn):
+            return fn(conn, *args, **kwargs)
     except Exception as e:
         st.error(f"Lỗi khi tải dữ liệu: {e}")
-        return pd.DataFrame(columns=['timestamp', 'ticker', 'signal', 'price', 'details'])
+        return default
+
+@st.cache_data(ttl=60)
+def load_filter_options(start, end):
+    """Danh sách mã và loại tín hiệu xuất hiện trong khoảng thời gian."""
+    return (
+        _query(distinct_values, [], 'ticker', start, end),
+        _query(distinct_values, [], 'signal', start, end),
+    )
+
+@st.cache_data(ttl=60)
+def load_summary(start, end, tickers, signals):
+    empty = {'total': 0, 'num_tickers': 0, 'latest': None, 'counts': {}}
+    return _query(summarize_signals, empty, start, end, tickers, signals)
+
+@st.cache_data(ttl=60)
+def load_signals(start, end, tickers, signals, limit=None, offset=0):
+    return _query(query_signals, pd.DataFrame(columns=COLUMNS), start, end, tickers, signals, limit, offset)
+
+@st.cache_data(ttl=300)
+def load_chart_tickers():
+    """Watchlist cộng các mã có dữ liệu đã lưu (không phụ thuộc việc mã đã có tín hiệu hay chưa)."""
+    return chart_tickers()
+
+@st.cache_data(ttl=300)
+def load_chart_series(ticker, source, start, end, resolution, max_points=DEFAULT_MAX_POINTS):
+    """Nến + chỉ báo đã giảm mẫu cho biểu đồ, cache theo (mã, khoảng thời gian, khung nến)."""
+    if source == 'intraday':
+        bars = load_intraday_bars(ticker, start, end, resolution)
+    else:
+        bars = load_daily_bars(ticker)
+    if bars is None or bars.empty:
+        return None
+    return build_chart_series(bars, start, end, max_points)
 
 def load_system_status():
     """Đọc file trạng thái hệ thống và trả về dictionary."""
@@ -143,30 +175,25 @@ with st.sidebar:
     st.markdown("---")
 
 
-    df = load_data()
-    
     # Thêm tùy chọn lọc theo ngày
     show_today_only = st.checkbox(" Chỉ hiển thị tín hiệu hôm nay", value=True)
 
-    df_to_filter = df
+    filter_start, filter_end = None, None
     if show_today_only:
-        # Chỉ lọc nếu dataframe không rỗng
-        if not df.empty:
-            today = datetime.now().date()
-            df_to_filter = df[df['timestamp'].dt.date == today]
-        else:
-            df_to_filter = df # Giữ nguyên dataframe rỗng
+        today = datetime.now().date()
+        filter_start, filter_end = str(today), str(today + timedelta(days=1))
 
-    # Lọc theo mã cổ phiếu
-    all_tickers = sorted(df_to_filter['ticker'].unique())
+    all_tickers, all_signals = load_filter_options(filter_start, filter_end)
     # Mặc định luôn chọn tất cả các mã
     selected_tickers = st.multiselect("Mã Cổ phiếu", all_tickers, default=all_tickers)
-    all_signals = sorted(df_to_filter['signal'].unique())
     # Mặc định luôn chọn tất cả các loại tín hiệu
     selected_signals = st.multiselect("Loại Tín hiệu", all_signals, default=all_signals)
 
 
-df_filtered = df_to_filter[df_to_filter['ticker'].isin(selected_tickers) & df_to_filter['signal'].isin(selected_signals)]
+# Chọn tất cả thì không cần điều kiện IN, truy vấn chỉ dùng chỉ mục timestamp
+filter_tickers = None if set(selected_tickers) == set(all_tickers) else tuple(selected_tickers)
+filter_signals = None if set(selected_signals) == set(all_signals) else tuple(selected_signals)
+summary = load_summary(filter_start, filter_end, filter_tickers, filter_signals)
 
 
 st.title("⚡ Dashboard Tín Hiệu Giao Dịch Real-time")
@@ -178,9 +205,9 @@ st.markdown(f'<meta http-equiv="refresh" content="60">', unsafe_allow_html=True)
 st.markdown("### Tổng quan")
 col1, col2, col3 = st.columns(3)
 
-total_signals = len(df_filtered)
-unique_tickers = df_filtered['ticker'].nunique()
-latest_signal_time = df_filtered['timestamp'].max().strftime('%H:%M:%S') if total_signals > 0 else "N/A"
+total_signals = summary['total']
+unique_tickers = summary['num_tickers']
+latest_signal_time = pd.Timestamp(summary['latest']).strftime('%H:%M:%S') if total_signals > 0 else "N/A"
 
 
 METRIC_CARD_STYLE = """
@@ -221,12 +248,125 @@ col1_chart, col2_chart = st.columns(2)
 
 with col1_chart:
     st.subheader("Phân bổ Tín hiệu")
-    signal_counts = df_filtered['signal'].value_counts()
+    signal_counts = pd.Series(summary['counts'], dtype='int64').sort_values(ascending=False)
     st.bar_chart(signal_counts)
 
     st.markdown("---")
     
     # --- Bảng lịch sử tín hiệu ---
     st.subheader("Lịch sử Tín hiệu")
-    styled_df = df_filtered.style.applymap(color_signal, subset=['signal'])
+    num_pages = max(1, -(-total_signals // PAGE_SIZE))
+    page = st.number_input(f"Trang (1-{num_pages})", min_value=1, max_value=num_pages, value=1, step=1)
+    df_page = load_signals(filter_start, filter_end, filter_tickers, filter_signals, PAGE_SIZE, (page - 1) * PAGE_SIZE)
+    styled_df = df_page.style.applymap(color_signal, subset=['signal'])
     st.dataframe(styled_df, use_container_width=True, height=500)
+
+    # Xuất CSV toàn bộ tín hiệu khớp bộ lọc (không phân trang): chỉ truy vấn khi người dùng bấm nút,
+    # không chạy lại ở mỗi lần trang tự làm mới
+    export_key = (filter_start, filter_end, filter_tickers, filter_signals)
+    if st.button("Chuẩn bị CSV"):
+        export_df = _query(query_signals, pd.DataFrame(columns=COLUMNS), *export_key)
+        st.session_state['signals_csv'] = (export_key, export_df.to_csv(index=False).encode('utf-8'))
+    prepared = st.session_state.get('signals_csv')
+    if prepared is not None and prepared[0] == export_key:
+        st.download_button("Tải CSV", data=prepared[1], file_name='signals.csv', mime='text/csv')
+
+
+# --- Bản đồ nhiệt thị trường (ảnh chụp trực tiếp từ bộ nhớ dùng chung của main.py) ---
+st.markdown("---")
+st.markdown("### Bản đồ nhiệt Thị trường")
+snapshot = read_snapshot()
+if snapshot is None or snapshot.empty:
+    st.info("Chưa có ảnh chụp trực tiếp: tiến trình stream (main.py) chưa chạy hoặc chưa đủ dữ liệu.")
+else:
+    HEATMAP_COLUMNS = 10
+    heat_options = {
+        "RSI": ('rsi', [0, 50, 100]),
+        "ADX": ('adx', [0, 25, 50]),
+        "Xu hướng (SMA ngắn / SMA dài - 1)": ('trend', [-0.05, 0, 0.05]),
+    }
+    heat_label = st.radio("Tô màu theo", list(heat_options), horizontal=True)
+    heat_field, heat_domain = heat_options[heat_label]
+
+    snapshot['trend'] = snapshot['sma_short'] / snapshot['sma_long'] - 1.0
+    flag_columns = [f'flag_{g}' for g in ACTIVE_GROUPS]
+    snapshot['active_flags'] = [
+        ', '.join(g for g, on in zip(ACTIVE_GROUPS, flags) if on) for flags in snapshot[flag_columns].to_numpy()
+    ]
+    snapshot['col'] = snapshot.index % HEATMAP_COLUMNS
+    snapshot['row'] = snapshot.index // HEATMAP_COLUMNS
+    snapshot['label'] = snapshot['ticker'] + '\n' + snapshot[heat_field].round(2).astype(str)
+
+    tiles = alt.Chart(snapshot).encode(
+        x=alt.X('col:O', axis=None),
+        y=alt.Y('row:O', axis=None),
+    )
+    heatmap = tiles.mark_rect(stroke='white', strokeWidth=2).encode(
+        color=alt.Color(
+            f'{heat_field}:Q',
+            title=heat_label,
+            scale=alt.Scale(domain=heat_domain, range=['#2e7d32', '#f5f5f5', '#c62828'], clamp=True),
+        ),
+        tooltip=['ticker:N', 'price:Q', 'rsi:Q', 'adx:Q', 'macd:Q', 'stoch_k:Q', 'active_flags:N', 'signal:N', 'age_s:Q'],
+    ) + tiles.mark_text(fontSize=12, lineBreak='\n', color='black').encode(text='label:N')
+    st.altair_chart(heatmap.properties(height=60 * (snapshot['row'].max() + 1)), use_container_width=True)
+    st.caption(
+        f"{len(snapshot)} mã, cập nhật gần nhất {snapshot['updated'].max():%H:%M:%S}; "
+        f"di chuột lên ô để xem chỉ báo và các nhóm điều kiện đang thỏa."
+    )
+
+# --- Biểu đồ giá & chỉ báo ---
+st.markdown("---")
+st.markdown("### Biểu đồ Giá & Chỉ báo")
+chart_ticker_options = load_chart_tickers()
+if not chart_ticker_options:
+    st.info("Chưa có mã nào trong watchlist, cache lịch sử hay kho tick để vẽ biểu đồ.")
+else:
+    col_ticker, col_source, col_range, col_resolution = st.columns(4)
+    chart_ticker = col_ticker.selectbox("Mã", chart_ticker_options)
+    source_label = col_source.radio("Nguồn dữ liệu", ["Ngày (EOD)", "Trong ngày (tick)"], horizontal=True)
+    chart_source = 'intraday' if source_label.startswith("Trong ngày") else 'daily'
+    today = datetime.now().date()
+    default_start = today - timedelta(days=7 if chart_source == 'intraday' else 365)
+    chart_range = col_range.date_input("Khoảng thời gian", (default_start, today))
+    if chart_source == 'intraday':
+        chart_resolution = col_resolution.selectbox("Khung nến", list(INTRADAY_RESOLUTIONS))
+    else:
+        chart_resolution = '1d'
+        col_resolution.markdown("**Khung nến:** 1 ngày")
+
+    if not isinstance(chart_range, (list, tuple)) or len(chart_range) != 2:
+        st.info("Chọn đủ ngày bắt đầu và ngày kết thúc.")
+    else:
+        chart_start, chart_end = chart_range
+        series = load_chart_series(chart_ticker, chart_source, chart_start, chart_end, chart_resolution)
+        if series is None or series['price'].empty:
+            st.warning(f"Không có dữ liệu nến đã lưu cho {chart_ticker} trong khoảng đã chọn.")
+        else:
+            markers = load_signals(str(chart_start), str(chart_end + timedelta(days=1)), (chart_ticker,), None)
+            x_axis = alt.X('timestamp:T', title=None)
+            price_chart = alt.Chart(series['price']).mark_line().encode(
+                x=x_axis,
+                y=alt.Y('value:Q', title='Giá', scale=alt.Scale(zero=False)),
+                color=alt.Color('series:N', title=None),
+            )
+            if not markers.empty:
+                price_chart = price_chart + alt.Chart(markers).mark_point(filled=True, size=90).encode(
+                    x='timestamp:T',
+                    y='price:Q',
+                    shape=alt.Shape('signal:N', title='Tín hiệu'),
+                    tooltip=['timestamp:T', 'signal:N', 'price:Q', 'details:N'],
+                )
+            rsi_chart = alt.Chart(series['rsi']).mark_line(color='#7b1fa2').encode(
+                x=x_axis, y=alt.Y('value:Q', title='RSI', scale=alt.Scale(domain=[0, 100]))
+            ) + alt.Chart(pd.DataFrame({'level': [30, 70]})).mark_rule(strokeDash=[4, 4], color='gray').encode(y='level:Q')
+            macd_lines = series['macd'][series['macd']['series'] != 'Histogram']
+            macd_hist = series['macd'][series['macd']['series'] == 'Histogram']
+            macd_chart = alt.Chart(macd_hist).mark_bar(opacity=0.4, color='gray').encode(
+                x=x_axis, y=alt.Y('value:Q', title='MACD')
+            ) + alt.Chart(macd_lines).mark_line().encode(x=x_axis, y='value:Q', color=alt.Color('series:N', title=None))
+
+            st.altair_chart(price_chart.properties(height=320).interactive(bind_y=False), use_container_width=True)
+            st.altair_chart(rsi_chart.properties(height=150), use_container_width=True)
+            st.altair_chart(macd_chart.properties(height=150), use_container_width=True)
+            st.caption(f"Đã giảm mẫu (LTTB) còn tối đa {DEFAULT_MAX_POINTS} điểm mỗi chuỗi.")
@@ -4,14 +4,14 @@ import os
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 from historical_data_fetcher import fetch_historical_data
+from indicators import append_strategy_indicators, atr, strategy_columns
 from ml_brain import DYNAMIC_THRESHOLDS, ATR_AVG_PERIOD, ATR_PERIOD
+from rules import STRATEGY_INDICATORS, THRESHOLD_NAMES, compile_vector_evaluator, rule_labels
 import logging
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("requests").setLevel(logging.WARNING)
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'strategy_config.json')
 MARKET_PROXY_TICKER = 'VNINDEX' # Sử dụng VNINDEX làm đại diện cho trạng thái thị trường
@@ -23,8 +23,8 @@ def get_historical_market_state(market_df: pd.DataFrame) -> pd.Series:
     cho mỗi ngày trong DataFrame đầu vào.
     """
     df = market_df.copy()
-    df.ta.atr(length=ATR_PERIOD, append=True)
     atr_col = f'ATRr_{ATR_PERIOD}'
+    df[atr_col] = atr(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), ATR_PERIOD)
     atr_avg_col = f'ATR_AVG_{ATR_AVG_PERIOD}'
 
     df[atr_avg_col] = df[atr_col].rolling(window=ATR_AVG_PERIOD).mean()
@@ -44,25 +44,8 @@ def load_strategy_config() -> Dict:
 def compute_indicators(price_df: pd.DataFrame, strategy_config: Dict) -> pd.DataFrame:
     df = price_df.copy()
 
-    # Indicators mirroring real-time rules
-    df.ta.rsi(length=strategy_config['RSI_PERIOD'], append=True)
-    df.ta.macd(
-        fast=strategy_config['MACD_FAST'],
-        slow=strategy_config['MACD_SLOW'],
-        signal=strategy_config['MACD_SIGNAL'],
-        append=True,
-    )
-    df.ta.sma(length=strategy_config['SMA_SHORT_PERIOD'], append=True)
-    df.ta.sma(length=strategy_config['SMA_LONG_PERIOD'], append=True)
-    df.ta.stoch(
-        k=strategy_config['STOCH_K'],
-        d=strategy_config['STOCH_D'],
-        smooth_k=strategy_config['STOCH_SMOOTH'],
-        append=True,
-    )
-    df.ta.adx(length=strategy_config['ADX_PERIOD'], append=True)
-
-    return df
+    # Indicators mirroring real-time rules (only those the rule spec references)
+    return append_strategy_indicators(df, strategy_config, names=STRATEGY_INDICATORS)
 
 
 def generate_signals(
@@ -72,177 +55,130 @@ def generate_signals(
 
     # Hợp nhất trạng thái thị trường vào dataframe chính để dễ dàng truy cập
     df = df.join(market_states, how='left')
-    df['market_state'].fillna(method='ffill', inplace=True)
+    df['market_state'] = df['market_state'].ffill()
     # Nếu vẫn còn NaN ở đầu, điền bằng trạng thái mặc định
-    df['market_state'].fillna('LOW_VOLATILITY', inplace=True)
-
-    rsi_col = f"RSI_{strategy_config['RSI_PERIOD']}"
-    macd_line = f"MACD_{strategy_config['MACD_FAST']}_{strategy_config['MACD_SLOW']}_{strategy_config['MACD_SIGNAL']}"
-    macd_signal = f"MACDs_{strategy_config['MACD_FAST']}_{strategy_config['MACD_SLOW']}_{strategy_config['MACD_SIGNAL']}"
-    sma20 = f"SMA_{strategy_config['SMA_SHORT_PERIOD']}"
-    sma50 = f"SMA_{strategy_config['SMA_LONG_PERIOD']}"
-    stoch_k = f"STOCHk_{strategy_config['STOCH_K']}_{strategy_config['STOCH_D']}_{strategy_config['STOCH_SMOOTH']}"
-    stoch_d = f"STOCHd_{strategy_config['STOCH_K']}_{strategy_config['STOCH_D']}_{strategy_config['STOCH_SMOOTH']}"
-    adx = f"ADX_{strategy_config['ADX_PERIOD']}"
-
-    df['signal'] = None
-    df['signal_reason'] = None
-
-    # need previous row for cross checks
-    for i in range(1, len(df)):
-        last = df.iloc[i]
-        prev = df.iloc[i - 1]
-
-        # Lấy ngưỡng động cho ngày hiện tại
-        current_market_state = last['market_state']
-        dynamic_params = DYNAMIC_THRESHOLDS.get(current_market_state, DYNAMIC_THRESHOLDS['LOW_VOLATILITY'])
-        
-        rsi_oversold = dynamic_params['RSI_OVERSOLD']
-        rsi_overbought = dynamic_params['RSI_OVERBOUGHT']
-        adx_threshold = dynamic_params['ADX_THRESHOLD']
-
-        # Skip until indicators are available
-        if (
-            pd.isna(last.get(rsi_col))
-            or pd.isna(last.get(macd_line))
-            or pd.isna(last.get(macd_signal))
-            or pd.isna(last.get(sma20))
-            or pd.isna(last.get(sma50))
-            or pd.isna(last.get(stoch_k))
-            or pd.isna(last.get(stoch_d))
-            or pd.isna(last.get(adx))
-        ):
-            continue
-
-        # Momentum conditions
-        is_momentum_buy = (last[rsi_col] < rsi_oversold) or (
-            (last[stoch_k] > last[stoch_d])
-            and (prev[stoch_k] <= prev[stoch_d])
-            and (last[stoch_k] < 20)
-        )
-        is_momentum_sell = (last[rsi_col] > rsi_overbought) or (
-            (last[stoch_k] < last[stoch_d])
-            and (prev[stoch_k] >= prev[stoch_d])
-            and (last[stoch_k] > 80)
-        )
+    df['market_state'] = df['market_state'].fillna('LOW_VOLATILITY')
 
-        # Trend conditions
-        is_trend_buy = (
-            (last[macd_line] > last[macd_signal] and prev[macd_line] <= prev[macd_signal])
-            or (last['close'] > last[sma20] and prev['close'] <= prev[sma20])
-            or (last['close'] > last[sma50] and prev['close'] <= prev[sma50])
-        )
-        is_trend_sell = (
-            (last[macd_line] < last[macd_signal] and prev[macd_line] >= prev[macd_signal])
-            or (last['close'] < last[sma20] and prev['close'] >= prev[sma20])
-            or (last['close'] < last[sma50] and prev['close'] >= prev[sma50])
-        )
+    # Ngưỡng động theo trạng thái thị trường của từng ngày
+    thresholds = thresholds_for_states(df['market_state'].to_numpy())
 
-        # Risk conditions (informational)
-        is_trend_still_strong_up = (
-            (last[macd_line] > 0)
-            and (last['close'] > last[sma20])
-            and (last['close'] > last[sma50])
-            and (last[adx] > adx_threshold)
-        )
-        is_trend_still_strong_down = (
-            (last[macd_line] < 0)
-            and (last['close'] < last[sma20])
-            and (last['close'] < last[sma50])
-            and (last[adx] > adx_threshold)
-        )
+    # Same rule spec as the live detector, evaluated over the whole series at once
+    evaluate, _ = compile_vector_evaluator(strategy_config)
+    values = {col: df[col].to_numpy(dtype=np.float64) for col in _rule_columns(strategy_config)}
+    rule_index = evaluate(values, thresholds)
+
+    signals, reasons = rule_labels()
+    signal_lookup = np.array([None] + signals, dtype=object)
+    reason_lookup = np.array([None] + reasons, dtype=object)
+    df['signal'] = signal_lookup[rule_index + 1]
+    df['signal_reason'] = reason_lookup[rule_index + 1]
+    return df
 
-        # Signals
-        if is_momentum_buy and is_trend_buy:
-            df.iat[i, df.columns.get_loc('signal')] = 'Mua mới'
-            df.iat[i, df.columns.get_loc('signal_reason')] = 'Momentum và Trend xác nhận mua'
-            continue
 
-        if is_momentum_sell and is_trend_sell:
-            df.iat[i, df.columns.get_loc('signal')] = 'Bán chốt lời'
-            df.iat[i, df.columns.get_loc('signal_reason')] = 'Momentum và Trend xác nhận bán'
-            continue
+def thresholds_for_states(states: np.ndarray) -> Dict[str, np.ndarray]:
+    """Map each bar's market state to its DYNAMIC_THRESHOLDS values (one array per threshold)."""
+    default_params = DYNAMIC_THRESHOLDS['LOW_VOLATILITY']
+    return {
+        name: np.array([DYNAMIC_THRESHOLDS.get(s, default_params)[name] for s in states], dtype=np.float64)
+        for name in THRESHOLD_NAMES
+    }
 
-        if (last[rsi_col] > rsi_overbought) and is_trend_still_strong_up:
-            df.iat[i, df.columns.get_loc('signal')] = 'Cảnh báo rủi ro (dễ điều chỉnh)'
-            df.iat[i, df.columns.get_loc('signal_reason')] = 'RSI quá mua nhưng xu hướng vẫn mạnh'
-            continue
 
-        if (last[rsi_col] < rsi_oversold) and is_trend_still_strong_down:
-            df.iat[i, df.columns.get_loc('signal')] = 'Cảnh báo rủi ro (bắt đáy nguy hiểm)'
-            df.iat[i, df.columns.get_loc('signal_reason')] = 'RSI quá bán nhưng xu hướng giảm vẫn mạnh'
-            continue
+def _rule_columns(strategy_config: Dict) -> set:
+    cols = strategy_columns(strategy_config)
+    return {cols[name] for name in STRATEGY_INDICATORS} | {'close'}
 
-    return df
+
+class TradeSimulator:
+    """
+    Long-only simulation fed chunk by chunk: signals on bar i are executed at the open of bar i+1.
+    The last bar of each chunk is held back until the next chunk (or finish) supplies its next open,
+    so chunked and single-pass runs produce identical trades and equity.
+    """
+
+    def __init__(self, fee_bps_per_side: float = 5.0):
+        self.fee_per_side = fee_bps_per_side / 10000.0
+        self.equity = 1.0
+        self.in_position = False
+        self.entry_price: Optional[float] = None
+        self.entry_time: Optional[pd.Timestamp] = None
+        self.returns: List[float] = []
+        self._pending = None  # (timestamp, open, signal) of the last bar seen
+
+    def feed(self, index, opens, signals) -> Tuple[List[Dict], List[Tuple[pd.Timestamp, float]]]:
+        """Process one chunk; returns the trades closed and the equity points produced by it."""
+        trades: List[Dict] = []
+        equity_curve: List[Tuple[pd.Timestamp, float]] = []
+        rows = list(zip(index, opens, signals))
+        if self._pending is not None:
+            rows.insert(0, self._pending)
+        if not rows:
+            return trades, equity_curve
+
+        for i in range(len(rows) - 1):
+            ts, _, sig = rows[i]
+            next_time, next_open, _ = rows[i + 1]
+
+            # carry equity forward
+            equity_curve.append((ts, self.equity))
+
+            if pd.isna(next_open):
+                continue
+
+            if (sig == 'Mua mới') and (not self.in_position):
+                self.in_position = True
+                self.entry_price = float(next_open) * (1.0 + self.fee_per_side)
+                self.entry_time = next_time
+                continue
+
+            if (sig == 'Bán chốt lời') and self.in_position:
+                exit_price_gross = float(next_open)
+                exit_price_net = exit_price_gross * (1.0 - self.fee_per_side)
+                assert self.entry_price is not None and self.entry_time is not None
+
+                pct_return = (exit_price_net - self.entry_price) / self.entry_price
+                self.equity *= (1.0 + pct_return)
+
+                trades.append(
+                    {
+                        'entry_time': self.entry_time,
+                        'entry_price': self.entry_price,
+                        'exit_time': next_time,
+                        'exit_price': exit_price_net,
+                        'pct_return': pct_return,
+                    }
+                )
+                self.returns.append(pct_return)
+
+                self.in_position = False
+                self.entry_price = None
+                self.entry_time = None
+
+        self._pending = rows[-1]
+        return trades, equity_curve
+
+    def metrics(self) -> Dict:
+        # The last bar has no next open, so it never trades nor adds an equity point
+        returns = pd.Series(self.returns, dtype=float)
+        return {
+            'num_trades': int(len(returns)),
+            'win_rate': float((returns > 0).mean()) if len(returns) else 0.0,
+            'avg_return_per_trade': float(returns.mean()) if len(returns) else 0.0,
+            'total_return': float((self.equity - 1.0)),
+            'final_equity': float(self.equity),
+        }
 
 
 def simulate_trades(
     signal_df: pd.DataFrame,
     fee_bps_per_side: float = 5.0,
 ) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
-    df = signal_df.copy()
-    df['next_open'] = df['open'].shift(-1)
-
-    in_position = False
-    entry_price: Optional[float] = None
-    entry_time: Optional[pd.Timestamp] = None
-
-    trades: List[Dict] = []
-    equity_curve: List[Tuple[pd.Timestamp, float]] = []
-    equity = 1.0
-    fee_per_side = fee_bps_per_side / 10000.0
-
-    for i in range(len(df) - 1):
-        ts = df.index[i]
-        sig = df['signal'].iloc[i]
-        next_open = df['next_open'].iloc[i]
-
-        # carry equity forward
-        equity_curve.append((ts, equity))
-
-        if pd.isna(next_open):
-            continue
-
-        if (sig == 'Mua mới') and (not in_position):
-            in_position = True
-            entry_price = float(next_open) * (1.0 + fee_per_side)
-            entry_time = df.index[i + 1]
-            continue
-
-        if (sig == 'Bán chốt lời') and in_position:
-            exit_price_gross = float(next_open)
-            exit_price_net = exit_price_gross * (1.0 - fee_per_side)
-            assert entry_price is not None and entry_time is not None
-
-            pct_return = (exit_price_net - entry_price) / entry_price
-            equity *= (1.0 + pct_return)
-
-            trades.append(
-                {
-                    'entry_time': entry_time,
-                    'entry_price': entry_price,
-                    'exit_time': df.index[i + 1],
-                    'exit_price': exit_price_net,
-                    'pct_return': pct_return,
-                }
-            )
-
-            in_position = False
-            entry_price = None
-            entry_time = None
+    simulator = TradeSimulator(fee_bps_per_side)
+    trades, equity_curve = simulator.feed(signal_df.index, signal_df['open'].to_numpy(), signal_df['signal'].to_numpy())
 
     equity_df = pd.DataFrame(equity_curve, columns=['timestamp', 'equity']).set_index('timestamp')
     trades_df = pd.DataFrame(trades)
-
-    metrics: Dict = {
-        'num_trades': int(len(trades_df)) if not trades_df.empty else 0,
-        'win_rate': float((trades_df['pct_return'] > 0).mean()) if not trades_df.empty else 0.0,
-        'avg_return_per_trade': float(trades_df['pct_return'].mean()) if not trades_df.empty else 0.0,
-        'total_return': float((equity - 1.0)),
-        'final_equity': float(equity),
-    }
-
-    return trades_df, equity_df, metrics
+    return trades_df, equity_df, simulator.metrics()
 
 
 def slice_date_range(df: pd.DataFrame, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
@@ -253,19 +189,36 @@ def slice_date_range(df: pd.DataFrame, start: Optional[str], end: Optional[str])
     return df
 
 
-def backtest_ticker(
-    ticker: str,
-    start: Optional[str],
-    end: Optional[str],
-    fee_bps: float,
-) -> Tuple[pd.DataFrame, pd.DataFrame, Dict, pd.DataFrame]:
+def compute_days_back(start: Optional[str]) -> int:
     # Compute minimal days_back from start to reduce API time, with buffer for indicators
     if start:
         start_dt = pd.to_datetime(start)
         days_span = max((pd.Timestamp.today().normalize() - start_dt).days, 1)
-        days_back = max(days_span + 300, 400)  # buffer for warm-up/indicators
-    else:
-        days_back = 2000
+        return max(days_span + 300, 400)  # buffer for warm-up/indicators
+    return 2000
+
+
+def load_market_states(start: Optional[str], end: Optional[str]) -> pd.Series:
+    """Lấy dữ liệu chỉ số đại diện và trả về chuỗi trạng thái biến động theo ngày."""
+    market_df = fetch_historical_data(MARKET_PROXY_TICKER, days_back=compute_days_back(start))
+    if market_df is None or market_df.empty:
+        raise RuntimeError(f"Không lấy được dữ liệu thị trường cho {MARKET_PROXY_TICKER}")
+
+    market_df = slice_date_range(market_df, start, end)
+    return get_historical_market_state(market_df)
+
+
+def prepare_signal_frame(
+    ticker: str,
+    start: Optional[str],
+    end: Optional[str],
+    market_states: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """
+    Lấy dữ liệu, tính chỉ báo, trạng thái thị trường và tín hiệu cho toàn bộ khoảng [start, end].
+    Có thể truyền sẵn `market_states` để dùng chung khi chạy nhiều mã.
+    """
+    days_back = compute_days_back(start)
 
     # Fetch history once then slice
     raw_df = fetch_historical_data(ticker, days_back=days_back)
@@ -283,37 +236,157 @@ def backtest_ticker(
         raise RuntimeError(f"Khoảng thời gian không có dữ liệu cho {ticker}")
 
     # Lấy dữ liệu thị trường để xác định trạng thái biến động
-    market_df = fetch_historical_data(MARKET_PROXY_TICKER, days_back=days_back)
-    if market_df is None or market_df.empty:
-        raise RuntimeError(f"Không lấy được dữ liệu thị trường cho {MARKET_PROXY_TICKER}")
-    
-    market_df = slice_date_range(market_df, start, end)
-    market_states = get_historical_market_state(market_df)
+    if market_states is None:
+        market_states = load_market_states(start, end)
 
     strategy_config = load_strategy_config()
     ind_df = compute_indicators(raw_df, strategy_config)
-    sig_df = generate_signals(ind_df, strategy_config, market_states)
+    return generate_signals(ind_df, strategy_config, market_states)
+
+
+def backtest_ticker(
+    ticker: str,
+    start: Optional[str],
+    end: Optional[str],
+    fee_bps: float,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict, pd.DataFrame]:
+    sig_df = prepare_signal_frame(ticker, start, end)
 
     trades_df, equity_df, metrics = simulate_trades(sig_df, fee_bps_per_side=fee_bps)
     return trades_df, equity_df, metrics, sig_df
 
 
-def main():
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("requests").setLevel(logging.WARNING)
+
     parser = argparse.ArgumentParser(description='Backtest hệ thống tín hiệu (EOD).')
     parser.add_argument('--tickers', type=str, required=True, help='Danh sách mã, ví dụ: FPT,MWG,VCB')
     parser.add_argument('--start', type=str, default=None, help='Ngày bắt đầu YYYY-MM-DD')
     parser.add_argument('--end', type=str, default=None, help='Ngày kết thúc YYYY-MM-DD')
     parser.add_argument('--fee_bps', type=float, default=5.0, help='Phí giao dịch mỗi chiều (basis points)')
     parser.add_argument('--outdir', type=str, default='backtest_outputs', help='Thư mục lưu kết quả')
-
-    args = parser.parse_args()
+    parser.add_argument(
+        '--output_format', type=str, choices=['csv', 'parquet'], default='csv',
+        help='Định dạng lưu kết quả: csv (mỗi mã 3 file) hoặc parquet (một dataset phân vùng theo run_id/ticker)',
+    )
+    parser.add_argument('--run_id', type=str, default=None, help='Mã lần chạy khi lưu Parquet (mặc định theo thời gian)')
+    parser.add_argument('--walk_forward', action='store_true', help='Chạy walk-forward thay vì một cửa sổ tĩnh')
+    parser.add_argument('--train_months', type=int, default=24, help='Walk-forward: độ dài cửa sổ train (tháng)')
+    parser.add_argument('--test_months', type=int, default=3, help='Walk-forward: độ dài cửa sổ test (tháng)')
+    parser.add_argument('--step_months', type=int, default=1, help='Walk-forward: bước trượt giữa các fold (tháng)')
+    parser.add_argument('--anchored', action='store_true', help='Walk-forward: cố định điểm bắt đầu train')
+    parser.add_argument('--workers', type=int, default=None, help='Số tiến trình song song (mặc định = số CPU)')
+    parser.add_argument('--portfolio', action='store_true', help='Backtest danh mục dùng chung vốn cho toàn bộ các mã')
+    parser.add_argument('--initial_capital', type=float, default=1e9, help='Danh mục: vốn ban đầu (VND)')
+    parser.add_argument('--max_positions', type=int, default=10, help='Danh mục: số vị thế nắm giữ tối đa')
+    parser.add_argument('--lot_size', type=int, default=100, help='Danh mục: số cổ phiếu mỗi lô')
+    parser.add_argument('--by', type=str, default='1d', help="Khung nến: '1d' (EOD) hoặc intraday như '1m', '5m'")
+    parser.add_argument(
+        '--chunk_days', type=int, default=20,
+        help='Intraday: số ngày dữ liệu tải và xử lý mỗi đoạn (0 = tải toàn bộ một lần)',
+    )
+    parser.add_argument(
+        '--robustness', type=int, default=0,
+        help='Số lần lấy mẫu lại (bootstrap + xáo trộn thứ tự lệnh) để tính khoảng tin cậy, 0 = tắt',
+    )
+    parser.add_argument('--block_size', type=int, default=5, help='Robustness: số lệnh liên tiếp mỗi khối bootstrap')
+    parser.add_argument('--seed', type=int, default=None, help='Robustness: seed để tái lập kết quả')
+
+    args = parser.parse_args(argv)
+    if args.by != '1d' and (args.walk_forward or args.portfolio):
+        parser.error('--walk_forward và --portfolio chỉ hỗ trợ khung 1d')
+    if args.robustness and (args.by != '1d' or args.walk_forward or args.portfolio):
+        parser.error('--robustness chỉ hỗ trợ backtest tĩnh khung 1d')
     os.makedirs(args.outdir, exist_ok=True)
 
+    if args.output_format == 'parquet':
+        import results_store
+        run_id = args.run_id or results_store.new_run_id()
+        strategy_config = load_strategy_config()
+        print(f"Lưu kết quả Parquet vào {results_store.dataset_root(args.outdir)} (run_id={run_id})")
+
+    if args.portfolio:
+        from portfolio import backtest_portfolio
+        tickers = [t.strip() for t in args.tickers.split(',') if t.strip()]
+        print(f"\n=== Backtest danh mục {len(tickers)} mã ===")
+        trades_df, equity_df, metrics = backtest_portfolio(
+            tickers=tickers,
+            start=args.start,
+            end=args.end,
+            fee_bps=args.fee_bps,
+            initial_capital=args.initial_capital,
+            max_positions=args.max_positions,
+            lot_size=args.lot_size,
+        )
+        if args.output_format == 'parquet':
+            # Cột ticker của lệnh được đổi tên vì ticker là cột phân vùng của dataset
+            positions_df = trades_df.rename(columns={'ticker': 'position_ticker'})
+            results_store.write_partition(args.outdir, 'portfolio_trades', run_id, 'PORTFOLIO', positions_df, strategy_config)
+            results_store.write_partition(args.outdir, 'portfolio_equity', run_id, 'PORTFOLIO', equity_df, strategy_config)
+        else:
+            trades_df.to_csv(os.path.join(args.outdir, 'portfolio_trades.csv'), index=False)
+            equity_df.to_csv(os.path.join(args.outdir, 'portfolio_equity.csv'))
+        print(metrics)
+        return
+
+    if args.by != '1d':
+        import intraday_backtest
+        if args.by not in intraday_backtest.INTRADAY_RESOLUTIONS:
+            parser.error(f"--by phải là 1d hoặc một trong {', '.join(intraday_backtest.INTRADAY_RESOLUTIONS)}")
+        strategy_config = load_strategy_config()
+        market_states = load_market_states(args.start, args.end)
     all_metrics: List[Dict] = []
+    trade_returns: Dict[str, np.ndarray] = {}
 
     for ticker in [t.strip() for t in args.tickers.split(',') if t.strip()]:
         print(f"\n=== Backtest {ticker} ===")
         try:
+            if args.by != '1d':
+                if args.output_format == 'parquet':
+                    sink = intraday_backtest.ParquetChunkSink(args.outdir, run_id, ticker, strategy_config)
+                else:
+                    sink = intraday_backtest.CsvChunkSink(args.outdir, ticker, args.by)
+                metrics = intraday_backtest.backtest_intraday_ticker(
+                    ticker=ticker,
+                    start=args.start,
+                    end=args.end,
+                    by=args.by,
+                    fee_bps=args.fee_bps,
+                    strategy_config=strategy_config,
+                    sink=sink,
+                    chunk_days=args.chunk_days or None,
+                    market_states=market_states,
+                )
+                print(metrics)
+                all_metrics.append({'ticker': ticker, **metrics})
+                continue
+
+            if args.walk_forward:
+                from walk_forward import walk_forward_ticker
+                folds_df, metrics = walk_forward_ticker(
+                    ticker=ticker,
+                    start=args.start,
+                    end=args.end,
+                    fee_bps=args.fee_bps,
+                    train_months=args.train_months,
+                    test_months=args.test_months,
+                    step_months=args.step_months,
+                    anchored=args.anchored,
+                    workers=args.workers,
+                )
+                if args.output_format == 'parquet':
+                    results_store.write_partition(
+                        args.outdir, 'walkforward', run_id, ticker, folds_df, strategy_config
+                    )
+                else:
+                    folds_df.to_csv(os.path.join(args.outdir, f'walkforward_{ticker}.csv'), index=False)
+
+                print(metrics)
+                all_metrics.append({'ticker': ticker, **metrics})
+                continue
+
             trades_df, equity_df, metrics, sig_full_df = backtest_ticker(
                 ticker=ticker,
                 start=args.start,
@@ -322,24 +395,58 @@ def main():
             )
 
             # Save results
-            trades_path = os.path.join(args.outdir, f'trades_{ticker}.csv')
-            equity_path = os.path.join(args.outdir, f'equity_{ticker}.csv')
-            signals_path = os.path.join(args.outdir, f'signals_{ticker}.csv')
-
-            sig_full_df.to_csv(signals_path)
-            trades_df.to_csv(trades_path, index=False)
-            equity_df.to_csv(equity_path)
+            if args.output_format == 'parquet':
+                results_store.write_backtest_results(
+                    args.outdir, run_id, ticker, sig_full_df, trades_df, equity_df, strategy_config
+                )
+            else:
+                trades_path = os.path.join(args.outdir, f'trades_{ticker}.csv')
+                equity_path = os.path.join(args.outdir, f'equity_{ticker}.csv')
+                signals_path = os.path.join(args.outdir, f'signals_{ticker}.csv')
+
+                sig_full_df.to_csv(signals_path)
+                trades_df.to_csv(trades_path, index=False)
+                equity_df.to_csv(equity_path)
 
             print(metrics)
             all_metrics.append({'ticker': ticker, **metrics})
+            if not trades_df.empty:
+                trade_returns[ticker] = trades_df['pct_return'].to_numpy(dtype=float)
         except Exception as e:
             print(f"Lỗi backtest {ticker}: {e}")
 
     if all_metrics:
-        summary_df = pd.DataFrame(all_metrics)
-        summary_path = os.path.join(args.outdir, 'summary.csv')
-        summary_df.to_csv(summary_path, index=False)
-        print(f"\nSaved summary to {summary_path}")
+        if args.output_format == 'parquet':
+            results_store.write_summary(args.outdir, run_id, all_metrics, strategy_config)
+            print(f"\nSaved summary to {results_store.dataset_root(args.outdir)} (run_id={run_id})")
+        else:
+            summary_df = pd.DataFrame(all_metrics)
+            summary_path = os.path.join(args.outdir, 'summary.csv')
+            summary_df.to_csv(summary_path, index=False)
+            print(f"\nSaved summary to {summary_path}")
+
+    if args.robustness:
+        from robustness import analyze_trade_returns
+        print(f"\n=== Robustness: {args.robustness} lần lấy mẫu lại cho {len(trade_returns)} mã ===")
+        robustness_df = analyze_trade_returns(
+            trade_returns,
+            num_resamples=args.robustness,
+            block_size=args.block_size,
+            seed=args.seed,
+            workers=args.workers,
+        )
+        if robustness_df.empty:
+            print("Không có mã nào đủ lệnh (>= 2) để phân tích độ bền.")
+            return
+        print(robustness_df[['ticker', 'num_trades', 'boot_total_return_lo', 'boot_total_return_hi', 'prob_loss']])
+        if args.output_format == 'parquet':
+            for ticker, ticker_df in robustness_df.groupby('ticker', sort=False):
+                results_store.write_partition(args.outdir, 'robustness', run_id, ticker, ticker_df, strategy_config)
+            print(f"Saved robustness to {results_store.dataset_root(args.outdir)} (run_id={run_id})")
+        else:
+            robustness_path = os.path.join(args.outdir, 'robustness.csv')
+            robustness_df.to_csv(robustness_path, index=False)
+            print(f"Saved robustness to {robustness_path}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,114 @@
+import json
+import os
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+from downsample import DEFAULT_MAX_POINTS, downsample_series
+from indicators import compute_strategy_indicators, strategy_columns
+
+# --- Dữ liệu cho biểu đồ giá & chỉ báo trên dashboard ---
+# Nến được đọc từ dữ liệu đã lưu: lịch sử EOD trong cache của scheduler (history_cache)
+# hoặc tick trong ngày của kho tick (tick_store), gộp thành nến theo khung thời gian chọn.
+# Chỉ báo được tính trên toàn bộ nến rồi từng chuỗi mới được giảm mẫu bằng LTTB.
+STRATEGY_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'strategy_config.json')
+CHART_INDICATORS = ('sma_short', 'sma_long', 'rsi', 'macd')
+
+# Khung nến cho dữ liệu tick -> quy tắc resample của pandas
+INTRADAY_RESOLUTIONS = {'1m': '1min', '5m': '5min', '15m': '15min', '1h': '1h'}
+
+
+def chart_tickers(tick_days: int = 5) -> List[str]:
+    """Các mã có thể vẽ: watchlist, các mã có lịch sử trong cache và các mã có tick trong `tick_days` ngày gần nhất."""
+    from history_cache import HISTORY_DIR
+    from tick_store import list_days, list_tickers
+
+    tickers = set(config.TICKERS_WATCHLIST)
+    if os.path.isdir(HISTORY_DIR):
+        tickers.update(name[:-4] for name in os.listdir(HISTORY_DIR) if name.endswith('.pkl'))
+    for day in list_days(config.TICK_STORE_DIR)[-tick_days:]:
+        tickers.update(list_tickers(day, config.TICK_STORE_DIR))
+    return sorted(tickers)
+
+
+def load_daily_bars(ticker: str) -> Optional[pd.DataFrame]:
+    from history_cache import load_history
+
+    return load_history(ticker, max_age_hours=None)
+
+
+def load_intraday_bars(ticker: str, start: date, end: date, resolution: str = '1m') -> Optional[pd.DataFrame]:
+    """Gộp tick trong kho tick của các ngày [start, end] thành nến OHLCV theo `resolution`."""
+    from tick_store import list_days, open_ticker
+
+    first, last = start.strftime('%Y%m%d'), end.strftime('%Y%m%d')
+    frames = []
+    for day in list_days(config.TICK_STORE_DIR):
+        if not first <= day <= last:
+            continue
+        records = open_ticker(day, ticker, config.TICK_STORE_DIR)
+        if records is None or not len(records):
+            continue
+        frames.append(pd.DataFrame(
+            {col: np.array(records[col]) for col in ('open', 'high', 'low', 'close', 'volume')},
+            index=pd.DatetimeIndex(np.array(records['ts']).astype('datetime64[ns]')),
+        ))
+    if not frames:
+        return None
+
+    ticks = pd.concat(frames).sort_index()
+    bars = ticks.resample(INTRADAY_RESOLUTIONS[resolution]).agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    )
+    return bars.dropna(subset=['close'])
+
+
+def build_chart_series(
+    bars: pd.DataFrame,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+    strategy_config: Optional[Dict] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Tính chỉ báo trên toàn bộ nến rồi cắt theo [start, end] và giảm mẫu từng chuỗi.
+
+    Returns:
+        dict: 'price' (close, SMA ngắn/dài), 'rsi', 'macd' (MACD, signal, histogram),
+              mỗi phần là DataFrame dạng dài (timestamp, series, value) cho altair.
+    """
+    if strategy_config is None:
+        with open(STRATEGY_CONFIG_PATH, 'r') as f:
+            strategy_config = json.load(f)
+    cols = strategy_columns(strategy_config)
+    values = compute_strategy_indicators(
+        bars['high'].to_numpy(dtype=np.float64),
+        bars['low'].to_numpy(dtype=np.float64),
+        bars['close'].to_numpy(dtype=np.float64),
+        strategy_config,
+        names=CHART_INDICATORS,
+    )
+    frame = pd.DataFrame(values, index=bars.index)
+    frame['close'] = bars['close'].to_numpy(dtype=np.float64)
+    if start is not None:
+        frame = frame[frame.index >= pd.Timestamp(start)]
+    if end is not None:
+        frame = frame[frame.index < pd.Timestamp(end) + pd.Timedelta(days=1)]
+
+    panels = {
+        'price': {'Close': 'close', f"SMA{strategy_config['SMA_SHORT_PERIOD']}": cols['sma_short'],
+                  f"SMA{strategy_config['SMA_LONG_PERIOD']}": cols['sma_long']},
+        'rsi': {'RSI': cols['rsi']},
+        'macd': {'MACD': cols['macd'], 'Signal': cols['macd_signal'], 'Histogram': cols['macd_hist']},
+    }
+    result = {}
+    for panel, series_map in panels.items():
+        parts = []
+        for label, col in series_map.items():
+            series = downsample_series(frame[col], max_points)
+            parts.append(pd.DataFrame({'timestamp': series.index, 'series': label, 'value': series.to_numpy()}))
+        result[panel] = pd.concat(parts, ignore_index=True)
+    return result
@@ -8,6 +8,30 @@ load_dotenv()
 FIINQUANT_USERNAME = os.getenv('USERNAME1')
 FIINQUANT_PASSWORD = os.getenv('PASSWORD1')
 
-CSV_FILE = 'signals.csv' # File để lưu tín hiệu cho dashboard
+CSV_FILE = 'signals.csv' # File CSV tín hiệu (giữ để xuất/tương thích)
+SIGNAL_DB_FILE = 'signals.db' # Kho tín hiệu SQLite (signal_store.py) mà dashboard truy vấn
+SIGNAL_STORE_ENABLED = True
+SIGNAL_CSV_ENABLED = True # Vẫn ghi song song ra CSV_FILE
 LOG_FILE = 'signals.log' # File để ghi log chi tiết
-TICKERS_WATCHLIST = ['FPT', 'MWG', 'VCB', 'ACB', 'HPG', 'SSI', 'VND', 'VNM', 'VIC', 'MSN']
\ No newline at end of file
+TICKERS_WATCHLIST = ['FPT', 'MWG', 'VCB', 'ACB', 'HPG', 'SSI', 'VND', 'VNM', 'VIC', 'MSN']
+# Kho tick trong ngày (tick_store.py): main.py ghi nối thêm, dashboard/backtest/replay đọc
+TICK_STORE_ENABLED = True
+TICK_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tick_store')
+
+# Micro-batching (micro_batch.py): gom tick của nhiều mã trong một cửa sổ ngắn rồi tính chỉ báo
+# và quy tắc một lần trên mảng 2D. Độ trễ thêm tối đa khoảng MICRO_BATCH_WINDOW_MS mili giây.
+MICRO_BATCH_ENABLED = False
+MICRO_BATCH_WINDOW_MS = 5
+MICRO_BATCH_MAX_SIZE = 512
+
+# Chụp profile theo yêu cầu cho tiến trình stream (profiler_control.py): SIGUSR1 hoặc lệnh qua
+# socket 127.0.0.1:PROFILER_PORT (đặt None để chỉ dùng SIGUSR1). Kết quả ghi cạnh LOG_FILE.
+PROFILER_ENABLED = False
+PROFILER_PORT = 8765
+PROFILER_DEFAULT_SECONDS = 30
+PROFILER_INTERVAL_MS = 5
+
+# Ảnh chụp trực tiếp chỉ báo theo mã trong bộ nhớ dùng chung (live_snapshot.py): main.py ghi, dashboard đọc
+LIVE_SNAPSHOT_ENABLED = True
+LIVE_SNAPSHOT_NAME = 'rts_live_snapshot'
+LIVE_SNAPSHOT_CAPACITY = 2048 # Số mã tối đa trong khối
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# --- Giảm mẫu chuỗi thời gian phía server cho biểu đồ ---
+# Largest-Triangle-Three-Buckets (LTTB): chia chuỗi thành các bucket, mỗi bucket giữ lại đúng
+# một điểm tạo tam giác lớn nhất với điểm đã chọn ở bucket trước và trung bình của bucket sau.
+# Giữ được hình dạng (đỉnh, đáy, cú giật giá) tốt hơn nhiều so với lấy mẫu cách đều,
+# nên vẽ nhiều năm dữ liệu phút chỉ cần gửi vài nghìn điểm xuống trình duyệt.
+DEFAULT_MAX_POINTS = 2000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Chọn `threshold` điểm đại diện theo LTTB.
+
+    Args:
+        x: Trục hoành tăng dần (ví dụ timestamp dạng số).
+        y: Giá trị tương ứng, không chứa NaN.
+
+    Returns:
+        np.ndarray: Chỉ số các điểm được giữ lại (tăng dần, luôn gồm điểm đầu và cuối).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    num_buckets = threshold - 2
+    every = (n - 2) / num_buckets
+    # Bucket i gồm các điểm [edges[i], edges[i + 1]); điểm đầu và cuối nằm ngoài mọi bucket
+    edges = (np.arange(num_buckets + 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(num_buckets):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 <= num_buckets else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_series(series: pd.Series, max_points: int = DEFAULT_MAX_POINTS) -> pd.Series:
+    """Giảm mẫu một Series có DatetimeIndex bằng LTTB (bỏ qua các giá trị NaN)."""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8.astype(np.float64)
+    return series.iloc[lttb_indices(x, series.to_numpy(dtype=np.float64), max_points)]
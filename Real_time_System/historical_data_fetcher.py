@@ -1,19 +1,25 @@
 import config
-from FiinQuantX import FiinSession
 from datetime import datetime, timedelta
+from typing import Optional
 import pandas as pd
 import logging
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-def fetch_historical_data(ticker: str, days_back: int = 365):
+def fetch_historical_data(
+    ticker: str,
+    days_back: int = 365,
+    by: str = '1d',
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+):
     """
-    Lấy dữ liệu lịch sử EOD (End-of-Day) cho một mã cổ phiếu.
+    Lấy dữ liệu lịch sử cho một mã cổ phiếu (mặc định EOD - End-of-Day).
 
     Args:
         ticker (str): Mã cổ phiếu cần lấy dữ liệu.
-        days_back (int): Số ngày dữ liệu cần lấy tính từ hiện tại.
+        days_back (int): Số ngày dữ liệu cần lấy tính từ hiện tại (khi không truyền from_date).
+        by (str): Khung thời gian của nến, ví dụ '1d', '1m', '5m'.
+        from_date, to_date (datetime): Khoảng thời gian cụ thể cần lấy, dùng khi tải theo từng đoạn.
 
     Returns:
         pd.DataFrame: DataFrame chứa dữ liệu lịch sử hoặc None nếu có lỗi.
@@ -21,17 +27,18 @@ def fetch_historical_data(ticker: str, days_back: int = 365):
     logging.info(f"Bắt đầu quá trình lấy dữ liệu lịch sử cho mã: {ticker}...")
     client = None
     try:
+        from FiinQuantX import FiinSession
         client = FiinSession(username=config.FIINQUANT_USERNAME, password=config.FIINQUANT_PASSWORD).login()
         logging.info("Đăng nhập FiinQuantX thành công.")
 
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
+        end_date = to_date or datetime.now()
+        start_date = from_date or (end_date - timedelta(days=days_back))
 
         request_object = client.Fetch_Trading_Data(
             False, # realtime = False
             ticker,
             ['open', 'high', 'low', 'close', 'volume'],
-            by='1d', # Dữ liệu EOD
+            by=by, # '1d' = dữ liệu EOD
             from_date=start_date.strftime('%Y-%m-%d'),
             to_date=end_date.strftime('%Y-%m-%d')
         )
@@ -57,6 +64,7 @@ def fetch_historical_data(ticker: str, days_back: int = 365):
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     TICKER_TO_TEST = 'FPT'
     logging.info(f"--- BẮT ĐẦU KIỂM TRA MODULE historical_data_fetcher VỚI MÃ {TICKER_TO_TEST} ---")
@@ -0,0 +1,155 @@
+import logging
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from historical_data_fetcher import fetch_historical_data
+from tick_store import from_ns, load_recent
+
+# --- Bộ nhớ đệm dữ liệu lịch sử trên đĩa ---
+# Job tiền phiên của scheduler tải trước lịch sử EOD cho toàn bộ watchlist và lưu tại đây
+# (dùng cho trạng thái biến động theo mã và biểu đồ dashboard), rồi lưu "trạng thái khởi động ấm"
+# (các tick gần nhất của phiên trước, lấy từ kho tick) để main.py nạp lại khi mở luồng,
+# thay vì phải chờ tích lũy đủ 50 tick từ đầu.
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache')
+HISTORY_DIR = os.path.join(CACHE_DIR, 'history')
+WARM_STATE_PATH = os.path.join(CACHE_DIR, 'warm_state.pkl')
+
+DEFAULT_MAX_AGE_HOURS = 12  # Dữ liệu tải trước 09:00 vẫn dùng được trong cả phiên
+COVERAGE_TOLERANCE_DAYS = 7  # Cho phép đầu dữ liệu lệch vài ngày do nghỉ lễ/cuối tuần
+PREFETCH_WORKERS = 4
+
+
+def _history_path(ticker: str) -> str:
+    return os.path.join(HISTORY_DIR, f'{ticker}.pkl')
+
+
+def _is_fresh(path: str, max_age_hours: Optional[float]) -> bool:
+    if not os.path.exists(path):
+        return False
+    if max_age_hours is None:
+        return True
+    age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(path))
+    return age <= timedelta(hours=max_age_hours)
+
+
+def save_history(ticker: str, df: pd.DataFrame) -> None:
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    tmp_path = _history_path(ticker) + '.tmp'
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, _history_path(ticker))
+
+
+def load_history(ticker: str, max_age_hours: Optional[float] = DEFAULT_MAX_AGE_HOURS) -> Optional[pd.DataFrame]:
+    """Đọc lịch sử đã cache của một mã, hoặc None nếu chưa có hay đã quá hạn."""
+    path = _history_path(ticker)
+    if not _is_fresh(path, max_age_hours):
+        return None
+    try:
+        return pd.read_pickle(path)
+    except Exception as e:
+        logging.warning(f"Không đọc được cache lịch sử của {ticker}: {e}")
+        return None
+
+
+def get_history(
+    ticker: str,
+    days_back: int = 365,
+    max_age_hours: Optional[float] = DEFAULT_MAX_AGE_HOURS,
+) -> Optional[pd.DataFrame]:
+    """
+    Lấy lịch sử EOD của một mã, ưu tiên dùng cache nếu còn hạn và đủ dài.
+
+    Returns:
+        pd.DataFrame: Dữ liệu trong `days_back` ngày gần nhất, hoặc None nếu không lấy được.
+    """
+    start = pd.Timestamp(datetime.now() - timedelta(days=days_back))
+    cached = load_history(ticker, max_age_hours)
+    if cached is not None and not cached.empty:
+        if cached.index[0] <= start + pd.Timedelta(days=COVERAGE_TOLERANCE_DAYS):
+            return cached[cached.index >= start]
+
+    df = fetch_historical_data(ticker, days_back=days_back)
+    if df is not None and not df.empty:
+        save_history(ticker, df)
+    return df
+
+
+def prefetch_history(
+    tickers: List[str],
+    days_back: int = 365,
+    workers: int = PREFETCH_WORKERS,
+    max_age_hours: Optional[float] = DEFAULT_MAX_AGE_HOURS,
+) -> Dict[str, pd.DataFrame]:
+    """Tải song song lịch sử cho nhiều mã (dùng cache khi còn hạn)."""
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='prefetch') as executor:
+        results = executor.map(lambda t: get_history(t, days_back, max_age_hours), tickers)
+        history = {t: df for t, df in zip(tickers, results) if df is not None and not df.empty}
+    logging.info(f"Đã tải trước lịch sử cho {len(history)}/{len(tickers)} mã.")
+    return history
+
+
+def build_warm_state(ticks: Dict[str, np.ndarray], bars: int = 200) -> Dict:
+    """
+    Tạo trạng thái khởi động ấm cho bộ phát hiện tín hiệu từ các tick gần nhất trong kho tick.
+    Bộ đệm của bộ phát hiện nhận một nến cho mỗi tick, nên chỉ nạp tick (cùng khung thời gian),
+    không nạp nến ngày EOD.
+
+    Returns:
+        dict: {'created_at', 'tickers': {ticker: {'bars': [nến...]}}}
+    """
+    tickers_state = {}
+    for ticker, records in ticks.items():
+        tail = records[-bars:]
+        tickers_state[ticker] = {
+            'bars': [
+                {
+                    'timestamp': from_ns(rec['ts']),
+                    'open': float(rec['open']),
+                    'high': float(rec['high']),
+                    'low': float(rec['low']),
+                    'close': float(rec['close']),
+                    'volume': float(rec['volume']),
+                }
+                for rec in tail
+            ],
+        }
+    return {'created_at': datetime.now(), 'tickers': tickers_state}
+
+
+def save_warm_state(state: Dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = WARM_STATE_PATH + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, WARM_STATE_PATH)
+
+
+def load_warm_state(max_age_hours: Optional[float] = DEFAULT_MAX_AGE_HOURS) -> Optional[Dict]:
+    """Đọc trạng thái khởi động ấm, hoặc None nếu chưa có hay đã quá hạn."""
+    if not _is_fresh(WARM_STATE_PATH, max_age_hours):
+        return None
+    try:
+        with open(WARM_STATE_PATH, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        logging.warning(f"Không đọc được trạng thái khởi động ấm: {e}")
+        return None
+
+
+def warm_watchlist(tickers: List[str], bars: int = 200) -> Dict:
+    """Lưu trạng thái khởi động ấm cho watchlist từ tick của các phiên trước trong kho tick."""
+    ticks = {}
+    for ticker in tickers:
+        records = load_recent(ticker, bars)
+        if records is not None:
+            ticks[ticker] = records
+    state = build_warm_state(ticks, bars=bars)
+    save_warm_state(state)
+    logging.info(f"Đã lưu trạng thái khởi động ấm cho {len(state['tickers'])} mã vào {WARM_STATE_PATH}")
+    return state
@@ -0,0 +1,580 @@
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# --- Thư viện chỉ báo NumPy dùng chung ---
+# Các hàm nhận mảng và trả về mảng (array-in/array-out), thay cho accessor `df.ta.*`
+# của pandas_ta ở luồng real-time, backtest và "Bộ não ML". Công thức bám sát pandas_ta:
+#   - SMA: trung bình trượt đủ cửa sổ (min_periods = length)
+#   - EMA: khởi tạo bằng SMA của `length` giá trị đầu, sau đó ewm(adjust=False)
+#   - RMA: ewm(alpha=1/length, adjust=True, min_periods=length)
+# Mảng 1D là một chuỗi thời gian; mảng 2D có dạng (số chuỗi, thời gian), mỗi dòng được tính
+# độc lập và NaN ở đầu dòng (dòng ngắn được đệm trái) được bỏ qua như chuỗi 1D tương ứng.
+# Khác biệt duy nhất có chủ đích: khoảng giá high - low bằng 0 được thay bằng epsilon tại
+# đúng vị trí đó (pandas_ta cộng epsilon cho cả chuỗi), chênh lệch nằm dưới sai số float.
+#
+# Các vòng lặp đệ quy (EWM/EMA) được JIT bằng numba nếu có cài đặt; nếu không sẽ chạy
+# bằng Python thuần trên list, vẫn đủ nhanh cho cửa sổ real-time vài trăm nến.
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+EPSILON = sys.float_info.epsilon
+
+
+# ---------------------------------------------------------------------------
+# Kernel đệ quy theo từng dòng (chạy được cả với mảng numba lẫn list Python)
+# ---------------------------------------------------------------------------
+
+@njit(cache=True)
+def _ewm_row(xs, out, alpha, adjust, min_periods, weighted, old_wt, nobs):
+    """Công thức cập nhật giống hệt `pandas.Series.ewm(...).mean()` với ignore_na=False."""
+    new_wt = 1.0 if adjust else alpha
+    factor = 1.0 - alpha
+    for t in range(len(xs)):
+        cur = xs[t]
+        is_obs = cur == cur
+        if is_obs:
+            nobs += 1
+        if weighted == weighted:
+            old_wt *= factor
+            if is_obs:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                if adjust:
+                    old_wt += new_wt
+                else:
+                    old_wt = 1.0
+        elif is_obs:
+            weighted = cur
+        out[t] = weighted if nobs >= min_periods else np.nan
+    return weighted, old_wt, nobs
+
+
+@njit(cache=True)
+def _ema_row(xs, out, length, seed_sum, seed_count, weighted, old_wt):
+    """EMA kiểu pandas_ta: SMA của `length` giá trị hợp lệ đầu tiên làm điểm khởi tạo."""
+    alpha = 2.0 / (length + 1.0)
+    factor = 1.0 - alpha
+    for t in range(len(xs)):
+        cur = xs[t]
+        if seed_count < length:
+            if cur == cur:
+                seed_sum += cur
+                seed_count += 1
+                if seed_count == length:
+                    weighted = seed_sum / length
+                    old_wt = 1.0
+                    out[t] = weighted
+                    continue
+            out[t] = np.nan
+            continue
+        old_wt *= factor
+        if cur == cur:
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+        out[t] = weighted
+    return seed_sum, seed_count, weighted, old_wt
+
+
+def _ewm_cols(x, out, alpha, adjust, min_periods, weighted, old_wt, nobs):
+    """Cùng công thức với `_ewm_row` nhưng lặp theo thời gian, vector hóa trên tất cả các dòng."""
+    new_wt = 1.0 if adjust else alpha
+    factor = 1.0 - alpha
+    weighted, old_wt, nobs = weighted.copy(), old_wt.copy(), nobs.copy()
+    for t in range(x.shape[1]):
+        cur = x[:, t]
+        is_obs = cur == cur
+        nobs += is_obs
+        has_value = weighted == weighted
+        old_wt = np.where(has_value, old_wt * factor, old_wt)
+        step = has_value & is_obs
+        update = step & (weighted != cur)
+        weighted = np.where(update, (old_wt * weighted + new_wt * cur) / (old_wt + new_wt), weighted)
+        old_wt = np.where(step, old_wt + new_wt if adjust else 1.0, old_wt)
+        weighted = np.where(~has_value & is_obs, cur, weighted)
+        out[:, t] = np.where(nobs >= min_periods, weighted, np.nan)
+    return weighted, old_wt, nobs
+
+
+def _ema_cols(x, out, length, seed_sum, seed_count, weighted, old_wt):
+    """Cùng công thức với `_ema_row` nhưng lặp theo thời gian, vector hóa trên tất cả các dòng."""
+    alpha = 2.0 / (length + 1.0)
+    factor = 1.0 - alpha
+    seed_sum, seed_count, weighted, old_wt = seed_sum.copy(), seed_count.copy(), weighted.copy(), old_wt.copy()
+    for t in range(x.shape[1]):
+        cur = x[:, t]
+        is_obs = cur == cur
+        seeding = seed_count < length
+        add = seeding & is_obs
+        seed_sum = np.where(add, seed_sum + cur, seed_sum)
+        seed_count += add
+        seeded = add & (seed_count == length)
+        weighted = np.where(seeded, seed_sum / length, weighted)
+        old_wt = np.where(seeded, 1.0, old_wt)
+        running = ~seeding
+        old_wt = np.where(running, old_wt * factor, old_wt)
+        update = running & is_obs & (weighted != cur)
+        weighted = np.where(update, (old_wt * weighted + alpha * cur) / (old_wt + alpha), weighted)
+        old_wt = np.where(running & is_obs, 1.0, old_wt)
+        out[:, t] = np.where(running | seeded, weighted, np.nan)
+    return seed_sum, seed_count, weighted, old_wt
+
+
+# Không có numba: từ số dòng này trở lên, lặp theo thời gian và vector hóa trên các dòng
+# nhanh hơn chạy vòng lặp Python cho từng dòng (trường hợp gom lô nhiều mã).
+COLUMN_KERNEL_MIN_ROWS = 8
+_COLUMN_KERNELS = {_ewm_row: _ewm_cols, _ema_row: _ema_cols}
+
+
+def _run_rows(row_kernel, x: np.ndarray, state: Dict[str, np.ndarray], keys, *params) -> np.ndarray:
+    """Chạy kernel trên từng dòng của mảng 2D, đọc và ghi lại trạng thái theo `keys`."""
+    n, T = x.shape
+    out = np.empty((n, T), dtype=np.float64)
+    if not NUMBA_AVAILABLE and n >= COLUMN_KERNEL_MIN_ROWS:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = _COLUMN_KERNELS[row_kernel](x, out, *params, *(state[k] for k in keys))
+        for k, v in zip(keys, result):
+            state[k][:] = v
+        return out
+    for i in range(n):
+        row_state = [state[k][i] for k in keys]
+        if NUMBA_AVAILABLE:
+            result = row_kernel(x[i], out[i], *params, *row_state)
+        else:
+            buf = [0.0] * T
+            result = row_kernel(x[i].tolist(), buf, *params, *row_state)
+            out[i] = buf
+        for k, v in zip(keys, result):
+            state[k][i] = v
+    return out
+
+
+def new_ewm_state(n: int) -> Dict[str, np.ndarray]:
+    return {
+        'weighted': np.full(n, np.nan),
+        'old_wt': np.ones(n),
+        'nobs': np.zeros(n, dtype=np.int64),
+    }
+
+
+def new_ema_state(n: int) -> Dict[str, np.ndarray]:
+    return {
+        'seed_sum': np.zeros(n),
+        'seed_count': np.zeros(n, dtype=np.int64),
+        'weighted': np.full(n, np.nan),
+        'old_wt': np.ones(n),
+    }
+
+
+def _ewm_2d(x: np.ndarray, alpha: float, adjust: bool, min_periods: int, state=None) -> np.ndarray:
+    state = state if state is not None else new_ewm_state(x.shape[0])
+    return _run_rows(
+        _ewm_row, x, state, ('weighted', 'old_wt', 'nobs'), alpha, adjust, max(int(min_periods), 1)
+    )
+
+
+def _ema_2d(x: np.ndarray, length: int, state=None) -> np.ndarray:
+    state = state if state is not None else new_ema_state(x.shape[0])
+    return _run_rows(_ema_row, x, state, ('seed_sum', 'seed_count', 'weighted', 'old_wt'), int(length))
+
+
+def _rma_2d(x: np.ndarray, length: int, state=None) -> np.ndarray:
+    return _ewm_2d(x, 1.0 / length, True, length, state)
+
+
+# ---------------------------------------------------------------------------
+# Tiện ích mảng
+# ---------------------------------------------------------------------------
+
+def _as_2d(x) -> Tuple[np.ndarray, bool]:
+    arr = np.asarray(x, dtype=np.float64)
+    if arr.ndim == 1:
+        return arr[None, :], True
+    if arr.ndim != 2:
+        raise ValueError("Chỉ hỗ trợ mảng 1D hoặc 2D (số chuỗi, thời gian)")
+    return arr, False
+
+
+def _restore(arr: np.ndarray, was_1d: bool) -> np.ndarray:
+    return arr[0] if was_1d else arr
+
+
+def _rolling_2d(x: np.ndarray, length: int, reducer) -> np.ndarray:
+    """Cửa sổ trượt theo trục thời gian; cửa sổ chưa đủ hoặc chứa NaN cho kết quả NaN."""
+    n, T = x.shape
+    out = np.full((n, T), np.nan)
+    if T >= length:
+        out[:, length - 1:] = reducer(sliding_window_view(x, length, axis=1), axis=2)
+    return out
+
+
+def _shift_2d(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    out[:, periods:] = x[:, :-periods]
+    return out
+
+
+def _non_zero_range(high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    rng = high - low
+    return np.where(rng == 0, EPSILON, rng)
+
+
+def _zero_small(x: np.ndarray) -> np.ndarray:
+    return np.where(np.abs(x) < EPSILON, 0.0, x)
+
+
+# ---------------------------------------------------------------------------
+# Chỉ báo
+# ---------------------------------------------------------------------------
+
+def sma(close, length: int) -> np.ndarray:
+    x, was_1d = _as_2d(close)
+    return _restore(_rolling_2d(x, length, np.mean), was_1d)
+
+
+def ema(close, length: int) -> np.ndarray:
+    x, was_1d = _as_2d(close)
+    return _restore(_ema_2d(x, length), was_1d)
+
+
+def rma(close, length: int) -> np.ndarray:
+    x, was_1d = _as_2d(close)
+    return _restore(_rma_2d(x, length), was_1d)
+
+
+def _rsi_from_diff(diff: np.ndarray, length: int, pos_state=None, neg_state=None) -> np.ndarray:
+    positive = np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+    negative = np.where(diff < 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+    positive_avg = _rma_2d(positive, length, pos_state)
+    negative_avg = _rma_2d(negative, length, neg_state)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 * positive_avg / (positive_avg + np.abs(negative_avg))
+
+
+def rsi(close, length: int = 14) -> np.ndarray:
+    x, was_1d = _as_2d(close)
+    return _restore(_rsi_from_diff(x - _shift_2d(x), length), was_1d)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trả về (MACD, MACDh, MACDs) giống thứ tự cột của pandas_ta."""
+    x, was_1d = _as_2d(close)
+    macd_line = _ema_2d(x, fast) - _ema_2d(x, slow)
+    signal_line = _ema_2d(macd_line, signal)
+    hist = macd_line - signal_line
+    return _restore(macd_line, was_1d), _restore(hist, was_1d), _restore(signal_line, was_1d)
+
+
+def _stoch_raw(high: np.ndarray, low: np.ndarray, close: np.ndarray, k: int) -> np.ndarray:
+    lowest_low = _rolling_2d(low, k, np.min)
+    highest_high = _rolling_2d(high, k, np.max)
+    return 100.0 * (close - lowest_low) / _non_zero_range(highest_high, lowest_low)
+
+
+def stoch(high, low, close, k: int = 14, d: int = 3, smooth_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Trả về (STOCHk, STOCHd)."""
+    h, was_1d = _as_2d(high)
+    l, _ = _as_2d(low)
+    c, _ = _as_2d(close)
+    stoch_k = _rolling_2d(_stoch_raw(h, l, c, k), smooth_k, np.mean)
+    stoch_d = _rolling_2d(stoch_k, d, np.mean)
+    return _restore(stoch_k, was_1d), _restore(stoch_d, was_1d)
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, prev_close: np.ndarray) -> np.ndarray:
+    ranges = np.fmax(
+        np.abs(_non_zero_range(high, low)),
+        np.fmax(np.abs(high - prev_close), np.abs(prev_close - low)),
+    )
+    ranges[np.isnan(prev_close)] = np.nan
+    return ranges
+
+
+def true_range(high, low, close) -> np.ndarray:
+    h, was_1d = _as_2d(high)
+    l, _ = _as_2d(low)
+    c, _ = _as_2d(close)
+    return _restore(_true_range(h, l, c, _shift_2d(c)), was_1d)
+
+
+def atr(high, low, close, length: int = 14) -> np.ndarray:
+    """ATR làm mượt bằng RMA (cột ATRr_<length> của pandas_ta)."""
+    h, was_1d = _as_2d(high)
+    l, _ = _as_2d(low)
+    c, _ = _as_2d(close)
+    return _restore(_rma_2d(_true_range(h, l, c, _shift_2d(c)), length), was_1d)
+
+
+def _directional_movement(high, low, prev_high, prev_low) -> Tuple[np.ndarray, np.ndarray]:
+    up = high - prev_high
+    dn = prev_low - low
+    with np.errstate(invalid='ignore'):
+        pos = np.where((up > dn) & (up > 0), up, 0.0)
+        neg = np.where((dn > up) & (dn > 0), dn, 0.0)
+    missing = np.isnan(up) | np.isnan(dn)
+    pos[missing] = np.nan
+    neg[missing] = np.nan
+    return _zero_small(pos), _zero_small(neg)
+
+
+def _adx_from_components(atr_, pos_avg, neg_avg, length: int, adx_state=None):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100.0 / atr_
+        dmp = k * pos_avg
+        dmn = k * neg_avg
+        dx = 100.0 * np.abs(dmp - dmn) / (dmp + dmn)
+    return _rma_2d(dx, length, adx_state), dmp, dmn
+
+
+def adx(high, low, close, length: int = 14) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trả về (ADX, DMP, DMN)."""
+    h, was_1d = _as_2d(high)
+    l, _ = _as_2d(low)
+    c, _ = _as_2d(close)
+    atr_ = _rma_2d(_true_range(h, l, c, _shift_2d(c)), length)
+    pos, neg = _directional_movement(h, l, _shift_2d(h), _shift_2d(l))
+    adx_, dmp, dmn = _adx_from_components(atr_, _rma_2d(pos, length), _rma_2d(neg, length), length)
+    return _restore(adx_, was_1d), _restore(dmp, was_1d), _restore(dmn, was_1d)
+
+
+# ---------------------------------------------------------------------------
+# Bộ chỉ báo của chiến lược
+# ---------------------------------------------------------------------------
+
+def strategy_columns(strategy_config: Dict) -> Dict[str, str]:
+    """Tên cột (theo quy ước pandas_ta) của từng chỉ báo trong chiến lược."""
+    macd_suffix = f"{strategy_config['MACD_FAST']}_{strategy_config['MACD_SLOW']}_{strategy_config['MACD_SIGNAL']}"
+    stoch_suffix = f"{strategy_config['STOCH_K']}_{strategy_config['STOCH_D']}_{strategy_config['STOCH_SMOOTH']}"
+    return {
+        'rsi': f"RSI_{strategy_config['RSI_PERIOD']}",
+        'macd': f"MACD_{macd_suffix}",
+        'macd_hist': f"MACDh_{macd_suffix}",
+        'macd_signal': f"MACDs_{macd_suffix}",
+        'sma_short': f"SMA_{strategy_config['SMA_SHORT_PERIOD']}",
+        'sma_long': f"SMA_{strategy_config['SMA_LONG_PERIOD']}",
+        'stoch_k': f"STOCHk_{stoch_suffix}",
+        'stoch_d': f"STOCHd_{stoch_suffix}",
+        'adx': f"ADX_{strategy_config['ADX_PERIOD']}",
+        'dmp': f"DMP_{strategy_config['ADX_PERIOD']}",
+        'dmn': f"DMN_{strategy_config['ADX_PERIOD']}",
+    }
+
+
+def compute_strategy_indicators(high, low, close, strategy_config: Dict, names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Tính các chỉ báo của chiến lược trên mảng 1D hoặc 2D.
+
+    Args:
+        names: Tên chỉ báo logic (khóa của `strategy_columns`) cần tính; None = tất cả.
+               Các chỉ báo tính chung một lần (MACD, Stoch, ADX) được trả về đủ bộ.
+
+    Returns:
+        dict: Tên cột pandas_ta -> mảng cùng kích thước với `close`,
+              theo đúng thứ tự cột mà pandas_ta thêm vào DataFrame.
+    """
+    cols = strategy_columns(strategy_config)
+    wanted = set(cols) if names is None else set(names)
+    values = {}
+    if 'rsi' in wanted:
+        values[cols['rsi']] = rsi(close, strategy_config['RSI_PERIOD'])
+    if wanted & {'macd', 'macd_hist', 'macd_signal'}:
+        macd_line, macd_hist, macd_signal = macd(
+            close, strategy_config['MACD_FAST'], strategy_config['MACD_SLOW'], strategy_config['MACD_SIGNAL']
+        )
+        values[cols['macd']] = macd_line
+        values[cols['macd_hist']] = macd_hist
+        values[cols['macd_signal']] = macd_signal
+    if 'sma_short' in wanted:
+        values[cols['sma_short']] = sma(close, strategy_config['SMA_SHORT_PERIOD'])
+    if 'sma_long' in wanted:
+        values[cols['sma_long']] = sma(close, strategy_config['SMA_LONG_PERIOD'])
+    if wanted & {'stoch_k', 'stoch_d'}:
+        stoch_k, stoch_d = stoch(
+            high, low, close, strategy_config['STOCH_K'], strategy_config['STOCH_D'], strategy_config['STOCH_SMOOTH']
+        )
+        values[cols['stoch_k']] = stoch_k
+        values[cols['stoch_d']] = stoch_d
+    if wanted & {'adx', 'dmp', 'dmn'}:
+        adx_, dmp, dmn = adx(high, low, close, strategy_config['ADX_PERIOD'])
+        values[cols['adx']] = adx_
+        values[cols['dmp']] = dmp
+        values[cols['dmn']] = dmn
+    return values
+
+
+def append_strategy_indicators(df, strategy_config: Dict, names: Optional[Iterable[str]] = None):
+    """Thêm các cột chỉ báo vào DataFrame OHLC (thay cho chuỗi lệnh `df.ta.*(append=True)`)."""
+    values = compute_strategy_indicators(
+        df['high'].to_numpy(dtype=np.float64),
+        df['low'].to_numpy(dtype=np.float64),
+        df['close'].to_numpy(dtype=np.float64),
+        strategy_config,
+        names=names,
+    )
+    for col, arr in values.items():
+        df[col] = arr
+    return df
+
+
+class IndicatorStream:
+    """
+    Tính bộ chỉ báo của chiến lược trên các đoạn (chunk) nối tiếp nhau của cùng một chuỗi 1D,
+    cho kết quả giống hệt việc tính một lần trên toàn bộ chuỗi.
+
+    - EMA/RMA (MACD, RSI, ATR/ADX) mang trạng thái đệ quy qua ranh giới đoạn.
+    - Các chỉ báo cửa sổ (SMA, Stoch) và các phép dịch (diff, true range, DM) được tính trên
+      đoạn mới ghép với phần đuôi của các nến trước, đủ dài để mọi cửa sổ đều trọn vẹn.
+    Bộ nhớ giữ lại chỉ gồm phần đuôi này và các trạng thái, không phụ thuộc độ dài lịch sử.
+    """
+
+    def __init__(self, strategy_config: Dict, names: Optional[Iterable[str]] = None):
+        self.config = strategy_config
+        self.columns = strategy_columns(strategy_config)
+        self.wanted = set(self.columns) if names is None else set(names)
+        cfg = strategy_config
+        # Số nến trước cần giữ lại để mọi cửa sổ/phép dịch của nến đầu đoạn mới đều đủ dữ liệu
+        self.tail_length = max(
+            1,
+            cfg['SMA_SHORT_PERIOD'] - 1,
+            cfg['SMA_LONG_PERIOD'] - 1,
+            (cfg['STOCH_K'] - 1) + (cfg['STOCH_SMOOTH'] - 1) + (cfg['STOCH_D'] - 1),
+        )
+        self._tail = {key: np.empty((1, 0)) for key in ('high', 'low', 'close')}
+        self._ema_fast = new_ema_state(1)
+        self._ema_slow = new_ema_state(1)
+        self._ema_signal = new_ema_state(1)
+        self._rsi_pos = new_ewm_state(1)
+        self._rsi_neg = new_ewm_state(1)
+        self._atr = new_ewm_state(1)
+        self._dm_pos = new_ewm_state(1)
+        self._dm_neg = new_ewm_state(1)
+        self._adx = new_ewm_state(1)
+
+    def update(self, high, low, close) -> Dict[str, np.ndarray]:
+        """Nhận đoạn nến tiếp theo, trả về dict tên cột -> mảng 1D chỉ báo của đúng các nến trong đoạn."""
+        chunk = {
+            'high': np.asarray(high, dtype=np.float64)[None, :],
+            'low': np.asarray(low, dtype=np.float64)[None, :],
+            'close': np.asarray(close, dtype=np.float64)[None, :],
+        }
+        m = chunk['close'].shape[1]
+        ext = {key: np.concatenate([self._tail[key], chunk[key]], axis=1) for key in chunk}
+        h, l, c = ext['high'], ext['low'], ext['close']
+        cfg, cols, wanted = self.config, self.columns, self.wanted
+
+        def new_part(x):
+            return x[:, -m:] if m else x[:, :0]
+
+        values = {}
+        if 'rsi' in wanted:
+            values[cols['rsi']] = _rsi_from_diff(
+                new_part(c - _shift_2d(c)), cfg['RSI_PERIOD'], self._rsi_pos, self._rsi_neg
+            )
+        if wanted & {'macd', 'macd_hist', 'macd_signal'}:
+            x = chunk['close']
+            macd_line = _ema_2d(x, cfg['MACD_FAST'], self._ema_fast) - _ema_2d(x, cfg['MACD_SLOW'], self._ema_slow)
+            signal_line = _ema_2d(macd_line, cfg['MACD_SIGNAL'], self._ema_signal)
+            values[cols['macd']] = macd_line
+            values[cols['macd_hist']] = macd_line - signal_line
+            values[cols['macd_signal']] = signal_line
+        if 'sma_short' in wanted:
+            values[cols['sma_short']] = new_part(_rolling_2d(c, cfg['SMA_SHORT_PERIOD'], np.mean))
+        if 'sma_long' in wanted:
+            values[cols['sma_long']] = new_part(_rolling_2d(c, cfg['SMA_LONG_PERIOD'], np.mean))
+        if wanted & {'stoch_k', 'stoch_d'}:
+            stoch_k = _rolling_2d(_stoch_raw(h, l, c, cfg['STOCH_K']), cfg['STOCH_SMOOTH'], np.mean)
+            values[cols['stoch_k']] = new_part(stoch_k)
+            values[cols['stoch_d']] = new_part(_rolling_2d(stoch_k, cfg['STOCH_D'], np.mean))
+        if wanted & {'adx', 'dmp', 'dmn'}:
+            length = cfg['ADX_PERIOD']
+            atr_ = _rma_2d(new_part(_true_range(h, l, c, _shift_2d(c))), length, self._atr)
+            pos, neg = _directional_movement(h, l, _shift_2d(h), _shift_2d(l))
+            adx_, dmp, dmn = _adx_from_components(
+                atr_,
+                _rma_2d(new_part(pos), length, self._dm_pos),
+                _rma_2d(new_part(neg), length, self._dm_neg),
+                length,
+                self._adx,
+            )
+            values[cols['adx']] = adx_
+            values[cols['dmp']] = dmp
+            values[cols['dmn']] = dmn
+
+        self._tail = {key: arr[:, -self.tail_length:] for key, arr in ext.items()}
+        ordered = [col for col in cols.values() if col in values]
+        return {col: values[col][0] for col in ordered}
+
+
+# ---------------------------------------------------------------------------
+# Đối chiếu với pandas_ta
+# ---------------------------------------------------------------------------
+
+def validate_against_pandas_ta(df=None, strategy_config: Optional[Dict] = None, rtol: float = 1e-7) -> Dict[str, float]:
+    """
+    So sánh kết quả của thư viện với pandas_ta trên cùng dữ liệu OHLC.
+    Cần cài pandas_ta; chỉ dùng khi kiểm tra, không import ở luồng chạy chính.
+
+    Returns:
+        dict: Tên cột -> sai lệch tuyệt đối lớn nhất. Ném AssertionError nếu vượt `rtol`.
+    """
+    import json
+    import os
+    import pandas as pd
+    import pandas_ta  # noqa: F401  (đăng ký accessor df.ta)
+
+    if strategy_config is None:
+        with open(os.path.join(os.path.dirname(__file__), 'strategy_config.json'), 'r') as f:
+            strategy_config = json.load(f)
+    if df is None:
+        rng = np.random.default_rng(42)
+        close = 20000 + np.cumsum(rng.normal(0, 150, 1500)).round(-1)
+        spread = np.abs(rng.normal(0, 120, len(close))).round(-1)
+        df = pd.DataFrame({
+            'open': close + rng.normal(0, 50, len(close)).round(-1),
+            'high': close + spread,
+            'low': close - spread,
+            'close': close,
+            'volume': rng.integers(1e5, 1e6, len(close)).astype(float),
+        })
+
+    expected = df.copy()
+    expected.ta.rsi(length=strategy_config['RSI_PERIOD'], append=True)
+    expected.ta.macd(fast=strategy_config['MACD_FAST'], slow=strategy_config['MACD_SLOW'], signal=strategy_config['MACD_SIGNAL'], append=True)
+    expected.ta.sma(length=strategy_config['SMA_SHORT_PERIOD'], append=True)
+    expected.ta.sma(length=strategy_config['SMA_LONG_PERIOD'], append=True)
+    expected.ta.stoch(k=strategy_config['STOCH_K'], d=strategy_config['STOCH_D'], smooth_k=strategy_config['STOCH_SMOOTH'], append=True)
+    expected.ta.adx(length=strategy_config['ADX_PERIOD'], append=True)
+    expected.ta.atr(length=strategy_config['ADX_PERIOD'], append=True)
+
+    actual = append_strategy_indicators(df.copy(), strategy_config)
+    actual[f"ATRr_{strategy_config['ADX_PERIOD']}"] = atr(
+        df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), strategy_config['ADX_PERIOD']
+    )
+
+    report = {}
+    for col in actual.columns.difference(df.columns):
+        exp = expected[col].to_numpy(dtype=np.float64)
+        act = actual[col].to_numpy(dtype=np.float64)
+        assert np.array_equal(np.isnan(exp), np.isnan(act)), f"Vị trí NaN khác nhau ở cột {col}"
+        both = ~np.isnan(exp)
+        assert np.allclose(act[both], exp[both], rtol=rtol, atol=1e-9), f"Sai lệch vượt ngưỡng ở cột {col}"
+        report[col] = float(np.max(np.abs(act[both] - exp[both]))) if both.any() else 0.0
+    return report
+
+
+if __name__ == '__main__':
+    print(f"numba: {'có' if NUMBA_AVAILABLE else 'không'}")
+    for column, max_diff in validate_against_pandas_ta().items():
+        print(f"{column:<20} sai lệch lớn nhất = {max_diff:.3e}")
+    print(">>> Kết quả khớp với pandas_ta.")
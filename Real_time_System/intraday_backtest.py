@@ -0,0 +1,199 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtest import TradeSimulator, _rule_columns, load_market_states, thresholds_for_states
+from historical_data_fetcher import fetch_historical_data
+from indicators import IndicatorStream
+from rules import STRATEGY_INDICATORS, compile_vector_evaluator, rule_labels
+
+# --- Backtest intraday (nến 1m/5m...) theo từng đoạn ---
+# Lịch sử nhiều năm nến phút được tải và xử lý theo từng đoạn `chunk_days` ngày: chỉ báo mang
+# trạng thái qua ranh giới đoạn (IndicatorStream), quy tắc được xét với nến cuối của đoạn trước,
+# TradeSimulator giữ lại nến cuối chờ giá mở cửa của đoạn sau, và kết quả của mỗi đoạn được ghi
+# ngay ra file. Bộ nhớ đỉnh chỉ phụ thuộc độ dài một đoạn; kết quả giống hệt khi tải một lần.
+INTRADAY_RESOLUTIONS = ('1m', '5m', '15m', '30m', '1h')
+DEFAULT_CHUNK_DAYS = 20
+DEFAULT_DAYS_BACK = 365
+DEFAULT_MARKET_STATE = 'LOW_VOLATILITY'
+
+
+def iter_history_chunks(
+    ticker: str,
+    start: Optional[str],
+    end: Optional[str],
+    by: str,
+    chunk_days: Optional[int] = DEFAULT_CHUNK_DAYS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Tải lịch sử nến `by` của một mã theo từng cửa sổ `chunk_days` ngày (None = tải một lần).
+    Ngày `end` được tính trọn ngày; các nến trùng ở ranh giới hai cửa sổ bị loại.
+    """
+    start_dt = pd.Timestamp(start) if start else pd.Timestamp(datetime.now() - timedelta(days=DEFAULT_DAYS_BACK)).normalize()
+    end_dt = pd.Timestamp(end) if end else pd.Timestamp(datetime.now()).normalize()
+    step = pd.Timedelta(days=chunk_days) if chunk_days else end_dt - start_dt + pd.Timedelta(days=1)
+
+    last_ts = None
+    cursor = start_dt
+    while cursor <= end_dt:
+        window_end = min(cursor + step - pd.Timedelta(days=1), end_dt)
+        df = fetch_historical_data(ticker, by=by, from_date=cursor.to_pydatetime(), to_date=window_end.to_pydatetime())
+        cursor = window_end + pd.Timedelta(days=1)
+        if df is None or df.empty:
+            continue
+        df = df.sort_index()
+        df = df[(df.index >= start_dt) & (df.index < end_dt + pd.Timedelta(days=1))]
+        if last_ts is not None:
+            df = df[df.index > last_ts]
+        if df.empty:
+            continue
+        last_ts = df.index[-1]
+        yield df
+
+
+def intraday_market_states(index: pd.DatetimeIndex, daily_states: pd.Series) -> np.ndarray:
+    """
+    Trạng thái thị trường cho từng nến trong ngày: lấy trạng thái của phiên liền trước
+    (trạng thái EOD của chính ngày đó chỉ biết được sau khi đóng cửa).
+    """
+    daily_dates = daily_states.index.normalize().to_numpy()
+    values = daily_states.to_numpy(dtype=object)
+    pos = np.searchsorted(daily_dates, index.normalize().to_numpy(), side='left') - 1
+    states = np.full(len(index), DEFAULT_MARKET_STATE, dtype=object)
+    valid = pos >= 0
+    states[valid] = values[pos[valid]]
+    return states
+
+
+class IntradaySignalPipeline:
+    """Chỉ báo + trạng thái thị trường + quy tắc cho từng đoạn nến, mang trạng thái giữa các đoạn."""
+
+    def __init__(self, strategy_config: Dict, daily_states: pd.Series):
+        self.stream = IndicatorStream(strategy_config, names=STRATEGY_INDICATORS)
+        self.evaluate, _ = compile_vector_evaluator(strategy_config)
+        self.rule_columns = sorted(_rule_columns(strategy_config))
+        self.daily_states = daily_states
+        signals, reasons = rule_labels()
+        self._signal_lookup = np.array([None] + signals, dtype=object)
+        self._reason_lookup = np.array([None] + reasons, dtype=object)
+        self._prev = None  # Giá trị nến cuối của đoạn trước (cho các điều kiện cắt)
+
+    def process(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        df = chunk.copy()
+        indicator_values = self.stream.update(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+        )
+        for col, arr in indicator_values.items():
+            df[col] = arr
+        df['market_state'] = intraday_market_states(df.index, self.daily_states)
+
+        values = {col: df[col].to_numpy(dtype=np.float64) for col in self.rule_columns}
+        thresholds = thresholds_for_states(df['market_state'].to_numpy())
+        if self._prev is None:
+            rule_index = self.evaluate(values, thresholds)
+        else:
+            prev_values, prev_thresholds = self._prev
+            rule_index = self.evaluate(
+                {k: np.concatenate([prev_values[k], v]) for k, v in values.items()},
+                {k: np.concatenate([prev_thresholds[k], v]) for k, v in thresholds.items()},
+            )[1:]
+        self._prev = ({k: v[-1:] for k, v in values.items()}, {k: v[-1:] for k, v in thresholds.items()})
+
+        df['signal'] = self._signal_lookup[rule_index + 1]
+        df['signal_reason'] = self._reason_lookup[rule_index + 1]
+        return df
+
+
+class CsvChunkSink:
+    """Ghi nối tiếp kết quả từng đoạn vào intraday_<bảng>_<mã>_<khung>.csv."""
+
+    def __init__(self, outdir: str, ticker: str, by: str):
+        self._paths = {
+            table: os.path.join(outdir, f'intraday_{table}_{ticker}_{by}.csv')
+            for table in ('signals', 'trades', 'equity')
+        }
+        for path in self._paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        path = self._paths[table]
+        df.to_csv(path, mode='a', header=not os.path.exists(path), index=table != 'trades')
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetChunkSink:
+    """Ghi nối tiếp kết quả từng đoạn vào dataset Parquet (phân vùng run_id/ticker)."""
+
+    def __init__(self, outdir: str, run_id: str, ticker: str, strategy_config: Dict):
+        from results_store import PartitionWriter
+
+        self._writers = {
+            table: PartitionWriter(outdir, table, run_id, ticker, strategy_config)
+            for table in ('signals', 'trades', 'equity')
+        }
+
+    def write(self, table: str, df: pd.DataFrame) -> None:
+        self._writers[table].write(df)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+
+
+def backtest_intraday_ticker(
+    ticker: str,
+    start: Optional[str],
+    end: Optional[str],
+    by: str,
+    fee_bps: float,
+    strategy_config: Dict,
+    sink,
+    chunk_days: Optional[int] = DEFAULT_CHUNK_DAYS,
+    market_states: Optional[pd.Series] = None,
+    chunks: Optional[Iterator[pd.DataFrame]] = None,
+) -> Dict:
+    """
+    Backtest intraday một mã theo từng đoạn và ghi kết quả mỗi đoạn vào `sink`.
+    Có thể truyền sẵn `chunks` (các DataFrame OHLCV nối tiếp) thay cho việc tải từ FiinQuantX.
+
+    Returns:
+        dict: Các chỉ số giống simulate_trades, thêm số nến và số đoạn đã xử lý.
+    """
+    if market_states is None:
+        market_states = load_market_states(start, end)
+    if chunks is None:
+        chunks = iter_history_chunks(ticker, start, end, by, chunk_days)
+
+    pipeline = IntradaySignalPipeline(strategy_config, market_states)
+    simulator = TradeSimulator(fee_bps)
+    num_bars = 0
+    num_chunks = 0
+    try:
+        for chunk in chunks:
+            missing = {'open', 'high', 'low', 'close', 'volume'} - set(chunk.columns)
+            if missing:
+                raise RuntimeError(f"Thiếu cột dữ liệu {missing} cho {ticker}")
+            sig_df = pipeline.process(chunk)
+            trades, equity_curve = simulator.feed(sig_df.index, sig_df['open'].to_numpy(), sig_df['signal'].to_numpy())
+
+            sink.write('signals', sig_df)
+            sink.write('trades', pd.DataFrame(trades))
+            sink.write('equity', pd.DataFrame(equity_curve, columns=['timestamp', 'equity']).set_index('timestamp'))
+            num_bars += len(sig_df)
+            num_chunks += 1
+    finally:
+        sink.close()
+
+    if num_bars == 0:
+        raise RuntimeError(f"Khoảng thời gian không có dữ liệu {by} cho {ticker}")
+    return {**simulator.metrics(), 'num_bars': num_bars, 'num_chunks': num_chunks}
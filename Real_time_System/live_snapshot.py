@@ -0,0 +1,194 @@
+import threading
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+import config
+from indicators import strategy_columns
+from rules import ACTIVE_GROUPS, STRATEGY_INDICATORS, rule_labels
+
+# --- Ảnh chụp trực tiếp chỉ báo theo mã trong bộ nhớ dùng chung ---
+# main.py (bên ghi duy nhất) ghi giá cuối, giá trị chỉ báo và cờ nhóm điều kiện của mỗi mã vào một khối
+# multiprocessing.shared_memory có bố cục cố định; dashboard gắn vào khối theo tên và sao chép cả bảng
+# mà không cần đọc đĩa hay gọi qua lại giữa hai tiến trình.
+# Tính nhất quán dùng seqlock: bên ghi tăng `seq` lên số lẻ trước khi ghi và lên số chẵn sau khi ghi xong;
+# bên đọc sao chép bảng rồi chỉ chấp nhận bản sao nếu `seq` chẵn và không đổi trong lúc sao chép.
+SNAPSHOT_NAME = config.LIVE_SNAPSHOT_NAME
+MAGIC = b'RTSNAP01'
+INDICATOR_FIELDS = tuple(sorted(STRATEGY_INDICATORS))
+SIGNALS, _ = rule_labels()
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('seq', '<u8'),
+    ('capacity', '<u4'),
+    ('count', '<u4'),
+    ('record_size', '<u4'),  # Phát hiện bố cục khác phiên bản (thêm/bớt chỉ báo hay nhóm điều kiện)
+    ('reserved', 'V4'),
+    ('updated_ns', '<i8'),
+])
+RECORD_DTYPE = np.dtype(
+    [('ticker', 'S16'), ('price', '<f8')]
+    + [(name, '<f8') for name in INDICATOR_FIELDS]
+    + [(f'flag_{group}', 'u1') for group in ACTIVE_GROUPS]
+    + [('signal', '<i2'), ('updated_ns', '<i8')]  # signal: chỉ số trong rule_labels(), -1 = không có
+)
+MAX_READ_ATTEMPTS = 1000
+
+
+def _block_size(capacity: int) -> int:
+    return HEADER_DTYPE.itemsize + capacity * RECORD_DTYPE.itemsize
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Gắn vào khối đã có mà không để resource_tracker của tiến trình đọc xóa khối khi thoát."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SnapshotWriter:
+    """Bên ghi ảnh chụp (tiến trình stream); mỗi mã một hàng cố định, cấp theo thứ tự xuất hiện."""
+
+    def __init__(
+        self,
+        strategy_config: Dict,
+        tickers: Iterable[str] = (),
+        capacity: int = config.LIVE_SNAPSHOT_CAPACITY,
+        name: str = SNAPSHOT_NAME,
+    ):
+        self._columns = {field: col for field, col in strategy_columns(strategy_config).items() if field in INDICATOR_FIELDS}
+        self._signal_index = {signal: i for i, signal in enumerate(SIGNALS)}
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=_block_size(capacity))
+        except FileExistsError:
+            # Khối còn sót lại từ lần chạy trước bị dừng đột ngột
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=_block_size(capacity))
+        self._header = np.ndarray(1, dtype=HEADER_DTYPE, buffer=self._shm.buf)
+        self._records = np.ndarray(capacity, dtype=RECORD_DTYPE, buffer=self._shm.buf, offset=HEADER_DTYPE.itemsize)
+        self._records[:] = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._records['signal'] = -1
+        self._header[0] = (MAGIC, 0, capacity, 0, RECORD_DTYPE.itemsize, b'', 0)
+        for ticker in tickers:
+            self._row(ticker)
+
+    def _row(self, ticker: str) -> Optional[int]:
+        row = self._rows.get(ticker)
+        if row is None:
+            row = len(self._rows)
+            if row >= self._records.shape[0]:
+                return None  # Hết chỗ: bỏ qua mã mới, không ghi đè mã khác
+            self._rows[ticker] = row
+            self._records['ticker'][row] = ticker.encode('utf-8')[:16]
+            self._header['count'] = row + 1
+        return row
+
+    def update(self, ticker: str, last: Dict[str, float], flags: Dict[str, bool], signal: Optional[str]) -> None:
+        """Ghi trạng thái mới nhất của một mã (`last` là dict tên cột chỉ báo -> giá trị, kèm 'close')."""
+        now = time.time_ns()
+        record = (
+            ticker.encode('utf-8')[:16],
+            last['close'],
+            *(last.get(self._columns[field], np.nan) for field in INDICATOR_FIELDS),
+            *(bool(flags.get(group, False)) for group in ACTIVE_GROUPS),
+            self._signal_index.get(signal, -1),
+            now,
+        )
+        with self._lock:
+            self._header['seq'] += 1  # lẻ: đang ghi
+            row = self._row(ticker)
+            if row is not None:
+                self._records[row] = record
+                self._header['updated_ns'] = now
+            self._header['seq'] += 1  # chẵn: ghi xong
+
+    def update_many(self, tickers, last: Dict[str, np.ndarray], flags: Dict[str, np.ndarray], signals) -> None:
+        """
+        Ghi trạng thái của nhiều mã trong một lần ghi (micro-batch): `last` và `flags` là dict tên cột /
+        tên nhóm -> mảng theo thứ tự của `tickers`, `signals` là danh sách tín hiệu (None = không có).
+        """
+        now = time.time_ns()
+        batch = np.zeros(len(tickers), dtype=RECORD_DTYPE)
+        batch['ticker'] = [ticker.encode('utf-8')[:16] for ticker in tickers]
+        batch['price'] = last['close']
+        for field in INDICATOR_FIELDS:
+            batch[field] = last.get(self._columns[field], np.nan)
+        for group in ACTIVE_GROUPS:
+            batch[f'flag_{group}'] = flags.get(group, False)
+        batch['signal'] = [self._signal_index.get(signal, -1) for signal in signals]
+        batch['updated_ns'] = now
+        with self._lock:
+            self._header['seq'] += 1  # lẻ: đang ghi
+            rows = [self._row(ticker) for ticker in tickers]
+            keep = np.array([row is not None for row in rows], dtype=bool)
+            self._records[np.array([row for row in rows if row is not None], dtype=np.intp)] = batch[keep]
+            self._header['updated_ns'] = now
+            self._header['seq'] += 1  # chẵn: ghi xong
+
+    def close(self) -> None:
+        del self._header, self._records
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _copy_records(shm: shared_memory.SharedMemory) -> Optional[np.ndarray]:
+    """Sao chép các hàng đã dùng theo giao thức seqlock; các view trên khối được giải phóng khi hàm trả về."""
+    header = np.ndarray(1, dtype=HEADER_DTYPE, buffer=shm.buf)
+    if header['magic'][0] != MAGIC or int(header['record_size'][0]) != RECORD_DTYPE.itemsize:
+        return None
+    records = np.ndarray(int(header['capacity'][0]), dtype=RECORD_DTYPE, buffer=shm.buf, offset=HEADER_DTYPE.itemsize)
+    for _ in range(MAX_READ_ATTEMPTS):
+        seq = int(header['seq'][0])
+        if seq % 2:
+            time.sleep(0)
+            continue
+        copy = records[:int(header['count'][0])].copy()
+        if int(header['seq'][0]) == seq:
+            return copy
+    return None
+
+
+def read_snapshot(name: str = SNAPSHOT_NAME):
+    """
+    Đọc một bản sao nhất quán của toàn bộ ảnh chụp.
+
+    Returns:
+        pd.DataFrame: Mỗi mã một dòng (ticker, price, các chỉ báo, flag_<nhóm>, signal, updated, age_s),
+                      hoặc None nếu tiến trình stream chưa tạo khối / bố cục không khớp.
+    """
+    import pandas as pd
+
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return None
+    try:
+        copy = _copy_records(shm)
+    finally:
+        shm.close()
+    if copy is None:
+        return None
+
+    df = pd.DataFrame(copy)
+    df['ticker'] = df['ticker'].str.decode('utf-8')
+    for group in ACTIVE_GROUPS:
+        df[f'flag_{group}'] = df[f'flag_{group}'].astype(bool)
+    labels = np.array([None] + SIGNALS, dtype=object)
+    df['signal'] = labels[df['signal'].to_numpy() + 1]
+    updated_ns = df.pop('updated_ns')
+    local_tz = datetime.now().astimezone().tzinfo
+    df['updated'] = pd.to_datetime(updated_ns, unit='ns', utc=True).dt.tz_convert(local_tz).dt.tz_localize(None)
+    df['age_s'] = (time.time_ns() - updated_ns) / 1e9
+    return df[df['price'] > 0].reset_index(drop=True)
@@ -3,13 +3,22 @@ from logging.handlers import RotatingFileHandler
 import sys
 from config import LOG_FILE
 
+LOGGER_NAME = 'SignalLogger'
+
 def setup_logger():
-    """Thiết lập logger để ghi log ra file và console."""
+    """
+    Thiết lập logger để ghi log ra file và console.
+    Được gọi khi tiến trình khởi động (không chạy lúc import) để việc import không mở file log.
+    """
     
     # Tạo logger chính
-    logger = logging.getLogger('SignalLogger')
+    logger = logging.getLogger(LOGGER_NAME)
     logger.setLevel(logging.INFO)
 
+    # Kiểm tra để không thêm handler nhiều lần nếu hàm được gọi lại
+    if logger.handlers:
+        return logger
+
     # Định dạng log message
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -33,12 +42,10 @@ def setup_logger():
     stream_handler.setFormatter(formatter)
 
     # Thêm các handler vào logger
-    # Kiểm tra để không thêm handler nhiều lần nếu hàm được gọi lại
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+    logger.addHandler(file_handler)
+    logger.addHandler(stream_handler)
 
     return logger
 
-# Tạo một instance logger để sử dụng trong toàn bộ dự án
-signal_logger = setup_logger()
+# Logger dùng chung trong toàn bộ dự án; handler được gắn khi gọi setup_logger()
+signal_logger = logging.getLogger(LOGGER_NAME)
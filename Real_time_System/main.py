@@ -2,11 +2,20 @@ import time
 import csv
 import os
 from datetime import datetime
-from FiinQuantX import FiinSession, RealTimeData
 
 import config
-from logger_config import signal_logger
-from signal_detector import detect_signal
+from logger_config import setup_logger, signal_logger
+import signal_detector
+from signal_detector import detect_signal, detect_signals_batch, get_fast_path_stats, warm_start
+
+# Kho tick trong ngày, mở trong main() nếu config.TICK_STORE_ENABLED
+tick_store = None
+# Bộ gom lô tick, tạo trong main() nếu config.MICRO_BATCH_ENABLED
+micro_batcher = None
+# Kho tín hiệu SQLite, mở trong main() nếu config.SIGNAL_STORE_ENABLED
+signal_store = None
+# Điều khiển chụp profile theo yêu cầu, bật trong main() nếu config.PROFILER_ENABLED
+profiler_control = None
 
 def write_signal_to_csv(timestamp, ticker, signal, price, details):
     """Ghi tín hiệu vào file CSV."""
@@ -20,7 +29,39 @@ def write_signal_to_csv(timestamp, ticker, signal, price, details):
     except Exception as e:
         signal_logger.error(f"Lỗi khi ghi file CSV: {e}")
 
-def on_event(data: RealTimeData):
+def dispatch_signal(data, signal, details):
+    """Ghi log cảnh báo và lưu tín hiệu của một tick."""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    ticker = data.Ticker
+    price = data.Close
+    
+    message = (
+        f"--- CẢNH BÁO TÍN HIỆU ---\n"
+        f" Cổ phiếu: {ticker}\n"
+        f" Tín hiệu: {signal}\n"
+        f" Giá hiện tại: {price}\n"
+        f" Chi tiết: {details}\n"
+        f" Thời gian: {timestamp}"
+    )
+    signal_logger.warning(message)
+    if signal_store is not None:
+        try:
+            signal_store.insert(timestamp, ticker, signal, price, details)
+        except Exception as e:
+            signal_logger.error(f"Lỗi khi ghi tín hiệu vào kho SQLite: {e}")
+    if config.SIGNAL_CSV_ENABLED:
+        write_signal_to_csv(timestamp, ticker, signal, price, details)
+
+
+def process_batch(batch):
+    """Xử lý một lô tick do MicroBatcher gom, rồi phát tín hiệu của từng tick."""
+    for data, (signal, details, fresh) in zip(batch, detect_signals_batch(batch)):
+        # Tick trùng lặp trả về quyết định đã báo trước đó: không phát lại cảnh báo
+        if signal and fresh:
+            dispatch_signal(data, signal, details)
+
+
+def on_event(data):
     """
     Hàm callback được gọi mỗi khi có dữ liệu mới từ FiinQuantX.
     """
@@ -30,41 +71,88 @@ def on_event(data: RealTimeData):
 
     try:
         signal_logger.info(f"Nhận data: {data.Ticker}, Giá: {data.Close}, Thời gian: {getattr(data, 'Time', 'N/A')}")
+        if tick_store is not None:
+            try:
+                tick_store.append_tick(data)
+            except Exception as e:
+                signal_logger.error(f"Lỗi khi ghi tick vào kho: {e}")
+
+        if micro_batcher is not None:
+            micro_batcher.submit(data)
+            return
         
         # Gọi hàm detect_signal mới
-        signal, details = detect_signal(data)
+        signal, details, fresh = detect_signal(data)
         
-        if signal:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            ticker = data.Ticker
-            price = data.Close
-            
-            message = (
-                f"--- CẢNH BÁO TÍN HIỆU ---\n"
-                f" Cổ phiếu: {ticker}\n"
-                f" Tín hiệu: {signal}\n"
-                f" Giá hiện tại: {price}\n"
-                f" Chi tiết: {details}\n"
-                f" Thời gian: {timestamp}"
-            )
-            signal_logger.warning(message)
-            write_signal_to_csv(timestamp, ticker, signal, price, details)
+        if signal and fresh:
+            dispatch_signal(data, signal, details)
             
     except Exception as e:
         signal_logger.error(f"Lỗi trong hàm on_event cho {getattr(data, 'Ticker', 'Unknown Ticker')}: {e}", exc_info=True)
 
 
-def main():
+def main(argv=None):
+    global tick_store, micro_batcher, signal_store, profiler_control
+    setup_logger()
     signal_logger.info("--- Bắt đầu hệ thống cảnh báo Real-time ---")
     
     client = None
     try:
+        # Import FiinQuantX khi chạy thật để việc import module không bị chậm
+        from FiinQuantX import FiinSession
         client = FiinSession(username=config.FIINQUANT_USERNAME, password=config.FIINQUANT_PASSWORD).login()
         signal_logger.info("Đăng nhập FiinQuantX thành công.")
     except Exception as e:
         signal_logger.error(f"Đăng nhập FiinQuantX thất bại: {e}")
         return
 
+    # Nạp trạng thái khởi động ấm do job tiền phiên của scheduler chuẩn bị (nếu có)
+    try:
+        from history_cache import load_warm_state
+        state = load_warm_state()
+        if state:
+            signal_logger.info(f"Khởi động ấm: đã nạp lịch sử cho {warm_start(state)} mã (tạo lúc {state['created_at']:%Y-%m-%d %H:%M}).")
+        else:
+            signal_logger.info("Không có trạng thái khởi động ấm còn hạn, bắt đầu từ bộ nhớ đệm rỗng.")
+    except Exception as e:
+        signal_logger.warning(f"Không nạp được trạng thái khởi động ấm: {e}")
+
+    if config.TICK_STORE_ENABLED:
+        from tick_store import TickStore
+        tick_store = TickStore(config.TICK_STORE_DIR)
+        signal_logger.info(f"Ghi tick trong ngày vào {config.TICK_STORE_DIR}")
+
+    if config.SIGNAL_STORE_ENABLED:
+        from signal_store import SignalWriter
+        signal_store = SignalWriter(config.SIGNAL_DB_FILE)
+        signal_logger.info(f"Ghi tín hiệu vào kho SQLite {config.SIGNAL_DB_FILE}")
+
+    snapshot_writer = None
+    if config.LIVE_SNAPSHOT_ENABLED:
+        from live_snapshot import SnapshotWriter
+        try:
+            snapshot_writer = SnapshotWriter(signal_detector.get_strategy_config(), config.TICKERS_WATCHLIST)
+            signal_detector.live_snapshot = snapshot_writer
+            signal_logger.info(f"Ghi ảnh chụp chỉ báo trực tiếp vào bộ nhớ dùng chung '{config.LIVE_SNAPSHOT_NAME}'")
+        except OSError as e:
+            signal_logger.warning(f"Không tạo được ảnh chụp trực tiếp trong bộ nhớ dùng chung: {e}")
+
+    if config.MICRO_BATCH_ENABLED:
+        from micro_batch import MicroBatcher
+        micro_batcher = MicroBatcher(process_batch, config.MICRO_BATCH_WINDOW_MS, config.MICRO_BATCH_MAX_SIZE)
+        micro_batcher.start()
+        signal_logger.info(
+            f"Micro-batching: cửa sổ {config.MICRO_BATCH_WINDOW_MS} ms, tối đa {config.MICRO_BATCH_MAX_SIZE} tick/lô."
+        )
+
+    if config.PROFILER_ENABLED:
+        from profiler_control import ProfilerControl
+        try:
+            profiler_control = ProfilerControl()
+            profiler_control.start()
+        except OSError as e:
+            signal_logger.warning(f"Không bật được điều khiển profiler: {e}")
+
     ticker_events = None
     try:
         tickers_to_stream = config.TICKERS_WATCHLIST
@@ -85,6 +173,28 @@ def main():
     finally:
         if ticker_events:
             ticker_events.stop()
+        if profiler_control is not None:
+            profiler_control.stop()
+        if micro_batcher is not None:
+            micro_batcher.stop()
+            batch_stats = micro_batcher.get_stats()
+            signal_logger.info(
+                f"Micro-batching: {batch_stats['ticks']} tick trong {batch_stats['batches']} lô "
+                f"(trung bình {batch_stats['avg_batch_size']:.1f} tick/lô), độ trễ trung bình "
+                f"{batch_stats['avg_latency_ms']:.1f} ms, tối đa {batch_stats['max_latency_ms']:.1f} ms."
+            )
+        if tick_store is not None:
+            tick_store.close()
+        if signal_store is not None:
+            signal_store.close()
+        if snapshot_writer is not None:
+            signal_detector.live_snapshot = None
+            snapshot_writer.close()
+        stats = get_fast_path_stats()
+        signal_logger.info(
+            f"Fast path: {stats['ticks_skipped']}/{stats['ticks_total']} tick trùng lặp được bỏ qua "
+            f"({stats['skip_ratio']:.1%}), {stats['indicator_runs']} lần tính chỉ báo."
+        )
         signal_logger.info("--- Hệ thống cảnh báo đã dừng ---")
 
 
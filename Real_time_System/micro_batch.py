@@ -0,0 +1,88 @@
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from logger_config import signal_logger
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Gom các tick đến trong một cửa sổ ngắn thành một lô rồi giao cho `process_batch` trên một luồng riêng.
+
+    - Lô bắt đầu khi tick đầu tiên đến và đóng sau `window_ms` hoặc khi đủ `max_size` tick,
+      nên độ trễ thêm vào mỗi tick bị chặn bởi `window_ms` (cộng thời gian xử lý lô).
+    - Callback của luồng dữ liệu chỉ đưa tick vào hàng đợi nên trả về gần như ngay lập tức.
+    """
+
+    def __init__(self, process_batch: Callable[[List], None], window_ms: float = 5.0, max_size: int = 512):
+        self._process_batch = process_batch
+        self._window = window_ms / 1000.0
+        self._max_size = max(1, int(max_size))
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.stats = {
+            'batches': 0,
+            'ticks': 0,
+            'max_batch_size': 0,
+            'total_latency_s': 0.0,  # Tổng thời gian từ lúc tick vào hàng đợi đến khi xử lý xong
+            'max_latency_s': 0.0,
+        }
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='micro-batch', daemon=True)
+        self._thread.start()
+
+    def submit(self, data) -> None:
+        self._queue.put((time.monotonic(), data))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Xử lý nốt các tick còn trong hàng đợi rồi dừng luồng."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats['avg_batch_size'] = stats['ticks'] / stats['batches'] if stats['batches'] else 0.0
+        stats['avg_latency_ms'] = 1000.0 * stats['total_latency_s'] / stats['ticks'] if stats['ticks'] else 0.0
+        stats['max_latency_ms'] = 1000.0 * stats['max_latency_s']
+        return stats
+
+    def _collect(self, first):
+        """Gom tiếp các tick đến trong cửa sổ tính từ tick đầu tiên; trả về (lô, có lệnh dừng hay không)."""
+        batch = [first]
+        deadline = first[0] + self._window
+        while len(batch) < self._max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            try:
+                self._process_batch([data for _, data in batch])
+            except Exception as e:
+                signal_logger.error(f"Lỗi khi xử lý lô {len(batch)} tick: {e}", exc_info=True)
+            done = time.monotonic()
+            self.stats['batches'] += 1
+            self.stats['ticks'] += len(batch)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            latencies = [done - enqueued for enqueued, _ in batch]
+            self.stats['total_latency_s'] += sum(latencies)
+            self.stats['max_latency_s'] = max(self.stats['max_latency_s'], max(latencies))
@@ -1,19 +1,24 @@
 import json
 import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 import logging
 from historical_data_fetcher import fetch_historical_data
+from indicators import atr, sma
 
 LOGGING_LEVEL = logging.INFO
-logging.basicConfig(level=LOGGING_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'strategy_config.json')
 STATUS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'system_status.json') # File mới để ghi trạng thái
+TICKER_THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'ticker_thresholds.json') # Ngưỡng theo từng mã
 MARKET_PROXY_TICKERS = ['VNINDEX', 'HNXINDEX', 'UPCOMINDEX'] # Phân tích cả 3 sàn chính
 
 ATR_PERIOD = 14
 ATR_AVG_PERIOD = 100 # So sánh ATR hiện tại với trung bình 100 ngày
+REGIME_DAYS_BACK = 250 # Phần lịch sử đã cache dùng cho trạng thái theo từng mã (cần ít nhất ATR_PERIOD + ATR_AVG_PERIOD phiên)
 
 # --- CÁC NGƯỠNG ĐỘNG ---
 # Định nghĩa các bộ tham số cho từng trạng thái thị trường
@@ -46,8 +51,8 @@ def get_market_volatility_state():
             logging.error(f"Không thể lấy dữ liệu cho chỉ số {ticker}. Bỏ qua...")
             continue
 
-        df.ta.atr(length=ATR_PERIOD, append=True)
         atr_col = f'ATRr_{ATR_PERIOD}'
+        df[atr_col] = atr(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(), ATR_PERIOD)
         atr_avg_col = f'ATR_AVG_{ATR_AVG_PERIOD}'
         df[atr_avg_col] = df[atr_col].rolling(window=ATR_AVG_PERIOD).mean()
         
@@ -129,10 +134,131 @@ def update_strategy_config(market_state: str):
         logging.error(f"Lỗi khi cập nhật file cấu hình: {e}", exc_info=True)
 
 
-if __name__ == '__main__':
+# --- TRẠNG THÁI BIẾN ĐỘNG THEO TỪNG MÃ ---
+# Thay vì một trạng thái chung cho mọi mã, so ATR của từng mã với trung bình ATR_AVG_PERIOD phiên của
+# chính nó. Lịch sử lấy từ cache của job tiền phiên (history_cache), ghép thành bảng ngày × mã rồi tính
+# ATR và trung bình trượt cho toàn bộ các mã trong một lần trên mảng 2D (mã × thời gian).
+
+def build_price_panel(history: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Ghép lịch sử các mã thành các bảng high/low/close có chỉ mục ngày và mỗi cột là một mã."""
+    fields = ('high', 'low', 'close')
+    tickers = list(history)
+    dates = pd.DatetimeIndex(np.unique(np.concatenate([history[t].index.to_numpy() for t in tickers])))
+    arrays = {field: np.full((len(dates), len(tickers)), np.nan) for field in fields}
+    for col, ticker in enumerate(tickers):
+        df = history[ticker]
+        rows = dates.searchsorted(df.index)
+        for field in fields:
+            arrays[field][rows, col] = df[field].to_numpy(dtype=np.float64)
+    return {field: pd.DataFrame(arrays[field], index=dates, columns=tickers) for field in fields}
+
+
+def _right_align(panel: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Chuyển các bảng ngày × mã thành mảng mã × thời gian, dồn các phiên có dữ liệu của mỗi mã về bên phải
+    (giữ thứ tự) để NaN chỉ còn ở đầu mỗi hàng: ngày mã không giao dịch không làm đứt chuỗi ATR.
+    Một phiên chỉ hợp lệ khi cả high, low, close đều có giá trị, và cùng một thứ tự được áp cho cả ba
+    trường để chúng luôn thẳng hàng.
+
+    Returns:
+        tuple: ({trường: mảng đã dồn phải}, mảng vị trí (trong chỉ mục ngày) của phiên hợp lệ cuối cùng,
+               -1 nếu mã không có phiên hợp lệ nào).
+    """
+    fields = ('high', 'low', 'close')
+    values = {field: panel[field].to_numpy(dtype=np.float64).T for field in fields}
+    valid = np.logical_and.reduce([np.isfinite(values[field]) for field in fields])
+    order = np.argsort(valid, axis=1, kind='stable')
+    aligned = {field: np.take_along_axis(np.where(valid, values[field], np.nan), order, axis=1) for field in fields}
+    last_valid = np.where(valid.any(axis=1), valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1), -1)
+    return aligned, last_valid
+
+
+def compute_ticker_regimes(panel: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Trạng thái biến động của từng mã từ bảng giá ngày × mã.
+
+    Returns:
+        pd.DataFrame: Chỉ mục là mã; các cột atr, atr_avg, atr_ratio, market_state.
+                      Mã chưa đủ lịch sử để tính ATR trung bình, hoặc có phiên cuối cũ hơn ngày cuối
+                      của bảng (ví dụ đang bị tạm ngừng giao dịch), bị loại.
+    """
+    aligned, last_valid = _right_align(panel)
+    atr_values = atr(aligned['high'], aligned['low'], aligned['close'], ATR_PERIOD)
+    atr_avg = sma(atr_values, ATR_AVG_PERIOD)
+
+    dates = panel['close'].index
+    current = last_valid == len(dates) - 1
+    regimes = pd.DataFrame(
+        {'atr': atr_values[:, -1], 'atr_avg': atr_avg[:, -1]},
+        index=panel['close'].columns,
+    )[current].dropna()
+    regimes['atr_ratio'] = regimes['atr'] / regimes['atr_avg']
+    regimes['market_state'] = np.where(regimes['atr'] > regimes['atr_avg'], 'HIGH_VOLATILITY', 'LOW_VOLATILITY')
+    return regimes
+
+
+def universe_tickers() -> List[str]:
+    """Watchlist cộng mọi mã đã có lịch sử trong cache."""
+    import config
+    from history_cache import HISTORY_DIR
+
+    cached = [name[:-4] for name in os.listdir(HISTORY_DIR) if name.endswith('.pkl')] if os.path.isdir(HISTORY_DIR) else []
+    return sorted(set(config.TICKERS_WATCHLIST) | set(cached))
+
+
+def update_ticker_thresholds(tickers: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Tính trạng thái biến động cho từng mã và ghi bảng tra mã -> trạng thái vào ticker_thresholds.json.
+    Bộ phát hiện tín hiệu tra ngưỡng theo mã từ file này, mã không có trong file dùng ngưỡng chung.
+    """
+    from history_cache import load_history
+
+    tickers = universe_tickers() if tickers is None else tickers
+    started = time.perf_counter()
+    # Chỉ đọc cache, không tải lại và không ghi đè: độ dài lịch sử cache do job tiền phiên quyết định
+    start = pd.Timestamp.now() - pd.Timedelta(days=REGIME_DAYS_BACK)
+    history = {}
+    for ticker in tickers:
+        df = load_history(ticker, max_age_hours=None)
+        if df is not None and not df.empty:
+            df = df[df.index >= start]
+            if not df.empty:
+                history[ticker] = df
+    if not history:
+        logging.error("Không có lịch sử đã cache của mã nào để tính trạng thái theo mã (chạy job làm ấm cache trước).")
+        return None
+
+    regimes = compute_ticker_regimes(build_price_panel(history))
+    payload = {
+        "last_updated": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "thresholds": DYNAMIC_THRESHOLDS,
+        "tickers": regimes['market_state'].to_dict(),
+    }
+    tmp_path = TICKER_THRESHOLDS_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(tmp_path, TICKER_THRESHOLDS_PATH)
+
+    high_count = int((regimes['market_state'] == 'HIGH_VOLATILITY').sum())
+    logging.info(
+        f"Trạng thái theo mã: {high_count}/{len(regimes)} mã biến động CAO "
+        f"({len(history) - len(regimes)} mã bị loại do chưa đủ lịch sử hoặc không có phiên gần nhất), "
+        f"{time.perf_counter() - started:.1f} giây. "
+        f"Đã ghi {os.path.basename(TICKER_THRESHOLDS_PATH)}"
+    )
+    return regimes
+
+
+def main(argv=None):
+    logging.basicConfig(level=LOGGING_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("--- ẬP NHẬT NGƯỠNG CHIẾN LƯỢC ---")
     state = get_market_volatility_state()
     if state:
         update_strategy_config(state)
-        
+    update_ticker_thresholds()
+
     logging.info("--- HOÀN TẤT ---")
+
+
+if __name__ == '__main__':
+    main()
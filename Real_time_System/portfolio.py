@@ -0,0 +1,234 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest import load_market_states, prepare_signal_frame
+
+# --- Backtest danh mục với vốn dùng chung ---
+# Tất cả các mã được căn chỉnh vào các mảng NumPy dạng panel (ngày x mã).
+# Mỗi ngày, lệnh bán, lệnh mua, phân bổ vốn và giới hạn số vị thế được tính
+# vector hóa trên toàn bộ các mã; vòng lặp chỉ chạy theo trục thời gian.
+# Giá dùng float32, tín hiệu dùng int8 để panel toàn thị trường nhiều năm vẫn nhỏ gọn.
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+SIGNAL_CODES = {'Mua mới': SIGNAL_BUY, 'Bán chốt lời': SIGNAL_SELL}
+
+
+def encode_signal_frame(sig_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Rút gọn DataFrame tín hiệu của một mã thành các mảng cần cho mô phỏng danh mục."""
+    codes = sig_df['signal'].map(SIGNAL_CODES).fillna(0).to_numpy(dtype=np.int8)
+    return {
+        'dates': sig_df.index.to_numpy(dtype='datetime64[ns]'),
+        'open': sig_df['open'].to_numpy(dtype=np.float32),
+        'close': sig_df['close'].to_numpy(dtype=np.float32),
+        'signal': codes,
+    }
+
+
+def build_panel(series_by_ticker: Dict[str, Dict[str, np.ndarray]]) -> Dict:
+    """
+    Căn chỉnh dữ liệu của các mã vào panel (ngày x mã).
+
+    Ngày mã không giao dịch: open = NaN (không khớp lệnh được), close được lấy theo
+    giá đóng cửa gần nhất để định giá vị thế, signal = 0.
+    """
+    tickers = list(series_by_ticker)
+    dates = np.unique(np.concatenate([s['dates'] for s in series_by_ticker.values()]))
+    n_dates, n_tickers = len(dates), len(tickers)
+
+    open_panel = np.full((n_dates, n_tickers), np.nan, dtype=np.float32)
+    close_panel = np.full((n_dates, n_tickers), np.nan, dtype=np.float32)
+    signal_panel = np.zeros((n_dates, n_tickers), dtype=np.int8)
+
+    for j, ticker in enumerate(tickers):
+        s = series_by_ticker[ticker]
+        rows = np.searchsorted(dates, s['dates'])
+        open_panel[rows, j] = s['open']
+        close_panel[rows, j] = s['close']
+        signal_panel[rows, j] = s['signal']
+
+    # Forward-fill giá đóng cửa theo trục thời gian (vector hóa bằng chỉ số dòng hợp lệ gần nhất)
+    valid = ~np.isnan(close_panel)
+    last_valid_row = np.where(valid, np.arange(n_dates)[:, None], 0)
+    np.maximum.accumulate(last_valid_row, axis=0, out=last_valid_row)
+    close_panel = close_panel[last_valid_row, np.arange(n_tickers)]
+
+    return {
+        'dates': pd.DatetimeIndex(dates),
+        'tickers': tickers,
+        'open': open_panel,
+        'close': close_panel,
+        'signal': signal_panel,
+    }
+
+
+def simulate_portfolio(
+    panel: Dict,
+    initial_capital: float = 1e9,
+    max_positions: int = 10,
+    fee_bps_per_side: float = 5.0,
+    lot_size: int = 100,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    Mô phỏng danh mục dùng chung vốn trên panel tín hiệu.
+
+    Quy tắc khớp lệnh giống `simulate_trades`: tín hiệu ngày t được khớp ở giá mở cửa ngày t+1.
+    Mỗi ngày bán trước để giải phóng tiền, sau đó mua các mã có tín hiệu 'Mua mới' theo thứ tự
+    trong danh sách mã cho đến khi đủ `max_positions`. Mỗi vị thế mới được cấp tối đa
+    equity / max_positions (không vượt quá tiền mặt còn lại), làm tròn xuống theo `lot_size`.
+
+    Returns:
+        tuple: (trades_df, equity_df, metrics)
+    """
+    dates = panel['dates']
+    tickers = np.asarray(panel['tickers'])
+    open_panel = panel['open']
+    close_panel = panel['close']
+    signal_panel = panel['signal']
+    n_dates, n_tickers = open_panel.shape
+
+    fee = fee_bps_per_side / 10000.0
+    cash = float(initial_capital)
+    shares = np.zeros(n_tickers, dtype=np.float64)
+    entry_price = np.zeros(n_tickers, dtype=np.float64)
+    entry_row = np.full(n_tickers, -1, dtype=np.int64)
+
+    equity_curve = np.empty(n_dates, dtype=np.float64)
+    cash_curve = np.empty(n_dates, dtype=np.float64)
+    positions_curve = np.empty(n_dates, dtype=np.int32)
+    trade_chunks: List[Dict[str, np.ndarray]] = []
+
+    for t in range(n_dates):
+        close_t = np.nan_to_num(close_panel[t].astype(np.float64))
+        equity = cash + float(shares @ close_t)
+        held = shares > 0
+        equity_curve[t] = equity
+        cash_curve[t] = cash
+        positions_curve[t] = int(held.sum())
+
+        if t == n_dates - 1:
+            break
+
+        sig = signal_panel[t]
+        next_open = open_panel[t + 1].astype(np.float64)
+        tradable = ~np.isnan(next_open) & (next_open > 0)
+
+        # 1. Bán: đóng toàn bộ vị thế có tín hiệu 'Bán chốt lời'
+        exits = held & (sig == SIGNAL_SELL) & tradable
+        if exits.any():
+            exit_price = next_open[exits] * (1.0 - fee)
+            cash += float(shares[exits] @ exit_price)
+            trade_chunks.append(
+                {
+                    'ticker': tickers[exits],
+                    'entry_row': entry_row[exits],
+                    'exit_row': np.full(int(exits.sum()), t + 1),
+                    'shares': shares[exits],
+                    'entry_price': entry_price[exits],
+                    'exit_price': exit_price,
+                }
+            )
+            shares[exits] = 0.0
+            entry_price[exits] = 0.0
+            entry_row[exits] = -1
+            held = shares > 0
+
+        # 2. Mua: các mã chưa nắm giữ có tín hiệu 'Mua mới', trong giới hạn số vị thế
+        slots = max_positions - int(held.sum())
+        candidates = ~held & (sig == SIGNAL_BUY) & tradable
+        if slots <= 0 or cash <= 0 or not candidates.any():
+            continue
+
+        chosen = np.flatnonzero(candidates)[:slots]
+        buy_price = next_open[chosen] * (1.0 + fee)
+        budget = min(equity / max_positions, cash / len(chosen))
+        qty = np.floor(budget / buy_price / lot_size) * lot_size
+        filled = qty > 0
+        if not filled.any():
+            continue
+
+        chosen, buy_price, qty = chosen[filled], buy_price[filled], qty[filled]
+        cash -= float(qty @ buy_price)
+        shares[chosen] = qty
+        entry_price[chosen] = buy_price
+        entry_row[chosen] = t + 1
+
+    equity_df = pd.DataFrame(
+        {'equity': equity_curve, 'cash': cash_curve, 'num_positions': positions_curve},
+        index=pd.Index(dates, name='timestamp'),
+    )
+    trades_df = _build_trades_frame(trade_chunks, dates)
+
+    final_equity = float(equity_curve[-1]) if n_dates else float(initial_capital)
+    running_max = np.maximum.accumulate(equity_curve) if n_dates else np.array([initial_capital])
+    drawdown = 1.0 - equity_curve / running_max if n_dates else np.array([0.0])
+
+    metrics: Dict = {
+        'num_trades': int(len(trades_df)),
+        'win_rate': float((trades_df['pct_return'] > 0).mean()) if not trades_df.empty else 0.0,
+        'avg_return_per_trade': float(trades_df['pct_return'].mean()) if not trades_df.empty else 0.0,
+        'total_return': final_equity / initial_capital - 1.0,
+        'max_drawdown': float(drawdown.max()),
+        'avg_positions': float(positions_curve.mean()) if n_dates else 0.0,
+        'final_equity': final_equity,
+    }
+    return trades_df, equity_df, metrics
+
+
+def _build_trades_frame(trade_chunks: List[Dict[str, np.ndarray]], dates: pd.DatetimeIndex) -> pd.DataFrame:
+    columns = ['ticker', 'entry_time', 'entry_price', 'exit_time', 'exit_price', 'shares', 'pct_return', 'pnl']
+    if not trade_chunks:
+        return pd.DataFrame(columns=columns)
+
+    merged = {k: np.concatenate([c[k] for c in trade_chunks]) for k in trade_chunks[0]}
+    trades_df = pd.DataFrame(
+        {
+            'ticker': merged['ticker'],
+            'entry_time': dates[merged['entry_row']],
+            'entry_price': merged['entry_price'],
+            'exit_time': dates[merged['exit_row']],
+            'exit_price': merged['exit_price'],
+            'shares': merged['shares'],
+        }
+    )
+    trades_df['pct_return'] = (trades_df['exit_price'] - trades_df['entry_price']) / trades_df['entry_price']
+    trades_df['pnl'] = (trades_df['exit_price'] - trades_df['entry_price']) * trades_df['shares']
+    return trades_df[columns]
+
+
+def backtest_portfolio(
+    tickers: List[str],
+    start: Optional[str],
+    end: Optional[str],
+    fee_bps: float,
+    initial_capital: float = 1e9,
+    max_positions: int = 10,
+    lot_size: int = 100,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    Chạy backtest danh mục cho danh sách mã. Trạng thái thị trường được lấy một lần và
+    dùng chung; DataFrame tín hiệu của từng mã được rút gọn thành mảng ngay sau khi tính
+    để bộ nhớ chỉ tỷ lệ với kích thước panel.
+    """
+    market_states = load_market_states(start, end)
+
+    series_by_ticker: Dict[str, Dict[str, np.ndarray]] = {}
+    for ticker in tickers:
+        try:
+            sig_df = prepare_signal_frame(ticker, start, end, market_states=market_states)
+            series_by_ticker[ticker] = encode_signal_frame(sig_df)
+        except Exception as e:
+            print(f"Bỏ qua {ticker} trong danh mục: {e}")
+
+    if not series_by_ticker:
+        raise RuntimeError("Không có mã nào đủ dữ liệu để chạy backtest danh mục")
+
+    panel = build_panel(series_by_ticker)
+    return simulate_portfolio(
+        panel,
+        initial_capital=initial_capital,
+        max_positions=max_positions,
+        fee_bps_per_side=fee_bps,
+        lot_size=lot_size,
+    )
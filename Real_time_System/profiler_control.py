@@ -0,0 +1,224 @@
+import argparse
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import config
+from logger_config import signal_logger
+
+# --- Chụp profile theo yêu cầu cho tiến trình stream đang chạy ---
+# Khi main.py xử lý không kịp, có thể chụp profile trong N giây mà không phải khởi động lại
+# (giữ nguyên trạng thái ấm và luồng dữ liệu):
+#   - gửi SIGUSR1 cho tiến trình:        kill -USR1 <pid>          (chụp PROFILER_DEFAULT_SECONDS giây)
+#   - hoặc lệnh qua socket localhost:    python profiler_control.py --seconds 30
+# Dùng profiler lấy mẫu qua sys._current_frames() thay vì cProfile: cProfile chỉ theo dõi luồng gọi nó,
+# còn lấy mẫu thấy được mọi luồng (callback của FiinQuantX, luồng micro-batch, luồng ghi...)
+# và không phải cài hook vào từng lời gọi hàm. Kết quả ghi cạnh signals.log:
+#   - profile_<thời điểm>.folded: các stack dạng "luồng;hàm;hàm số_mẫu" (flamegraph.pl, speedscope)
+#   - profile_<thời điểm>.txt:    tóm tắt theo luồng và các hàm tốn thời gian nhất
+PROFILE_DIR = os.path.dirname(os.path.abspath(config.LOG_FILE))
+THREAD_PREFIX = 'profiler'
+TOP_FUNCTIONS = 30
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Lấy mẫu stack của mọi luồng Python mỗi `interval_ms` mili giây."""
+
+    def __init__(self, interval_ms: float = config.PROFILER_INTERVAL_MS):
+        self.interval = interval_ms / 1000.0
+
+    def run(self, seconds: float) -> Dict:
+        """
+        Lấy mẫu trong `seconds` giây (chặn luồng gọi).
+
+        Returns:
+            dict: stacks (Counter stack -> số mẫu), self/cumulative (Counter hàm -> số mẫu),
+                  threads (Counter tên luồng -> số mẫu), samples, duration.
+        """
+        stacks, self_counts, cumulative, threads = Counter(), Counter(), Counter(), Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if name.startswith(THREAD_PREFIX):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.reverse()
+                stacks[(name, *labels)] += 1
+                threads[name] += 1
+                if labels:
+                    self_counts[labels[-1]] += 1
+                    cumulative.update(set(labels))  # Hàm đệ quy chỉ tính một lần mỗi mẫu
+            samples += 1
+            time.sleep(max(0.0, self.interval - (time.perf_counter() - now)))
+        return {
+            'stacks': stacks,
+            'self': self_counts,
+            'cumulative': cumulative,
+            'threads': threads,
+            'samples': samples,
+            'duration': time.perf_counter() - started,
+        }
+
+
+def write_profile(result: Dict, output_dir: str = PROFILE_DIR, top: int = TOP_FUNCTIONS) -> Tuple[str, str]:
+    """Ghi file stack dạng folded và file tóm tắt; trả về (đường dẫn folded, đường dẫn tóm tắt)."""
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    folded_path = os.path.join(output_dir, f'profile_{stamp}.folded')
+    summary_path = os.path.join(output_dir, f'profile_{stamp}.txt')
+
+    with open(folded_path, 'w', encoding='utf-8') as f:
+        for stack, count in result['stacks'].most_common():
+            f.write(';'.join(part.replace(';', ',') for part in stack) + f' {count}\n')
+
+    total = sum(result['threads'].values()) or 1
+    lines = [
+        f"Profile lấy mẫu lúc {stamp}: {result['duration']:.1f} s, {result['samples']} lần lấy mẫu, "
+        f"{total} mẫu stack",
+        '',
+        'Theo luồng (% số mẫu):',
+    ]
+    lines += [f"  {count / total:7.1%}  {name}" for name, count in result['threads'].most_common()]
+    for title, key in (('tự thân (self)', 'self'), ('tích lũy (cumulative)', 'cumulative')):
+        lines += ['', f'Top {top} hàm theo thời gian {title}:']
+        lines += [f"  {count / total:7.1%}  {count:7d}  {label}" for label, count in result[key].most_common(top)]
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return folded_path, summary_path
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(256).decode('utf-8', errors='replace').split()
+        control = self.server.control
+        if not line or line[0] not in ('profile', 'status'):
+            reply = "Lệnh không hợp lệ. Dùng: profile [số giây] | status"
+        elif line[0] == 'status':
+            reply = 'busy' if control.busy else 'idle'
+        else:
+            try:
+                seconds = float(line[1]) if len(line) > 1 else None
+            except ValueError:
+                seconds = None
+            paths = control.capture(seconds)
+            reply = '\n'.join(paths) if paths else 'busy: đang có một lần chụp profile khác'
+        self.wfile.write((reply + '\n').encode('utf-8'))
+
+
+class _ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def process_request(self, request, client_address):
+        # Đặt tên luồng xử lý lệnh để profiler bỏ qua chính nó
+        thread = threading.Thread(
+            target=self.process_request_thread, args=(request, client_address), name=f'{THREAD_PREFIX}-request', daemon=True
+        )
+        thread.start()
+
+
+class ProfilerControl:
+    """
+    Bề mặt điều khiển profiler của tiến trình stream: SIGUSR1 và/hoặc socket chỉ nghe trên 127.0.0.1.
+    Mỗi lần chỉ có một lần chụp; yêu cầu đến khi đang chụp bị bỏ qua.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = PROFILE_DIR,
+        default_seconds: float = config.PROFILER_DEFAULT_SECONDS,
+        interval_ms: float = config.PROFILER_INTERVAL_MS,
+        port: Optional[int] = config.PROFILER_PORT,
+    ):
+        self.output_dir = output_dir
+        self.default_seconds = default_seconds
+        self.profiler = SamplingProfiler(interval_ms)
+        self.port = port
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def capture(self, seconds: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        """Chụp profile (chặn luồng gọi); trả về các file đã ghi, hoặc None nếu đang có lần chụp khác."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            seconds = seconds or self.default_seconds
+            signal_logger.info(f"Bắt đầu chụp profile {seconds:.0f} giây...")
+            paths = write_profile(self.profiler.run(seconds), self.output_dir)
+            signal_logger.info(f"Đã ghi profile: {paths[0]}, tóm tắt: {paths[1]}")
+            return paths
+        except Exception as e:
+            signal_logger.error(f"Lỗi khi chụp profile: {e}", exc_info=True)
+            return None
+        finally:
+            self._lock.release()
+
+    def trigger(self, seconds: Optional[float] = None) -> None:
+        """Chụp profile trên một luồng riêng (dùng trong signal handler, trả về ngay)."""
+        threading.Thread(target=self.capture, args=(seconds,), name=f'{THREAD_PREFIX}-capture', daemon=True).start()
+
+    def start(self) -> None:
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.trigger())
+            signal_logger.info(f"Profiler: gửi SIGUSR1 tới PID {os.getpid()} để chụp {self.default_seconds:.0f} giây.")
+        if self.port:
+            self._server = _ControlServer(('127.0.0.1', self.port), _CommandHandler)
+            self._server.control = self
+            threading.Thread(target=self._server.serve_forever, name=f'{THREAD_PREFIX}-server', daemon=True).start()
+            signal_logger.info(f"Profiler: nhận lệnh tại 127.0.0.1:{self.port}.")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def request_capture(seconds: Optional[float] = None, port: int = config.PROFILER_PORT, host: str = '127.0.0.1') -> str:
+    """Gửi lệnh chụp profile tới tiến trình stream và chờ đến khi có kết quả."""
+    command = f"profile {seconds}" if seconds else 'profile'
+    timeout = (seconds or config.PROFILER_DEFAULT_SECONDS) + 30
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((command + '\n').encode('utf-8'))
+        return sock.makefile('r', encoding='utf-8').read().strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Chụp profile của tiến trình stream (main.py) đang chạy')
+    parser.add_argument('--seconds', type=float, default=None, help='Thời gian chụp (mặc định PROFILER_DEFAULT_SECONDS)')
+    parser.add_argument('--port', type=int, default=config.PROFILER_PORT, help='Cổng điều khiển trên 127.0.0.1')
+    args = parser.parse_args(argv)
+
+    try:
+        print(request_capture(args.seconds, args.port))
+    except OSError as e:
+        print(f"Không kết nối được tới 127.0.0.1:{args.port} ({e}). Kiểm tra PROFILER_ENABLED trong config.py.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import os
+import re
+import time
+from types import SimpleNamespace
+from typing import Iterator, Optional, Set
+
+import config
+
+# --- Phát lại luồng tick từ file log ---
+# Dòng log dạng: "... - INFO - Nhận data: VND, Giá: 22800.0, Thời gian: N/A"
+TICK_LINE_PATTERN = re.compile(r"Nhận data: (?P<ticker>[^,]+), Giá: (?P<close>[^,]+), Thời gian: (?P<time>.*)$")
+
+
+def iter_log_ticks(log_path: str, tickers: Optional[Set[str]] = None) -> Iterator[SimpleNamespace]:
+    """Đọc file log và sinh ra các tick có cùng thuộc tính với RealTimeData (Ticker, Close, Time)."""
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = TICK_LINE_PATTERN.search(line.rstrip('\n'))
+            if not match:
+                continue
+            ticker = match.group('ticker').strip()
+            if tickers and ticker not in tickers:
+                continue
+            try:
+                close = float(match.group('close'))
+            except ValueError:
+                continue
+            tick = SimpleNamespace(Ticker=ticker, Close=close)
+            tick_time = match.group('time').strip()
+            if tick_time and tick_time != 'N/A':
+                tick.Time = tick_time
+            yield tick
+
+
+def _resolve_log_path(log_path: str) -> str:
+    # File log nằm ở thư mục chạy main.py; nếu không thấy thì thử thư mục của gói
+    if os.path.exists(log_path) or os.path.isabs(log_path):
+        return log_path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), log_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Phát lại các tick đã ghi (file log hoặc kho tick) qua bộ phát hiện tín hiệu.')
+    parser.add_argument('--source', choices=['log', 'store'], default='log',
+                        help='Nguồn tick: file log hoặc kho tick trong ngày (tick_store)')
+    parser.add_argument('--log', type=str, default=config.LOG_FILE, help='File log chứa các dòng "Nhận data"')
+    parser.add_argument('--date', type=str, default=None,
+                        help='Ngày cần phát lại từ kho tick (YYYYMMDD), mặc định là ngày gần nhất')
+    parser.add_argument('--tickers', type=str, default=None, help='Chỉ phát lại các mã này, ví dụ: FPT,VND')
+    parser.add_argument('--limit', type=int, default=None, help='Số tick tối đa cần phát lại')
+    parser.add_argument('--micro_batch', type=int, default=0,
+                        help='Gom mỗi N tick liên tiếp thành một lô (detect_signals_batch); 0 = xử lý từng tick')
+    args = parser.parse_args(argv)
+
+    from signal_detector import detect_signal, detect_signals_batch, get_fast_path_stats
+
+    tickers = {t.strip() for t in args.tickers.split(',') if t.strip()} if args.tickers else None
+
+    if args.source == 'store':
+        from tick_store import iter_day_ticks, list_days
+
+        days = list_days(config.TICK_STORE_DIR)
+        day = args.date or (days[-1] if days else None)
+        if day is None:
+            print(f"Kho tick {config.TICK_STORE_DIR} chưa có dữ liệu.")
+            return
+        ticks = iter_day_ticks(day, sorted(tickers) if tickers else None, config.TICK_STORE_DIR)
+    else:
+        ticks = iter_log_ticks(_resolve_log_path(args.log), tickers)
+
+    num_ticks = 0
+    num_signals = 0
+    batch = []
+
+    def report(items, decisions):
+        nonlocal num_signals
+        for offset, (tick, (signal, details, fresh)) in enumerate(zip(items, decisions)):
+            if signal and fresh:
+                num_signals += 1
+                print(f"[{num_ticks - len(items) + offset + 1}] {tick.Ticker} @ {tick.Close}: {signal} - {details}")
+
+    started = time.perf_counter()
+    for tick in ticks:
+        if args.limit is not None and num_ticks >= args.limit:
+            break
+        num_ticks += 1
+        if args.micro_batch > 0:
+            batch.append(tick)
+            if len(batch) >= args.micro_batch:
+                report(batch, detect_signals_batch(batch))
+                batch = []
+        else:
+            report([tick], [detect_signal(tick)])
+    if batch:
+        report(batch, detect_signals_batch(batch))
+    elapsed = time.perf_counter() - started
+
+    stats = get_fast_path_stats()
+    rate = num_ticks / elapsed if elapsed > 0 else 0.0
+    print(f"\nĐã phát lại {num_ticks} tick trong {elapsed:.3f}s ({rate:,.0f} tick/s), {num_signals} tín hiệu.")
+    print(f"Fast path: bỏ qua {stats['ticks_skipped']} tick trùng lặp ({stats['skip_ratio']:.1%}), "
+          f"{stats['indicator_runs']} lần tính chỉ báo.")
+
+
+if __name__ == '__main__':
+    main()
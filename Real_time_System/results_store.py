@@ -0,0 +1,217 @@
+import importlib.util
+import json
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# --- Bộ lưu kết quả backtest dạng Parquet ---
+# Toàn bộ kết quả nằm trong một dataset duy nhất, chia theo loại bảng rồi phân vùng
+# kiểu Hive theo run_id và ticker:
+#   <root>/<table>/run_id=<run_id>/ticker=<ticker>/part-0.parquet
+# Mỗi lần chạy mới chỉ thêm thư mục run_id mới nên có thể ghi nối các lần chạy.
+DATASET_DIRNAME = 'backtest_results.parquet'
+RESULT_TABLES = (
+    'signals', 'trades', 'equity', 'summary', 'walkforward', 'portfolio_trades', 'portfolio_equity', 'robustness',
+)
+COMPRESSION = 'zstd'
+ROW_GROUP_SIZE = 64 * 1024
+STRATEGY_CONFIG_METADATA_KEY = b'strategy_config'
+
+
+def _require_pyarrow():
+    if importlib.util.find_spec('pyarrow') is None:
+        raise RuntimeError("Chế độ lưu Parquet cần thư viện pyarrow (pip install pyarrow).")
+
+
+def new_run_id() -> str:
+    """Tạo run_id mặc định theo thời điểm chạy."""
+    return pd.Timestamp.now().strftime('%Y%m%dT%H%M%S')
+
+
+def dataset_root(outdir: str) -> str:
+    return os.path.join(outdir, DATASET_DIRNAME)
+
+
+def write_partition(
+    outdir: str,
+    table_name: str,
+    run_id: str,
+    ticker: str,
+    df: pd.DataFrame,
+    strategy_config: Optional[Dict] = None,
+) -> Optional[str]:
+    """
+    Ghi một DataFrame vào phân vùng (run_id, ticker) của bảng `table_name`.
+    Cấu hình chiến lược (nếu có) được lưu vào metadata của schema Parquet.
+    Trả về đường dẫn file đã ghi, hoặc None nếu DataFrame rỗng.
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if df is None or df.empty:
+        return None
+
+    partition_dir = os.path.join(
+        dataset_root(outdir), table_name, f'run_id={run_id}', f'ticker={ticker}'
+    )
+    os.makedirs(partition_dir, exist_ok=True)
+
+    # Cột phân vùng được suy ra từ đường dẫn, không lưu lặp lại trong file
+    frame = df.drop(columns=[c for c in ('run_id', 'ticker') if c in df.columns])
+    table = pa.Table.from_pandas(frame, preserve_index=not isinstance(frame.index, pd.RangeIndex))
+
+    if strategy_config is not None:
+        metadata = dict(table.schema.metadata or {})
+        metadata[STRATEGY_CONFIG_METADATA_KEY] = json.dumps(strategy_config).encode('utf-8')
+        table = table.replace_schema_metadata(metadata)
+
+    path = os.path.join(partition_dir, 'part-0.parquet')
+    pq.write_table(table, path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    return path
+
+
+class PartitionWriter:
+    """
+    Ghi nối tiếp nhiều DataFrame (ví dụ từng đoạn của backtest intraday) vào cùng một file
+    của phân vùng (run_id, ticker); mỗi lần ghi thành các row group mới, không giữ dữ liệu cũ trong RAM.
+    """
+
+    def __init__(
+        self,
+        outdir: str,
+        table_name: str,
+        run_id: str,
+        ticker: str,
+        strategy_config: Optional[Dict] = None,
+    ):
+        _require_pyarrow()
+        self.path = os.path.join(
+            dataset_root(outdir), table_name, f'run_id={run_id}', f'ticker={ticker}', 'part-0.parquet'
+        )
+        self._strategy_config = strategy_config
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df is None or df.empty:
+            return
+        frame = df.drop(columns=[c for c in ('run_id', 'ticker') if c in df.columns])
+        table = pa.Table.from_pandas(frame, preserve_index=not isinstance(frame.index, pd.RangeIndex))
+        if self._writer is None:
+            # Cột toàn None ở đoạn đầu có kiểu null; dùng string để các đoạn sau ghi được giá trị thật
+            fields = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema]
+            metadata = dict(table.schema.metadata or {})
+            if self._strategy_config is not None:
+                metadata[STRATEGY_CONFIG_METADATA_KEY] = json.dumps(self._strategy_config).encode('utf-8')
+            self._schema = pa.schema(fields, metadata=metadata)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression=COMPRESSION)
+        self._writer.write_table(table.cast(self._schema), row_group_size=ROW_GROUP_SIZE)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def write_backtest_results(
+    outdir: str,
+    run_id: str,
+    ticker: str,
+    sig_df: pd.DataFrame,
+    trades_df: pd.DataFrame,
+    equity_df: pd.DataFrame,
+    strategy_config: Dict,
+) -> List[str]:
+    """Ghi ba bảng kết quả của một mã (signals, trades, equity) vào dataset Parquet."""
+    paths = [
+        write_partition(outdir, 'signals', run_id, ticker, sig_df, strategy_config),
+        write_partition(outdir, 'trades', run_id, ticker, trades_df, strategy_config),
+        write_partition(outdir, 'equity', run_id, ticker, equity_df, strategy_config),
+    ]
+    return [p for p in paths if p]
+
+
+def write_summary(outdir: str, run_id: str, all_metrics: List[Dict], strategy_config: Dict) -> List[str]:
+    """Ghi bảng tổng hợp metrics, mỗi mã một phân vùng."""
+    paths = []
+    for metrics in all_metrics:
+        ticker = metrics['ticker']
+        path = write_partition(outdir, 'summary', run_id, ticker, pd.DataFrame([metrics]), strategy_config)
+        if path:
+            paths.append(path)
+    return paths
+
+
+def load_backtest_results(
+    outdir: str,
+    table_name: str = 'signals',
+    columns: Optional[List[str]] = None,
+    run_ids: Optional[List[str]] = None,
+    tickers: Optional[List[str]] = None,
+    filter_expression=None,
+) -> pd.DataFrame:
+    """
+    Đọc lại một bảng kết quả từ dataset Parquet.
+
+    Args:
+        outdir (str): Thư mục kết quả đã truyền cho backtest (--outdir).
+        table_name (str): Một trong các bảng của RESULT_TABLES.
+        columns (list): Chỉ đọc các cột này (column pruning).
+        run_ids (list): Chỉ đọc các lần chạy này (bỏ qua các phân vùng khác).
+        tickers (list): Chỉ đọc các mã này (bỏ qua các phân vùng khác).
+        filter_expression: Biểu thức pyarrow.dataset bổ sung, ví dụ
+            `pyarrow.dataset.field('signal') == 'Mua mới'`; các row group không thỏa
+            theo thống kê min/max sẽ được bỏ qua.
+
+    Returns:
+        pd.DataFrame: Dữ liệu đã lọc, kèm cột run_id và ticker.
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if table_name not in RESULT_TABLES:
+        raise ValueError(f"Bảng kết quả không hợp lệ: {table_name}")
+
+    table_dir = os.path.join(dataset_root(outdir), table_name)
+    if not os.path.isdir(table_dir):
+        return pd.DataFrame()
+
+    # Khai báo rõ kiểu chuỗi để run_id dạng số không bị suy ra thành int
+    partitioning = ds.partitioning(
+        pa.schema([('run_id', pa.string()), ('ticker', pa.string())]), flavor='hive'
+    )
+    dataset = ds.dataset(table_dir, format='parquet', partitioning=partitioning)
+
+    expression = filter_expression
+    if run_ids:
+        cond = ds.field('run_id').isin([str(r) for r in run_ids])
+        expression = cond if expression is None else expression & cond
+    if tickers:
+        cond = ds.field('ticker').isin(list(tickers))
+        expression = cond if expression is None else expression & cond
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def load_strategy_config(outdir: str, run_id: str, table_name: str = 'summary') -> Optional[Dict]:
+    """Đọc cấu hình chiến lược đã lưu trong metadata của một lần chạy."""
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    run_dir = os.path.join(dataset_root(outdir), table_name, f'run_id={run_id}')
+    if not os.path.isdir(run_dir):
+        return None
+    for ticker_dir in sorted(os.listdir(run_dir)):
+        path = os.path.join(run_dir, ticker_dir, 'part-0.parquet')
+        if os.path.exists(path):
+            metadata = pq.read_schema(path).metadata or {}
+            raw = metadata.get(STRATEGY_CONFIG_METADATA_KEY)
+            return json.loads(raw) if raw else None
+    return None
@@ -0,0 +1,382 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from indicators import strategy_columns
+
+# --- Ma trận quy tắc Momentum / Trend / Rủi ro, khai báo dưới dạng dữ liệu ---
+# Quy tắc được viết MỘT lần ở đây rồi biên dịch thành:
+#   - bộ đánh giá vô hướng theo từng nến cho luồng real-time (signal_detector)
+#   - bộ đánh giá vector hóa trên mảng cho backtest
+#
+# Toán hạng của điều kiện:
+#   - tên chỉ báo logic (khóa của indicators.strategy_columns) hoặc 'close'
+#   - tên ngưỡng viết hoa (RSI_OVERSOLD, RSI_OVERBOUGHT, ADX_THRESHOLD), lấy từ bộ ngưỡng đang áp dụng
+#   - hằng số
+# Loại điều kiện: 'lt', 'gt' (so sánh nến hiện tại), 'cross_above', 'cross_below' (cần thêm nến trước).
+THRESHOLD_NAMES = ('RSI_OVERSOLD', 'RSI_OVERBOUGHT', 'ADX_THRESHOLD')
+
+CONDITION_COST = {'lt': 1, 'gt': 1, 'cross_above': 2, 'cross_below': 2}
+
+# Nhóm điều kiện: thỏa khi MỘT nhánh thỏa; nhánh thỏa khi TẤT CẢ điều kiện của nó thỏa.
+# Nhãn của nhánh đầu tiên thỏa được dùng trong phần giải thích tín hiệu.
+CONDITION_GROUPS = {
+    'momentum_buy': [
+        {'label': 'RSI', 'all': [('lt', 'rsi', 'RSI_OVERSOLD')]},
+        {'label': 'Stoch', 'all': [('lt', 'stoch_k', 20), ('cross_above', 'stoch_k', 'stoch_d')]},
+    ],
+    'momentum_sell': [
+        {'label': 'RSI', 'all': [('gt', 'rsi', 'RSI_OVERBOUGHT')]},
+        {'label': 'Stoch', 'all': [('gt', 'stoch_k', 80), ('cross_below', 'stoch_k', 'stoch_d')]},
+    ],
+    'trend_buy': [
+        {'label': 'MACD', 'all': [('cross_above', 'macd', 'macd_signal')]},
+        {'label': 'SMA', 'all': [('cross_above', 'close', 'sma_short')]},
+        {'label': 'SMA', 'all': [('cross_above', 'close', 'sma_long')]},
+    ],
+    'trend_sell': [
+        {'label': 'MACD', 'all': [('cross_below', 'macd', 'macd_signal')]},
+        {'label': 'SMA', 'all': [('cross_below', 'close', 'sma_short')]},
+        {'label': 'SMA', 'all': [('cross_below', 'close', 'sma_long')]},
+    ],
+    'rsi_overbought': [
+        {'label': 'RSI', 'all': [('gt', 'rsi', 'RSI_OVERBOUGHT')]},
+    ],
+    'rsi_oversold': [
+        {'label': 'RSI', 'all': [('lt', 'rsi', 'RSI_OVERSOLD')]},
+    ],
+    'trend_still_strong_up': [
+        {'label': 'ADX', 'all': [
+            ('gt', 'macd', 0), ('gt', 'close', 'sma_short'), ('gt', 'close', 'sma_long'), ('gt', 'adx', 'ADX_THRESHOLD'),
+        ]},
+    ],
+    'trend_still_strong_down': [
+        {'label': 'ADX', 'all': [
+            ('lt', 'macd', 0), ('lt', 'close', 'sma_short'), ('lt', 'close', 'sma_long'), ('gt', 'adx', 'ADX_THRESHOLD'),
+        ]},
+    ],
+}
+
+# Quy tắc được xét theo thứ tự, quy tắc đầu tiên thỏa sẽ quyết định tín hiệu.
+# 'reason' là mô tả ngắn (backtest), 'detail' là giải thích chi tiết cho cảnh báo real-time.
+RULES = [
+    {
+        'signal': 'Mua mới',
+        'when': ['momentum_buy', 'trend_buy'],
+        'reason': 'Momentum và Trend xác nhận mua',
+        'detail': 'Momentum ({momentum_buy}) và Trend ({trend_buy}) đều xác nhận mua.',
+    },
+    {
+        'signal': 'Bán chốt lời',
+        'when': ['momentum_sell', 'trend_sell'],
+        'reason': 'Momentum và Trend xác nhận bán',
+        'detail': 'Momentum ({momentum_sell}) và Trend ({trend_sell}) đều xác nhận bán.',
+    },
+    {
+        'signal': 'Cảnh báo rủi ro (dễ điều chỉnh)',
+        'when': ['rsi_overbought', 'trend_still_strong_up'],
+        'reason': 'RSI quá mua nhưng xu hướng vẫn mạnh',
+        'detail': 'RSI({rsi:.2f}) quá mua nhưng xu hướng tăng vẫn còn rất mạnh (ADX={adx:.2f}).',
+    },
+    {
+        'signal': 'Cảnh báo rủi ro (bắt đáy nguy hiểm)',
+        'when': ['rsi_oversold', 'trend_still_strong_down'],
+        'reason': 'RSI quá bán nhưng xu hướng giảm vẫn mạnh',
+        'detail': 'RSI({rsi:.2f}) quá bán nhưng xu hướng giảm vẫn còn rất mạnh (ADX={adx:.2f}).',
+    },
+]
+
+# Tên nhóm có trong các quy tắc, dùng cho cờ trạng thái
+ACTIVE_GROUPS = tuple(dict.fromkeys(g for rule in RULES for g in rule['when']))
+
+
+# ---------------------------------------------------------------------------
+# Phân tích spec
+# ---------------------------------------------------------------------------
+
+def _is_threshold(operand) -> bool:
+    return isinstance(operand, str) and operand in THRESHOLD_NAMES
+
+
+def _is_series(operand) -> bool:
+    return isinstance(operand, str) and not _is_threshold(operand)
+
+
+def _condition_cost(cond) -> int:
+    return CONDITION_COST[cond[0]]
+
+
+def _ordered_branch(branch: Dict) -> Dict:
+    # Điều kiện rẻ (chỉ so sánh nến hiện tại) được xét trước để bỏ qua sớm các điều kiện cắt
+    return {'label': branch['label'], 'all': sorted(branch['all'], key=_condition_cost)}
+
+
+def _group_cost(group_name: str, groups: Dict) -> int:
+    return sum(_condition_cost(c) for branch in groups[group_name] for c in branch['all'])
+
+
+def _ordered_rules(rules: List[Dict], groups: Dict) -> List[Dict]:
+    ordered = []
+    for rule in rules:
+        ordered.append(dict(rule, when=sorted(rule['when'], key=lambda g: _group_cost(g, groups))))
+    return ordered
+
+
+def required_indicators(rules: Optional[List[Dict]] = None, groups: Optional[Dict] = None) -> Set[str]:
+    """Tập tên chỉ báo logic mà các quy tắc đang dùng (không gồm 'close')."""
+    rules = RULES if rules is None else rules
+    groups = CONDITION_GROUPS if groups is None else groups
+    names = set()
+    for rule in rules:
+        for group_name in rule['when']:
+            for branch in groups[group_name]:
+                for _, a, b in branch['all']:
+                    names.update(op for op in (a, b) if _is_series(op))
+    names.discard('close')
+    return names
+
+
+# Chỉ báo mà bộ quy tắc mặc định cần, tính một lần lúc import
+STRATEGY_INDICATORS = frozenset(required_indicators())
+
+
+def _column_map(strategy_config: Dict) -> Dict[str, str]:
+    columns = dict(strategy_columns(strategy_config))
+    columns['close'] = 'close'
+    return columns
+
+
+# ---------------------------------------------------------------------------
+# Bộ đánh giá vô hướng (real-time, một nến)
+# ---------------------------------------------------------------------------
+
+def _compile_operand(operand, columns: Dict[str, str]) -> Callable:
+    if _is_threshold(operand):
+        return lambda row, thresholds: thresholds[operand]
+    if _is_series(operand):
+        col = columns[operand]
+        return lambda row, thresholds: row[col]
+    value = float(operand)
+    return lambda row, thresholds: value
+
+
+def _compile_condition(cond, columns: Dict[str, str]) -> Callable:
+    kind, a, b = cond
+    get_a = _compile_operand(a, columns)
+    get_b = _compile_operand(b, columns)
+    if kind == 'lt':
+        return lambda last, prev, th: get_a(last, th) < get_b(last, th)
+    if kind == 'gt':
+        return lambda last, prev, th: get_a(last, th) > get_b(last, th)
+    if kind == 'cross_above':
+        return lambda last, prev, th: get_a(last, th) > get_b(last, th) and get_a(prev, th) <= get_b(prev, th)
+    if kind == 'cross_below':
+        return lambda last, prev, th: get_a(last, th) < get_b(last, th) and get_a(prev, th) >= get_b(prev, th)
+    raise ValueError(f"Loại điều kiện không hợp lệ: {kind}")
+
+
+def _compile_group(branches: List[Dict], columns: Dict[str, str]) -> Callable:
+    """Trả về hàm (last, prev, thresholds) -> nhãn của nhánh đầu tiên thỏa, hoặc None."""
+    compiled = [
+        (branch['label'], [_compile_condition(c, columns) for c in _ordered_branch(branch)['all']])
+        for branch in branches
+    ]
+
+    def evaluate(last, prev, thresholds):
+        for label, conditions in compiled:
+            if all(cond(last, prev, thresholds) for cond in conditions):
+                return label
+        return None
+
+    return evaluate
+
+
+def compile_scalar_evaluator(strategy_config: Dict, rules: Optional[List[Dict]] = None, groups: Optional[Dict] = None):
+    """
+    Biên dịch quy tắc thành bộ đánh giá cho một nến.
+
+    Returns:
+        tuple: (evaluate, evaluate_flags)
+            evaluate(last, prev, thresholds) -> (tín hiệu, giải thích) hoặc (None, None);
+            evaluate_flags(last, prev, thresholds) -> {tên nhóm: bool} cho mọi nhóm đang dùng.
+        `last`, `prev` là dict tên cột -> giá trị; `thresholds` chứa các khóa trong THRESHOLD_NAMES.
+    """
+    rules = RULES if rules is None else rules
+    groups = CONDITION_GROUPS if groups is None else groups
+    columns = _column_map(strategy_config)
+    indicator_columns = [columns[name] for name in sorted(required_indicators(rules, groups) | {'close'})]
+
+    group_fns = {name: _compile_group(groups[name], columns) for name in dict.fromkeys(
+        g for rule in rules for g in rule['when']
+    )}
+    compiled_rules = [(rule, [(g, group_fns[g]) for g in rule['when']]) for rule in _ordered_rules(rules, groups)]
+    value_names = {name: col for name, col in columns.items() if col in indicator_columns}
+
+    def is_ready(last):
+        return all(last[col] == last[col] for col in indicator_columns)
+
+    def evaluate(last, prev, thresholds):
+        if not is_ready(last):
+            return None, None
+        for rule, rule_groups in compiled_rules:
+            labels = {}
+            for group_name, group_fn in rule_groups:
+                label = group_fn(last, prev, thresholds)
+                if label is None:
+                    break
+                labels[group_name] = label
+            else:
+                fields = {name: last[col] for name, col in value_names.items()}
+                fields.update(labels)
+                return rule['signal'], rule['detail'].format(**fields)
+        return None, None
+
+    def evaluate_flags(last, prev, thresholds):
+        ready = is_ready(last)
+        return {name: ready and fn(last, prev, thresholds) is not None for name, fn in group_fns.items()}
+
+    return evaluate, evaluate_flags
+
+
+# ---------------------------------------------------------------------------
+# Bộ đánh giá vector hóa (backtest, nhiều nến / nhiều mã)
+# ---------------------------------------------------------------------------
+
+class _VectorContext:
+    """Truy cập giá trị nến hiện tại / nến trước đã làm phẳng theo chỉ số vị trí."""
+
+    def __init__(self, values: Dict[str, np.ndarray], thresholds: Dict, columns: Dict[str, str]):
+        self._values = values
+        self._thresholds = thresholds
+        self._columns = columns
+
+    def get(self, operand, which: str, idx: np.ndarray):
+        if _is_threshold(operand):
+            th = self._thresholds[operand]
+            if np.ndim(th) == 0:
+                return float(th)
+            # Ngưỡng theo từng nến: luôn lấy theo vị trí của nến hiện tại
+            return np.asarray(th, dtype=np.float64)[..., 1:].ravel()[idx]
+        if _is_series(operand):
+            arr = self._values[self._columns[operand]]
+            window = arr[..., 1:] if which == 'last' else arr[..., :-1]
+            return window.ravel()[idx]
+        return float(operand)
+
+
+def _eval_condition_vec(cond, idx: np.ndarray, ctx: _VectorContext) -> np.ndarray:
+    kind, a, b = cond
+    with np.errstate(invalid='ignore'):
+        if kind == 'lt':
+            return ctx.get(a, 'last', idx) < ctx.get(b, 'last', idx)
+        if kind == 'gt':
+            return ctx.get(a, 'last', idx) > ctx.get(b, 'last', idx)
+        if kind == 'cross_above':
+            return (ctx.get(a, 'last', idx) > ctx.get(b, 'last', idx)) & (ctx.get(a, 'prev', idx) <= ctx.get(b, 'prev', idx))
+        if kind == 'cross_below':
+            return (ctx.get(a, 'last', idx) < ctx.get(b, 'last', idx)) & (ctx.get(a, 'prev', idx) >= ctx.get(b, 'prev', idx))
+    raise ValueError(f"Loại điều kiện không hợp lệ: {kind}")
+
+
+def _eval_branch_vec(conditions, idx: np.ndarray, ctx: _VectorContext) -> np.ndarray:
+    """Trả về các vị trí trong `idx` thỏa mọi điều kiện; điều kiện sau chỉ xét trên vị trí còn lại."""
+    for cond in conditions:
+        if idx.size == 0:
+            break
+        idx = idx[_eval_condition_vec(cond, idx, ctx)]
+    return idx
+
+
+def _eval_group_vec(branches: List[Dict], idx: np.ndarray, ctx: _VectorContext) -> np.ndarray:
+    """Trả về các vị trí trong `idx` có ít nhất một nhánh thỏa; nhánh sau chỉ xét vị trí chưa thỏa."""
+    passed = []
+    remaining = idx
+    for branch in branches:
+        if remaining.size == 0:
+            break
+        ok = _eval_branch_vec(_ordered_branch(branch)['all'], remaining, ctx)
+        if ok.size:
+            passed.append(ok)
+            remaining = np.setdiff1d(remaining, ok, assume_unique=True)
+    return np.sort(np.concatenate(passed)) if passed else idx[:0]
+
+
+def compile_vector_evaluator(strategy_config: Dict, rules: Optional[List[Dict]] = None, groups: Optional[Dict] = None):
+    """
+    Biên dịch quy tắc thành bộ đánh giá trên mảng.
+
+    Returns:
+        tuple: (evaluate, evaluate_flags)
+            evaluate(values, thresholds) -> mảng int (cùng kích thước với chuỗi giá) chứa chỉ số quy tắc
+            thỏa tại mỗi nến, -1 nếu không có tín hiệu;
+            evaluate_flags(values, thresholds) -> {tên nhóm: mảng bool cùng kích thước} cho mọi nhóm đang dùng.
+        `values` là dict tên cột -> mảng 1D/2D với trục thời gian cuối cùng; `thresholds` chứa giá trị
+        vô hướng hoặc mảng theo từng nến. Nến đầu tiên của mỗi chuỗi không có nến trước nên luôn là -1 / False.
+    """
+    rules = RULES if rules is None else rules
+    groups = CONDITION_GROUPS if groups is None else groups
+    columns = _column_map(strategy_config)
+    indicator_columns = [columns[name] for name in sorted(required_indicators(rules, groups) | {'close'})]
+    ordered = list(enumerate(rules))
+    ordered_groups = {i: sorted(rule['when'], key=lambda g: _group_cost(g, groups)) for i, rule in ordered}
+    group_names = tuple(dict.fromkeys(g for rule in rules for g in rule['when']))
+
+    def ready_mask(values: Dict[str, np.ndarray]) -> np.ndarray:
+        # Chỉ xét các nến mà mọi chỉ báo được dùng đều đã có giá trị
+        ready = np.ones(np.asarray(values['close'])[..., 1:].shape, dtype=bool)
+        for col in indicator_columns:
+            ready &= ~np.isnan(np.asarray(values[col], dtype=np.float64)[..., 1:])
+        return ready
+
+    def evaluate(values: Dict[str, np.ndarray], thresholds: Dict) -> np.ndarray:
+        close = np.asarray(values['close'])
+        result = np.full(close.shape, -1, dtype=np.int16)
+        if close.shape[-1] < 2:
+            return result
+
+        ctx = _VectorContext(values, thresholds, columns)
+        ready = ready_mask(values)
+
+        decided = np.full(ready.size, -1, dtype=np.int16)
+        undecided = np.flatnonzero(ready.ravel())
+        for rule_index, _ in ordered:
+            idx = undecided
+            for group_name in ordered_groups[rule_index]:
+                if idx.size == 0:
+                    break
+                idx = _eval_group_vec(groups[group_name], idx, ctx)
+            if idx.size:
+                decided[idx] = rule_index
+                undecided = np.setdiff1d(undecided, idx, assume_unique=True)
+            if undecided.size == 0:
+                break
+
+        result[..., 1:] = decided.reshape(ready.shape)
+        return result
+
+    def evaluate_flags(values: Dict[str, np.ndarray], thresholds: Dict) -> Dict[str, np.ndarray]:
+        close = np.asarray(values['close'])
+        flags = {name: np.zeros(close.shape, dtype=bool) for name in group_names}
+        if close.shape[-1] < 2:
+            return flags
+
+        ctx = _VectorContext(values, thresholds, columns)
+        ready = ready_mask(values)
+        idx = np.flatnonzero(ready.ravel())
+        for name in group_names:
+            passed = np.zeros(ready.size, dtype=bool)
+            passed[_eval_group_vec(groups[name], idx, ctx)] = True
+            flags[name][..., 1:] = passed.reshape(ready.shape)
+        return flags
+
+    return evaluate, evaluate_flags
+
+
+def rule_labels(rules: Optional[List[Dict]] = None) -> Tuple[List[str], List[str]]:
+    """Danh sách (tín hiệu, mô tả ngắn) theo chỉ số quy tắc, dùng để giải mã kết quả vector hóa."""
+    rules = RULES if rules is None else rules
+    return [r['signal'] for r in rules], [r['reason'] for r in rules]
+
+
+def thresholds_from_config(config: Dict, names: Iterable[str] = THRESHOLD_NAMES) -> Dict[str, float]:
+    return {name: config[name] for name in names}
@@ -1,11 +1,31 @@
-import schedule
+import json
+import multiprocessing
+import os
+import threading
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import config
 from ml_brain import get_market_volatility_state, update_strategy_config
 
 # --- CẤU HÌNH ---
 LOGGING_LEVEL = logging.INFO
-logging.basicConfig(level=LOGGING_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
+MAX_CONCURRENT_JOBS = 2
+METRICS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'scheduler_metrics.json')
+
+# Thời gian chạy tối đa của từng job (giây). Job chạy trong tiến trình con nên khi quá hạn
+# có thể bị dừng hẳn, kể cả khi đang treo trong một lời gọi FiinQuantX.
+JOB_TIMEOUTS = {
+    'ml_brain': 10 * 60,
+    'warm_cache': 15 * 60,
+}
+
+WARM_CACHE_DAYS_BACK = 400
+
+# Tiến trình con được tạo từ luồng worker, nên dùng 'spawn' (fork từ luồng phụ không an toàn)
+_MP_CONTEXT = multiprocessing.get_context('spawn')
 
 def run_ml_brain_job():
     """
@@ -13,25 +33,147 @@ def run_ml_brain_job():
     """
     try:
         logging.info("--- [SCHEDULER] Bắt đầu công việc cập nhật ngưỡng tự động ---")
-        
+
         # 1. Xác định trạng thái thị trường
         state = get_market_volatility_state()
-        
+
         # 2. Cập nhật file cấu hình
         if state:
             update_strategy_config(state)
-            
+
         logging.info("--- [SCHEDULER] Hoàn tất công việc. Chờ lần chạy tiếp theo... ---")
     except Exception as e:
         logging.error(f"--- [SCHEDULER] Gặp lỗi trong quá trình chạy job tự động: {e} ---", exc_info=True)
+        raise
 
-# Lên lịch chạy công việc vào 08:00 sáng mỗi ngày
-schedule.every().day.at("08:00").do(run_ml_brain_job)
-if __name__ == "__main__":
-    logging.info("Nó sẽ kích hoạt 'Bộ não ML' vào 08:00 sáng mỗi ngày.")
-    # Chạy công việc ngay lần đầu tiên khởi động
-    run_ml_brain_job()
 
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+def run_cache_warming_job():
+    """
+    Công việc tiền phiên: tải trước lịch sử cho toàn bộ watchlist và chuẩn bị tick của phiên trước,
+    để main.py khởi động ấm khi luồng dữ liệu mở lúc 09:00. Sau đó tính trạng thái biến động
+    theo từng mã trên lịch sử vừa cache (ticker_thresholds.json).
+    """
+    from history_cache import prefetch_history, warm_watchlist
+    from ml_brain import update_ticker_thresholds
+
+    logging.info("--- [SCHEDULER] Bắt đầu làm ấm bộ nhớ đệm tiền phiên ---")
+    # Bỏ qua cache cũ: job tiền phiên luôn lấy dữ liệu EOD mới nhất của phiên trước
+    prefetch_history(config.TICKERS_WATCHLIST, days_back=WARM_CACHE_DAYS_BACK, max_age_hours=0)
+    warm_watchlist(config.TICKERS_WATCHLIST)
+    update_ticker_thresholds()
+    logging.info("--- [SCHEDULER] Hoàn tất làm ấm bộ nhớ đệm ---")
+
+
+def _job_process_entry(func):
+    logging.basicConfig(level=LOGGING_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
+    func()
+
+
+class JobRunner:
+    """
+    Chạy các job trên một pool worker thay vì trên luồng chính của scheduler.
+
+    - Mỗi job chạy trong một tiến trình con, được một worker theo dõi với thời gian chờ riêng;
+      quá hạn thì tiến trình con bị dừng.
+    - Chống chồng lấn: nếu lần chạy trước của cùng job chưa xong, lần mới bị bỏ qua.
+    - Ghi lại số lần chạy, lỗi, quá hạn, bỏ qua và thời lượng mỗi lần chạy.
+    """
+
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS, metrics_path: str = METRICS_FILE_PATH):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._running = set()
+        self._metrics_path = metrics_path
+        self.metrics = {}
+
+    def _job_metrics(self, name):
+        return self.metrics.setdefault(name, {
+            'runs': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0, 'skipped_overlap': 0,
+            'last_status': None, 'last_started': None, 'last_duration_s': None, 'max_duration_s': 0.0,
+        })
+
+    def submit(self, name, func, timeout):
+        """Đưa job vào pool; trả về False nếu job cùng tên đang chạy."""
+        with self._lock:
+            if name in self._running:
+                self._job_metrics(name)['skipped_overlap'] += 1
+                logging.warning(f"[SCHEDULER] Job '{name}' vẫn đang chạy, bỏ qua lần kích hoạt này.")
+                return False
+            self._running.add(name)
+        self._executor.submit(self._supervise, name, func, timeout)
+        return True
+
+    def _supervise(self, name, func, timeout):
+        started = time.monotonic()
+        started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        status = 'failed'
+        try:
+            process = _MP_CONTEXT.Process(target=_job_process_entry, args=(func,), name=f'job-{name}', daemon=True)
+            process.start()
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+                status = 'timed_out'
+                logging.error(f"[SCHEDULER] Job '{name}' vượt quá {timeout}s, đã dừng tiến trình.")
+            elif process.exitcode == 0:
+                status = 'succeeded'
+            else:
+                logging.error(f"[SCHEDULER] Job '{name}' kết thúc với mã lỗi {process.exitcode}.")
+        except Exception as e:
+            logging.error(f"[SCHEDULER] Không chạy được job '{name}': {e}", exc_info=True)
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                self._running.discard(name)
+                m = self._job_metrics(name)
+                m['runs'] += 1
+                m[status] += 1
+                m['last_status'] = status
+                m['last_started'] = started_at
+                m['last_duration_s'] = round(duration, 3)
+                m['max_duration_s'] = round(max(m['max_duration_s'], duration), 3)
+                self._write_metrics()
+            logging.info(f"[SCHEDULER] Job '{name}' {status} sau {duration:.1f}s.")
+
+    def _write_metrics(self):
+        try:
+            with open(self._metrics_path, 'w') as f:
+                json.dump(self.metrics, f, indent=4)
+        except OSError as e:
+            logging.warning(f"[SCHEDULER] Không ghi được file metrics: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    import schedule
+
+    logging.basicConfig(level=LOGGING_LEVEL, format='%(asctime)s - %(levelname)s - %(message)s')
+    runner = JobRunner()
+
+    def submit_ml_brain():
+        runner.submit('ml_brain', run_ml_brain_job, JOB_TIMEOUTS['ml_brain'])
+
+    def submit_warm_cache():
+        runner.submit('warm_cache', run_cache_warming_job, JOB_TIMEOUTS['warm_cache'])
+
+    # Lên lịch chạy công việc vào 08:00 sáng mỗi ngày, làm ấm bộ nhớ đệm lúc 08:30 sau khi đã có ngưỡng mới
+    schedule.every().day.at("08:00").do(submit_ml_brain)
+    schedule.every().day.at("08:30").do(submit_warm_cache)
+    logging.info("Nó sẽ kích hoạt 'Bộ não ML' vào 08:00 và làm ấm bộ nhớ đệm vào 08:30 mỗi ngày.")
+    # Chạy các công việc ngay lần đầu tiên khởi động
+    submit_ml_brain()
+    submit_warm_cache()
+
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(1)
+    finally:
+        runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
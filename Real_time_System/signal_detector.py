@@ -1,96 +1,312 @@
-import pandas as pd
-import pandas_ta as ta
+import numpy as np
 from collections import deque
-from FiinQuantX import RealTimeData
+from datetime import datetime
+from typing import TYPE_CHECKING
 import json
 import os
 
-# --- Tải cấu hình chiến lược từ file JSON ---
+from indicators import compute_strategy_indicators
+from rules import STRATEGY_INDICATORS, THRESHOLD_NAMES, compile_scalar_evaluator, compile_vector_evaluator
+
+if TYPE_CHECKING:
+    from FiinQuantX import RealTimeData
+
+# --- Cấu hình chiến lược (đọc từ file JSON ở lần dùng đầu tiên, không đọc lúc import) ---
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'strategy_config.json')
-with open(CONFIG_PATH, 'r') as f:
-    strategy_config = json.load(f)
+TICKER_THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'ticker_thresholds.json')
+_strategy_config = None
+_ticker_thresholds = None  # mã -> bộ ngưỡng theo trạng thái biến động riêng của mã
+_rule_evaluator = None
+_vector_rule_evaluator = None
+
+
+def get_strategy_config():
+    """Trả về cấu hình chiến lược, tải từ file JSON ở lần gọi đầu tiên."""
+    if _strategy_config is None:
+        reload_strategy_config()
+    return _strategy_config
+
+
+def reload_strategy_config():
+    """Đọc lại file strategy_config.json (ví dụ sau khi 'Bộ não ML' cập nhật ngưỡng)."""
+    global _strategy_config, _rule_evaluator, _vector_rule_evaluator, _ticker_thresholds
+    with open(CONFIG_PATH, 'r') as f:
+        _strategy_config = json.load(f)
+    _rule_evaluator = None
+    _vector_rule_evaluator = None
+    _ticker_thresholds = None
+    return _strategy_config
+
+
+def reload_ticker_thresholds():
+    """
+    Đọc bảng trạng thái theo mã do 'Bộ não ML' ghi (ticker_thresholds.json) thành dict mã -> bộ ngưỡng.
+    Không có file thì mọi mã dùng ngưỡng chung trong strategy_config.json.
+    """
+    global _ticker_thresholds
+    thresholds = {}
+    if os.path.exists(TICKER_THRESHOLDS_PATH):
+        with open(TICKER_THRESHOLDS_PATH, 'r') as f:
+            payload = json.load(f)
+        by_state = {
+            state: {name: values[name] for name in THRESHOLD_NAMES}
+            for state, values in payload.get('thresholds', {}).items()
+        }
+        thresholds = {ticker: by_state[state] for ticker, state in payload.get('tickers', {}).items() if state in by_state}
+    _ticker_thresholds = thresholds
+    return _ticker_thresholds
+
+
+def get_ticker_thresholds(ticker):
+    """Bộ ngưỡng áp dụng cho một mã (tra O(1)), mặc định là ngưỡng chung của cấu hình."""
+    if _ticker_thresholds is None:
+        reload_ticker_thresholds()
+    thresholds = _ticker_thresholds.get(ticker)
+    return thresholds if thresholds is not None else get_strategy_config()
+
+
+def get_rule_evaluator():
+    """Bộ đánh giá quy tắc đã biên dịch cho cấu hình hiện tại: (evaluate, evaluate_flags)."""
+    global _rule_evaluator
+    if _rule_evaluator is None:
+        _rule_evaluator = compile_scalar_evaluator(get_strategy_config())
+    return _rule_evaluator
+
+
+def get_vector_rule_evaluator():
+    """Bộ đánh giá quy tắc vector hóa cho cấu hình hiện tại (dùng khi gom lô nhiều mã): (evaluate, evaluate_flags)."""
+    global _vector_rule_evaluator
+    if _vector_rule_evaluator is None:
+        _vector_rule_evaluator = compile_vector_evaluator(get_strategy_config())
+    return _vector_rule_evaluator
 
 # --- Bộ nhớ đệm cho dữ liệu lịch sử ---
 MAX_HISTORY_LENGTH = 200
 price_history = {}
 
-def detect_signal(data: RealTimeData):
+# Ảnh chụp trực tiếp cho dashboard (live_snapshot.SnapshotWriter), main.py gắn vào nếu config.LIVE_SNAPSHOT_ENABLED
+live_snapshot = None
+
+
+def _publish_snapshot(ticker, last, prev, thresholds, decision):
+    """Ghi giá, chỉ báo và cờ nhóm điều kiện mới nhất của mã vào ảnh chụp dùng chung."""
+    if live_snapshot is None:
+        return
+    _, evaluate_flags = get_rule_evaluator()
+    live_snapshot.update(ticker, last, evaluate_flags(last, prev, thresholds), decision[0])
+
+# --- Fast path cho tick trùng lặp ---
+# Luồng dữ liệu thường đẩy lại cùng một trạng thái tick nhiều lần mỗi giây.
+# Lưu "dấu vân tay" tick gần nhất và quyết định gần nhất theo từng mã để bỏ qua
+# việc thêm nến và tính lại toàn bộ chỉ báo khi không có gì thay đổi.
+_last_fingerprint = {}
+_last_decision = {}
+fast_path_stats = {
+    'ticks_total': 0,       # Tổng số tick nhận được
+    'ticks_skipped': 0,     # Số tick trùng lặp được trả về từ cache
+    'indicator_runs': 0,    # Số lần thực sự tính toán chỉ báo
+}
+
+
+def _tick_fingerprint(data):
+    """Tạo dấu vân tay từ các trường của tick có ảnh hưởng đến nến và chỉ báo."""
+    return (
+        getattr(data, 'Time', None),
+        getattr(data, 'Open', None),
+        getattr(data, 'High', None),
+        getattr(data, 'Low', None),
+        data.Close,
+        getattr(data, 'Volume', None),
+    )
+
+
+def get_fast_path_stats():
+    """Trả về bản sao các bộ đếm fast path kèm tỷ lệ tick được bỏ qua."""
+    stats = dict(fast_path_stats)
+    total = stats['ticks_total']
+    stats['skip_ratio'] = stats['ticks_skipped'] / total if total else 0.0
+    return stats
+
+
+def warm_start(state):
+    """
+    Nạp trạng thái khởi động ấm (các tick gần nhất của phiên trước) do job tiền phiên chuẩn bị,
+    để các mã có tín hiệu ngay từ những tick đầu tiên của phiên.
+    Trả về số mã đã được nạp.
+    """
+    count = 0
+    for ticker, ticker_state in state.get('tickers', {}).items():
+        price_history[ticker] = deque(ticker_state['bars'], maxlen=MAX_HISTORY_LENGTH)
+        count += 1
+    return count
+
+
+def detect_signal(data: 'RealTimeData'):
     """
     Phát hiện tín hiệu dựa trên ma trận quy tắc Momentum và Trend.
+
+    Returns:
+        tuple: (tín hiệu, giải thích, fresh). `fresh` là False khi tick trùng lặp và quyết định được lấy
+               từ cache: tín hiệu đó đã được báo ở tick trước nên bên gọi không phát lại.
     """
     ticker = data.Ticker
-    
-    # --- Bước 1: Cập nhật bộ nhớ đệm ---
+    fast_path_stats['ticks_total'] += 1
+
+    # --- Bước 0: Fast path - tick không đổi thì trả về quyết định đã cache ---
+    fingerprint = _tick_fingerprint(data)
+    if ticker in _last_decision and _last_fingerprint.get(ticker) == fingerprint:
+        fast_path_stats['ticks_skipped'] += 1
+        return (*_last_decision[ticker], False)
+
+    decision = _evaluate_tick(ticker, data)
+    _last_fingerprint[ticker] = fingerprint
+    _last_decision[ticker] = decision
+    return (*decision, True)
+
+
+def _append_candle(ticker, data):
+    """Thêm nến mới của tick vào bộ nhớ đệm và trả về lịch sử của mã."""
     if ticker not in price_history:
         price_history[ticker] = deque(maxlen=MAX_HISTORY_LENGTH)
     
-    new_candle = { 'timestamp': getattr(data, 'Time', pd.Timestamp.now()), 'open': getattr(data, 'Open', data.Close), 'high': getattr(data, 'High', data.Close), 'low': getattr(data, 'Low', data.Close), 'close': data.Close, 'volume': getattr(data, 'Volume', 0) }
+    new_candle = { 'timestamp': getattr(data, 'Time', datetime.now()), 'open': getattr(data, 'Open', data.Close), 'high': getattr(data, 'High', data.Close), 'low': getattr(data, 'Low', data.Close), 'close': data.Close, 'volume': getattr(data, 'Volume', 0) }
     price_history[ticker].append(new_candle)
+    return price_history[ticker]
+
 
-    if len(price_history[ticker]) < 50:
+def _evaluate_tick(ticker, data):
+    """
+    Thêm nến mới vào bộ nhớ đệm rồi tính chỉ báo và áp dụng ma trận quy tắc.
+    """
+    # --- Bước 1: Cập nhật bộ nhớ đệm ---
+    history = _append_candle(ticker, data)
+
+    if len(history) < 50:
         return None, "Đang thu thập đủ dữ liệu lịch sử..."
 
     # --- Bước 2: Tính toán các chỉ báo ---
-    df = pd.DataFrame(list(price_history[ticker]))
-    
-    df.ta.rsi(length=strategy_config['RSI_PERIOD'], append=True)
-    df.ta.macd(fast=strategy_config['MACD_FAST'], slow=strategy_config['MACD_SLOW'], signal=strategy_config['MACD_SIGNAL'], append=True)
-    df.ta.sma(length=strategy_config['SMA_SHORT_PERIOD'], append=True)
-    df.ta.sma(length=strategy_config['SMA_LONG_PERIOD'], append=True)
-    df.ta.stoch(k=strategy_config['STOCH_K'], d=strategy_config['STOCH_D'], smooth_k=strategy_config['STOCH_SMOOTH'], append=True)
-    df.ta.adx(length=strategy_config['ADX_PERIOD'], append=True)
-    
-    last = df.iloc[-1]
-    prev = df.iloc[-2]
-
-    # --- Bước 3: Đặt tên cột và định nghĩa các điều kiện cơ bản ---
-    rsi_col = f"RSI_{strategy_config['RSI_PERIOD']}"
-    macd_line = f"MACD_{strategy_config['MACD_FAST']}_{strategy_config['MACD_SLOW']}_{strategy_config['MACD_SIGNAL']}"
-    macd_signal = f"MACDs_{strategy_config['MACD_FAST']}_{strategy_config['MACD_SLOW']}_{strategy_config['MACD_SIGNAL']}"
-    sma20 = f"SMA_{strategy_config['SMA_SHORT_PERIOD']}"
-    sma50 = f"SMA_{strategy_config['SMA_LONG_PERIOD']}"
-    stoch_k = f"STOCHk_{strategy_config['STOCH_K']}_{strategy_config['STOCH_D']}_{strategy_config['STOCH_SMOOTH']}"
-    stoch_d = f"STOCHd_{strategy_config['STOCH_K']}_{strategy_config['STOCH_D']}_{strategy_config['STOCH_SMOOTH']}"
-    adx = f"ADX_{strategy_config['ADX_PERIOD']}"
-
-    # -- Điều kiện Momentum --
-    is_momentum_buy = (last[rsi_col] < strategy_config['RSI_OVERSOLD']) or \
-                      (last[stoch_k] > last[stoch_d] and prev[stoch_k] <= prev[stoch_d] and last[stoch_k] < 20)
-    
-    is_momentum_sell = (last[rsi_col] > strategy_config['RSI_OVERBOUGHT']) or \
-                       (last[stoch_k] < last[stoch_d] and prev[stoch_k] >= prev[stoch_d] and last[stoch_k] > 80)
+    fast_path_stats['indicator_runs'] += 1
+    strategy_config = get_strategy_config()
+    high = np.fromiter((c['high'] for c in history), dtype=np.float64, count=len(history))
+    low = np.fromiter((c['low'] for c in history), dtype=np.float64, count=len(history))
+    close = np.fromiter((c['close'] for c in history), dtype=np.float64, count=len(history))
 
-    # -- Điều kiện Trend --
-    is_trend_buy = (last[macd_line] > last[macd_signal] and prev[macd_line] <= prev[macd_signal]) or \
-                   (last['close'] > last[sma20] and prev['close'] <= prev[sma20]) or \
-                   (last['close'] > last[sma50] and prev['close'] <= prev[sma50])
+    values = compute_strategy_indicators(high, low, close, strategy_config, names=STRATEGY_INDICATORS)
+    values['close'] = close
+    last = {col: arr[-1] for col, arr in values.items()}
+    prev = {col: arr[-2] for col, arr in values.items()}
 
-    is_trend_sell = (last[macd_line] < last[macd_signal] and prev[macd_line] >= prev[macd_signal]) or \
-                    (last['close'] < last[sma20] and prev['close'] >= prev[sma20]) or \
-                    (last['close'] < last[sma50] and prev['close'] >= prev[sma50])
+    # --- Bước 3: Áp dụng ma trận quy tắc (khai báo trong rules.py) ---
+    evaluate, _ = get_rule_evaluator()
+    thresholds = get_ticker_thresholds(ticker)
+    decision = evaluate(last, prev, thresholds)
+    _publish_snapshot(ticker, last, prev, thresholds, decision)
+    return decision
 
-    # -- Điều kiện Cảnh báo Rủi ro --
-    is_trend_still_strong_up = (last[macd_line] > 0) and (last['close'] > last[sma20]) and (last['close'] > last[sma50]) and (last[adx] > strategy_config['ADX_THRESHOLD'])
-    is_trend_still_strong_down = (last[macd_line] < 0) and (last['close'] < last[sma20]) and (last['close'] < last[sma50]) and (last[adx] > strategy_config['ADX_THRESHOLD'])
 
-    # --- Bước 4: Áp dụng ma trận quy tắc ---
-    
-    # 1. Tín hiệu Mua mới
-    if is_momentum_buy and is_trend_buy:
-        return 'Mua mới', f"Momentum ({'RSI' if last[rsi_col] < strategy_config['RSI_OVERSOLD'] else 'Stoch'}) và Trend ({'MACD' if last[macd_line] > last[macd_signal] else 'SMA'}) đều xác nhận mua."
-        
-    # 2. Tín hiệu Bán chốt lời
-    if is_momentum_sell and is_trend_sell:
-        return 'Bán chốt lời', f"Momentum ({'RSI' if last[rsi_col] > strategy_config['RSI_OVERBOUGHT'] else 'Stoch'}) và Trend ({'MACD' if last[macd_line] < last[macd_signal] else 'SMA'}) đều xác nhận bán."
-
-    # 3. Cảnh báo rủi ro (dễ điều chỉnh)
-    if last[rsi_col] > strategy_config['RSI_OVERBOUGHT'] and is_trend_still_strong_up:
-        return 'Cảnh báo rủi ro (dễ điều chỉnh)', f"RSI({last[rsi_col]:.2f}) quá mua nhưng xu hướng tăng vẫn còn rất mạnh (ADX={last[adx]:.2f})."
-        
-    # 4. Cảnh báo rủi ro (bắt đáy nguy hiểm)
-    if last[rsi_col] < strategy_config['RSI_OVERSOLD'] and is_trend_still_strong_down:
-        return 'Cảnh báo rủi ro (bắt đáy nguy hiểm)', f"RSI({last[rsi_col]:.2f}) quá bán nhưng xu hướng giảm vẫn còn rất mạnh (ADX={last[adx]:.2f})."
-        
-    # 5. Không tín hiệu / Quan sát (không cần trả về)
-    
-    return None, None
+# --- Micro-batching: xử lý nhiều mã trong một lần tính ---
+
+def detect_signals_batch(ticks):
+    """
+    Phiên bản gom lô của detect_signal: cho kết quả giống hệt việc gọi detect_signal lần lượt
+    cho từng tick, nhưng chỉ báo và quy tắc được tính một lần trên mảng 2D (số mã × lịch sử).
+
+    Nếu một mã có nhiều tick trong lô, các tick được chia thành nhiều "vòng" (vòng k gồm tick
+    thứ k của mỗi mã) và xử lý lần lượt, để mỗi tick vẫn được đánh giá trên đúng lịch sử của nó.
+
+    Returns:
+        list: (tín hiệu, giải thích, fresh) theo đúng thứ tự của `ticks`; tick trùng lặp (với tick trước
+              trong lô hoặc với lô trước) có fresh=False như ở detect_signal.
+    """
+    results = [None] * len(ticks)
+    rounds = []
+    duplicates = []
+    last_seen = {}  # ticker -> (dấu vân tay, vị trí) của tick gần nhất trong lô
+    depth = {}
+
+    for pos, data in enumerate(ticks):
+        ticker = data.Ticker
+        fast_path_stats['ticks_total'] += 1
+        fingerprint = _tick_fingerprint(data)
+        if ticker in last_seen:
+            if last_seen[ticker][0] == fingerprint:
+                fast_path_stats['ticks_skipped'] += 1
+                duplicates.append((pos, last_seen[ticker][1]))
+                continue
+        elif ticker in _last_decision and _last_fingerprint.get(ticker) == fingerprint:
+            fast_path_stats['ticks_skipped'] += 1
+            results[pos] = (*_last_decision[ticker], False)
+            continue
+
+        k = depth.get(ticker, 0)
+        depth[ticker] = k + 1
+        if k == len(rounds):
+            rounds.append([])
+        rounds[k].append((pos, ticker, data, fingerprint))
+        last_seen[ticker] = (fingerprint, pos)
+
+    for items in rounds:
+        for (pos, ticker, _, fingerprint), decision in zip(items, _evaluate_round(items)):
+            results[pos] = (*decision, True)
+            _last_fingerprint[ticker] = fingerprint
+            _last_decision[ticker] = decision
+
+    for pos, source_pos in duplicates:
+        results[pos] = (*results[source_pos][:2], False)
+    return results
+
+
+def _evaluate_round(items):
+    """Đánh giá một vòng (mỗi mã tối đa một tick) trên mảng 2D đệm NaN bên trái."""
+    decisions = [(None, "Đang thu thập đủ dữ liệu lịch sử...")] * len(items)
+    ready = []
+    for i, (_, ticker, data, _) in enumerate(items):
+        if len(_append_candle(ticker, data)) >= 50:
+            ready.append(i)
+    if not ready:
+        return decisions
+
+    strategy_config = get_strategy_config()
+    histories = [price_history[items[i][1]] for i in ready]
+    width = max(len(h) for h in histories)
+    high = np.full((len(ready), width), np.nan)
+    low = np.full((len(ready), width), np.nan)
+    close = np.full((len(ready), width), np.nan)
+    for row, history in enumerate(histories):
+        n = len(history)
+        high[row, width - n:] = np.fromiter((c['high'] for c in history), dtype=np.float64, count=n)
+        low[row, width - n:] = np.fromiter((c['low'] for c in history), dtype=np.float64, count=n)
+        close[row, width - n:] = np.fromiter((c['close'] for c in history), dtype=np.float64, count=n)
+
+    fast_path_stats['indicator_runs'] += len(ready)
+    values = compute_strategy_indicators(high, low, close, strategy_config, names=STRATEGY_INDICATORS)
+    values['close'] = close
+    tail = {col: arr[:, -2:] for col, arr in values.items()}
+    row_thresholds = [get_ticker_thresholds(items[i][1]) for i in ready]
+    # Ngưỡng theo từng hàng (mã), lặp lại cho 2 nến cuối
+    thresholds = {
+        name: np.repeat(np.array([t[name] for t in row_thresholds], dtype=np.float64)[:, None], 2, axis=1)
+        for name in THRESHOLD_NAMES
+    }
+    evaluate_rules, evaluate_flags = get_vector_rule_evaluator()
+    rule_index = evaluate_rules(tail, thresholds)[:, -1]
+
+    evaluate, _ = get_rule_evaluator()
+    for row, i in enumerate(ready):
+        if rule_index[row] >= 0:
+            # Chỉ các mã có tín hiệu mới cần dựng phần giải thích
+            last = {col: arr[row, 1] for col, arr in tail.items()}
+            prev = {col: arr[row, 0] for col, arr in tail.items()}
+            decisions[i] = evaluate(last, prev, row_thresholds[row])
+        else:
+            decisions[i] = (None, None)
+
+    if live_snapshot is not None:
+        # Cờ nhóm lấy từ bộ đánh giá vector và cả vòng được ghi vào ảnh chụp trong một lần
+        live_snapshot.update_many(
+            [items[i][1] for i in ready],
+            {col: arr[:, 1] for col, arr in tail.items()},
+            {name: mask[:, -1] for name, mask in evaluate_flags(tail, thresholds).items()},
+            [decisions[i][0] for i in ready],
+        )
+    return decisions
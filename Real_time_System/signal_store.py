@@ -0,0 +1,203 @@
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, Iterable, Optional
+
+import config
+
+# --- Kho tín hiệu SQLite (chế độ WAL) ---
+# main.py là tiến trình ghi duy nhất; dashboard mở nhiều kết nối chỉ đọc song song.
+# Ở chế độ WAL bên đọc đọc ảnh chụp đã commit và không chặn bên ghi (và ngược lại).
+# Mọi bộ lọc của dashboard (khoảng thời gian, mã, loại tín hiệu) đi qua các chỉ mục
+# (timestamp), (ticker, timestamp), (signal, timestamp) và được phân trang bằng LIMIT/OFFSET.
+# timestamp lưu dạng chuỗi 'YYYY-MM-DD HH:MM:SS' nên so sánh chuỗi đúng theo thứ tự thời gian.
+SIGNAL_DB_FILE = config.SIGNAL_DB_FILE
+COLUMNS = ['timestamp', 'ticker', 'signal', 'price', 'details']
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    signal TEXT NOT NULL,
+    price REAL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_signals_timestamp ON signals (timestamp);
+CREATE INDEX IF NOT EXISTS idx_signals_ticker_timestamp ON signals (ticker, timestamp);
+CREATE INDEX IF NOT EXISTS idx_signals_signal_timestamp ON signals (signal, timestamp);
+"""
+
+
+class SignalWriter:
+    """Bên ghi duy nhất của kho tín hiệu; an toàn khi được gọi từ nhiều luồng."""
+
+    def __init__(self, path: str = SIGNAL_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000.0)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Với WAL, synchronous=NORMAL vẫn an toàn khi tiến trình sập, chỉ có thể mất commit cuối khi mất điện
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def insert(self, timestamp: str, ticker: str, signal: str, price: float, details: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO signals (timestamp, ticker, signal, price, details) VALUES (?, ?, ?, ?, ?)',
+                (timestamp, ticker, signal, price, details),
+            )
+            self._conn.commit()
+
+    def insert_many(self, rows: Iterable) -> int:
+        """Ghi nhiều dòng (timestamp, ticker, signal, price, details) trong một giao dịch."""
+        rows = list(rows)
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO signals (timestamp, ticker, signal, price, details) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Đọc (kết nối chỉ đọc cho dashboard)
+# ---------------------------------------------------------------------------
+
+def open_reader(path: str = SIGNAL_DB_FILE) -> Optional[sqlite3.Connection]:
+    """Mở kết nối chỉ đọc, hoặc None nếu chưa có kho. Mỗi lần truy vấn nên dùng một kết nối riêng."""
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True, timeout=BUSY_TIMEOUT_MS / 1000.0)
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    return conn
+
+
+def _where(start: Optional[str], end: Optional[str], tickers, signals):
+    """Dựng mệnh đề WHERE cho [start, end) cùng danh sách mã/loại tín hiệu (None = không lọc)."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('timestamp >= ?')
+        params.append(start)
+    if end is not None:
+        clauses.append('timestamp < ?')
+        params.append(end)
+    for column, values in (('ticker', tickers), ('signal', signals)):
+        if values is None:
+            continue
+        values = list(values)
+        clauses.append(f"{column} IN ({', '.join('?' * len(values))})" if values else '0')
+        params.extend(values)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def query_signals(
+    conn: sqlite3.Connection,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tickers: Optional[Iterable[str]] = None,
+    signals: Optional[Iterable[str]] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """Các tín hiệu khớp bộ lọc, mới nhất trước, dạng DataFrame với các cột COLUMNS."""
+    import pandas as pd
+
+    where, params = _where(start, end, tickers, signals)
+    sql = f"SELECT {', '.join(COLUMNS)} FROM signals{where} ORDER BY timestamp DESC, id DESC"
+    if limit is not None:
+        sql += ' LIMIT ? OFFSET ?'
+        params += [int(limit), int(offset)]
+    df = pd.read_sql_query(sql, conn, params=params)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    return df
+
+
+def summarize_signals(
+    conn: sqlite3.Connection,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    tickers: Optional[Iterable[str]] = None,
+    signals: Optional[Iterable[str]] = None,
+) -> Dict:
+    """Tổng số tín hiệu, số mã, thời điểm mới nhất và số tín hiệu theo từng loại."""
+    where, params = _where(start, end, tickers, signals)
+    total, num_tickers, latest = conn.execute(
+        f'SELECT COUNT(*), COUNT(DISTINCT ticker), MAX(timestamp) FROM signals{where}', params
+    ).fetchone()
+    counts = dict(conn.execute(f'SELECT signal, COUNT(*) FROM signals{where} GROUP BY signal', params).fetchall())
+    return {'total': total, 'num_tickers': num_tickers, 'latest': latest, 'counts': counts}
+
+
+def distinct_values(conn: sqlite3.Connection, column: str, start: Optional[str] = None, end: Optional[str] = None):
+    """Các giá trị khác nhau của cột 'ticker' hoặc 'signal' trong khoảng thời gian (cho bộ lọc)."""
+    if column not in ('ticker', 'signal'):
+        raise ValueError(f"Cột không hợp lệ: {column}")
+    where, params = _where(start, end, None, None)
+    return [row[0] for row in conn.execute(f'SELECT DISTINCT {column} FROM signals{where} ORDER BY {column}', params)]
+
+
+# ---------------------------------------------------------------------------
+# Nhập/xuất CSV
+# ---------------------------------------------------------------------------
+
+def import_csv(csv_path: str = config.CSV_FILE, db_path: str = SIGNAL_DB_FILE) -> int:
+    """Nhập signals.csv cũ (bỏ dòng header/comment) vào kho SQLite."""
+    rows = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) != len(COLUMNS) or row[0].startswith('#') or row[0] == 'timestamp':
+                continue
+            timestamp, ticker, signal, price, details = row
+            try:
+                price = float(price)
+            except ValueError:
+                price = None
+            rows.append((timestamp, ticker, signal, price, details))
+    writer = SignalWriter(db_path)
+    try:
+        return writer.insert_many(rows)
+    finally:
+        writer.close()
+
+
+def export_csv(csv_path: str, db_path: str = SIGNAL_DB_FILE, **filters) -> int:
+    """Xuất các tín hiệu khớp bộ lọc (xem query_signals) ra file CSV."""
+    conn = open_reader(db_path)
+    if conn is None:
+        raise FileNotFoundError(db_path)
+    with closing(conn):
+        df = query_signals(conn, **filters)
+    df.to_csv(csv_path, index=False)
+    return len(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Nhập/xuất kho tín hiệu SQLite')
+    parser.add_argument('--db', default=SIGNAL_DB_FILE, help='Đường dẫn file SQLite')
+    parser.add_argument('--import_csv', help='Nhập tín hiệu từ file CSV cũ (ví dụ signals.csv)')
+    parser.add_argument('--export_csv', help='Xuất tín hiệu ra file CSV')
+    parser.add_argument('--start', help='Lọc khi xuất: từ ngày YYYY-MM-DD')
+    parser.add_argument('--end', help='Lọc khi xuất: trước ngày YYYY-MM-DD')
+    args = parser.parse_args(argv)
+
+    if args.import_csv:
+        print(f"Đã nhập {import_csv(args.import_csv, args.db)} tín hiệu từ {args.import_csv} vào {args.db}")
+    if args.export_csv:
+        count = export_csv(args.export_csv, args.db, start=args.start, end=args.end)
+        print(f"Đã xuất {count} tín hiệu ra {args.export_csv}")
+    if not args.import_csv and not args.export_csv:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
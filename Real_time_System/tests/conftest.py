@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module của hệ thống dùng import phẳng (import config, ...) nên cần thư mục gói trong sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from live_snapshot import INDICATOR_FIELDS, SIGNALS, SnapshotWriter, read_snapshot
+from rules import ACTIVE_GROUPS
+from signal_detector import get_strategy_config
+
+TICKERS = [f'T{i:03d}' for i in range(300)]
+
+
+@pytest.fixture
+def writer():
+    snapshot = SnapshotWriter(get_strategy_config(), TICKERS, capacity=512, name=f'rts_test_{uuid.uuid4().hex[:8]}')
+    yield snapshot
+    snapshot.close()
+
+
+def _round(writer, value):
+    last = {col: np.full(len(TICKERS), value) for col in writer._columns.values()}
+    last['close'] = np.full(len(TICKERS), value)
+    flags = {group: np.full(len(TICKERS), int(value) % 2 == 1) for group in ACTIVE_GROUPS}
+    writer.update_many(TICKERS, last, flags, [SIGNALS[0]] * len(TICKERS))
+
+
+def test_update_many_round_trip(writer):
+    _round(writer, 3.0)
+    df = read_snapshot(writer._shm.name.lstrip('/'))
+    assert df['ticker'].tolist() == TICKERS
+    assert (df['price'] == 3.0).all()
+    for field in INDICATOR_FIELDS:
+        assert (df[field] == 3.0).all()
+    for group in ACTIVE_GROUPS:
+        assert df[f'flag_{group}'].all()
+    assert (df['signal'] == SIGNALS[0]).all()
+
+
+def test_read_during_update_many_is_consistent(writer):
+    # Mỗi lần update_many ghi cùng một giá trị cho mọi hàng: bản đọc nhất quán không bao giờ trộn hai lần ghi
+    name = writer._shm.name.lstrip('/')
+    _round(writer, 1.0)
+    stop = threading.Event()
+
+    def write_loop():
+        value = 1.0
+        while not stop.is_set():
+            value += 1.0
+            _round(writer, value)
+
+    thread = threading.Thread(target=write_loop)
+    thread.start()
+    try:
+        reads = 0
+        for _ in range(200):
+            df = read_snapshot(name)
+            if df is None:
+                continue  # hết số lần thử trong lúc bên ghi bận: không trả về bản dở dang
+            reads += 1
+            assert df['price'].nunique() == 1
+            for field in INDICATOR_FIELDS:
+                assert (df[field] == df['price']).all()
+            flags = df[[f'flag_{group}' for group in ACTIVE_GROUPS]].to_numpy()
+            assert (flags == (int(df['price'].iloc[0]) % 2 == 1)).all()
+    finally:
+        stop.set()
+        thread.join()
+    assert reads > 0
+
+
+def test_capacity_overflow_skips_new_tickers(writer):
+    extra = [f'X{i:03d}' for i in range(300)]
+    last = {col: np.ones(len(extra)) for col in writer._columns.values()}
+    last['close'] = np.ones(len(extra))
+    writer.update_many(extra, last, {}, [None] * len(extra))
+    df = read_snapshot(writer._shm.name.lstrip('/'))
+    assert len(df) == 512 - len(TICKERS)
+
+
+def test_read_missing_block_returns_none():
+    assert read_snapshot(f'rts_missing_{uuid.uuid4().hex[:8]}') is None
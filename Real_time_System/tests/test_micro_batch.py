@@ -0,0 +1,41 @@
+import threading
+
+from micro_batch import MicroBatcher
+
+
+def test_batches_respect_max_size_and_flush_on_stop():
+    batches = []
+    gate = threading.Event()
+
+    def process(batch):
+        gate.wait(5)  # Giữ lô đầu để các tick sau dồn lại trong hàng đợi
+        batches.append(list(batch))
+
+    batcher = MicroBatcher(process, window_ms=50, max_size=4)
+    batcher.start()
+    for i in range(10):
+        batcher.submit(i)
+    gate.set()
+    batcher.stop()
+
+    assert [tick for batch in batches for tick in batch] == list(range(10))
+    assert all(len(batch) <= 4 for batch in batches)
+    stats = batcher.get_stats()
+    assert stats['ticks'] == 10
+    assert stats['batches'] == len(batches)
+
+
+def test_error_in_batch_does_not_stop_worker():
+    seen = []
+
+    def process(batch):
+        seen.extend(batch)
+        if 0 in batch:
+            raise RuntimeError('lỗi thử')
+
+    batcher = MicroBatcher(process, window_ms=1, max_size=1)
+    batcher.start()
+    batcher.submit(0)
+    batcher.submit(1)
+    batcher.stop()
+    assert seen == [0, 1]
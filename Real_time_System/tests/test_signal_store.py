@@ -0,0 +1,64 @@
+import pytest
+
+from signal_store import SignalWriter, distinct_values, export_csv, open_reader, query_signals, summarize_signals
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'signals.db')
+    writer = SignalWriter(path)
+    rows = []
+    for day in range(1, 11):
+        for ticker, signal in (('FPT', 'MUA'), ('VND', 'BÁN'), ('HPG', 'MUA')):
+            rows.append((f'2026-01-{day:02d} 10:00:00', ticker, signal, 100.0 + day, f'{ticker} ngày {day}'))
+    writer.insert_many(rows)
+    writer.close()
+    return path
+
+
+def test_open_reader_missing_db(tmp_path):
+    assert open_reader(str(tmp_path / 'missing.db')) is None
+
+
+def test_query_paging_newest_first(db_path):
+    conn = open_reader(db_path)
+    everything = query_signals(conn)
+    pages = [query_signals(conn, limit=7, offset=offset) for offset in range(0, 30, 7)]
+    conn.close()
+
+    assert len(everything) == 30
+    assert everything['timestamp'].is_monotonic_decreasing
+    assert [len(p) for p in pages] == [7, 7, 7, 7, 2]
+    paged = [row for p in pages for row in p['details']]
+    assert paged == everything['details'].tolist()
+
+
+def test_query_filters(db_path):
+    conn = open_reader(db_path)
+    df = query_signals(conn, start='2026-01-03', end='2026-01-06', tickers=['FPT', 'VND'], signals=['MUA'])
+    none = query_signals(conn, tickers=[])
+    summary = summarize_signals(conn, start='2026-01-03', end='2026-01-06')
+    tickers = distinct_values(conn, 'ticker', start='2026-01-10')
+    conn.close()
+
+    assert df['ticker'].unique().tolist() == ['FPT']
+    assert df['timestamp'].dt.day.tolist() == [5, 4, 3]  # end không bao gồm
+    assert none.empty
+    assert summary['total'] == 9
+    assert summary['num_tickers'] == 3
+    assert summary['counts'] == {'MUA': 6, 'BÁN': 3}
+    assert tickers == ['FPT', 'HPG', 'VND']
+
+
+def test_distinct_values_rejects_other_columns(db_path):
+    conn = open_reader(db_path)
+    with pytest.raises(ValueError):
+        distinct_values(conn, 'price')
+    conn.close()
+
+
+def test_export_csv(db_path, tmp_path):
+    out = str(tmp_path / 'export.csv')
+    assert export_csv(out, db_path, tickers=['VND']) == 10
+    with open(out, encoding='utf-8') as f:
+        assert f.readline().strip() == 'timestamp,ticker,signal,price,details'
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+import tick_store
+from tick_store import TickStore, TickWriter, iter_day_ticks, load_recent, open_ticker, to_ns
+
+
+def test_append_grow_reopen_round_trip(tmp_path):
+    path = str(tmp_path / '20260119' / 'FPT.bin')
+    writer = TickWriter(path, initial_capacity=4)
+    for i in range(10):
+        writer.append(to_ns(datetime(2026, 1, 19, 9, 0, i)), i, i + 1, i - 1, i + 0.5, 100 * i)
+    assert writer.capacity >= 10
+    writer.close()
+
+    writer = TickWriter(path)
+    assert writer.count == 10
+    writer.append(to_ns(datetime(2026, 1, 19, 9, 1)), 10, 11, 9, 10.5, 1000, True)
+    writer.close()
+
+    records = open_ticker('20260119', 'FPT', str(tmp_path))
+    assert len(records) == 11
+    np.testing.assert_array_equal(records['close'], np.arange(11) + 0.5)
+    assert records['synthetic_ts'].tolist() == [0] * 10 + [1]
+    assert np.all(np.diff(records['ts']) > 0)
+
+
+def test_reader_sees_only_completed_records_while_writing(tmp_path):
+    path = str(tmp_path / '20260119' / 'VND.bin')
+    writer = TickWriter(path, initial_capacity=2)
+    writer.append(to_ns(datetime(2026, 1, 19, 9)), 1, 1, 1, 1, 1)
+    snapshot = open_ticker('20260119', 'VND', str(tmp_path))
+    for _ in range(5):
+        writer.append(to_ns(datetime(2026, 1, 19, 9)), 2, 2, 2, 2, 2)
+    assert len(snapshot) == 1
+    assert len(open_ticker('20260119', 'VND', str(tmp_path))) == 6
+    writer.close()
+
+
+def _store_ticks(root, day, ticks):
+    store = TickStore(str(root))
+    for tick in ticks:
+        store.append_tick(tick)
+    store.close()
+    return day.strftime('%Y%m%d')
+
+
+def test_load_recent_drops_duplicates_without_time(tmp_path):
+    # Luồng thật không gửi Time: bên ghi gán thời điểm nhận, tick lặp lại vẫn phải bị bỏ như fast path
+    closes = [10.0, 10.0, 10.0, 10.1, 10.1, 10.0, 10.2]
+    store = TickStore(str(tmp_path))
+    for close in closes:
+        store.append_tick(SimpleNamespace(Ticker='HPG', Close=close))
+    store.close()
+
+    records = load_recent('HPG', 100, str(tmp_path))
+    assert records['close'].tolist() == [10.0, 10.1, 10.0, 10.2]
+    assert records['synthetic_ts'].all()
+
+
+def test_load_recent_keeps_same_prices_with_distinct_time(tmp_path):
+    start = datetime(2026, 1, 19, 9)
+    ticks = [SimpleNamespace(Ticker='SSI', Close=20.0, Time=start + timedelta(seconds=i // 2)) for i in range(6)]
+    _store_ticks(tmp_path, start, ticks)
+
+    records = load_recent('SSI', 100, str(tmp_path))
+    assert len(records) == 3  # mỗi cặp cùng Time là một tick trùng lặp, khác Time thì giữ
+
+
+def test_load_recent_spans_days_and_limits_count(tmp_path, monkeypatch):
+    for day, base in ((datetime(2026, 1, 16, 9), 0), (datetime(2026, 1, 19, 9), 100)):
+        ticks = [
+            SimpleNamespace(Ticker='VCB', Close=float(base + i), Time=day + timedelta(seconds=i)) for i in range(5)
+        ]
+        _store_ticks(tmp_path, day, ticks)
+
+    records = load_recent('VCB', 7, str(tmp_path))
+    assert records['close'].tolist() == [3.0, 4.0, 100.0, 101.0, 102.0, 103.0, 104.0]
+    assert load_recent('MWG', 7, str(tmp_path)) is None
+
+
+def test_iter_day_ticks_omits_synthesized_time(tmp_path):
+    store = TickStore(str(tmp_path))
+    store.append_tick(SimpleNamespace(Ticker='ACB', Close=25.0))
+    store.append_tick(SimpleNamespace(Ticker='ACB', Close=25.1, Time=datetime.now()))
+    store.close()
+
+    day = tick_store.list_days(str(tmp_path))[-1]
+    ticks = list(iter_day_ticks(day, root=str(tmp_path)))
+    assert [hasattr(t, 'Time') for t in ticks] == [False, True]
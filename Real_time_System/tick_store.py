@@ -0,0 +1,297 @@
+import mmap
+import os
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+import config
+
+# --- Kho tick trong ngày dạng file ánh xạ bộ nhớ, chỉ ghi nối thêm ---
+# Mỗi mã mỗi ngày là một file <TICK_STORE_DIR>/<YYYYMMDD>/<TICKER>.bin:
+#   - header 64 byte: magic, số bản ghi đã ghi xong (count), sức chứa (capacity)
+#   - tiếp theo là các bản ghi độ rộng cố định (RECORD_DTYPE)
+# Tiến trình stream (main.py) là nơi ghi duy nhất. Dashboard, backtest, replay mở file chỉ đọc
+# và nhận mảng NumPy trỏ thẳng vào vùng nhớ ánh xạ (không sao chép) ngay cả khi file đang được ghi.
+# Bản ghi được ghi trước, count được cập nhật sau, nên bên đọc không bao giờ thấy bản ghi dở dang.
+# File chỉ lớn lên (nhân đôi sức chứa khi đầy), không bao giờ bị cắt ngắn khi còn bên đọc.
+TICK_STORE_DIR = config.TICK_STORE_DIR
+
+MAGIC = b'RTTICK02'
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('count', '<u8'), ('capacity', '<u8'), ('reserved', 'V40')])
+RECORD_DTYPE = np.dtype([
+    ('ts', '<i8'),  # Thời điểm tick, nano giây kể từ 1970-01-01 theo giờ địa phương (không múi giờ)
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+    ('synthetic_ts', 'u1'),  # 1 = tick không có Time, `ts` là thời điểm nhận do bên ghi gán
+])
+INITIAL_CAPACITY = 4096
+RECENT_MAX_DAYS = 5  # load_recent: số ngày có dữ liệu tối đa được xét
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_ns(ts) -> int:
+    """Chuyển thời điểm tick (datetime hoặc chuỗi ISO) sang nano giây giờ địa phương."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return (ts - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def from_ns(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+def day_key(ts: datetime) -> str:
+    return ts.strftime('%Y%m%d')
+
+
+def _ticker_path(root: str, day: str, ticker: str) -> str:
+    return os.path.join(root, day, f'{ticker}.bin')
+
+
+class TickWriter:
+    """Ghi nối thêm bản ghi vào file của một mã trong một ngày."""
+
+    def __init__(self, path: str, initial_capacity: int = INITIAL_CAPACITY):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                header = np.zeros(1, dtype=HEADER_DTYPE)
+                header['magic'] = MAGIC
+                header['capacity'] = initial_capacity
+                f.write(header.tobytes())
+                f.truncate(HEADER_SIZE + initial_capacity * RECORD_DTYPE.itemsize)
+            os.replace(tmp_path, path)
+        self._file = open(path, 'r+b')
+        self._map()
+
+    def _map(self):
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._header = np.frombuffer(self._mm, dtype=HEADER_DTYPE, count=1)
+        if self._header['magic'][0] != MAGIC:
+            raise ValueError(f"File tick không hợp lệ: {self.path}")
+        # Sức chứa suy ra từ kích thước file (đúng cả ngay sau khi vừa nới file)
+        self.capacity = (len(self._mm) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self._header['capacity'] = self.capacity
+        self.count = int(self._header['count'][0])
+        self._records = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=self.capacity, offset=HEADER_SIZE)
+
+    def _unmap(self):
+        # Phải bỏ các view NumPy trước khi đóng mmap
+        del self._header, self._records
+        self._mm.close()
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        self._unmap()
+        self._file.truncate(HEADER_SIZE + new_capacity * RECORD_DTYPE.itemsize)
+        self._map()
+
+    def append(
+        self, ts_ns: int, open_: float, high: float, low: float, close: float, volume: float, synthetic_ts: bool = False
+    ) -> None:
+        if self.count >= self.capacity:
+            self._grow()
+        self._records[self.count] = (ts_ns, open_, high, low, close, volume, synthetic_ts)
+        self.count += 1
+        self._header['count'] = self.count
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._mm.flush()
+        self._unmap()
+        self._file.close()
+
+
+class TickStore:
+    """
+    Điểm ghi của tiến trình stream: chuyển mỗi tick vào file của mã/ngày tương ứng.
+    An toàn khi callback của luồng dữ liệu được gọi từ nhiều luồng.
+    """
+
+    def __init__(self, root: str = TICK_STORE_DIR):
+        self.root = root
+        self._writers: Dict[tuple, TickWriter] = {}
+        self._lock = threading.Lock()
+
+    def append(
+        self,
+        ticker: str,
+        ts: datetime,
+        open_: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+        synthetic_ts: bool = False,
+    ) -> None:
+        key = (day_key(ts), ticker)
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is None:
+                # Sang ngày mới thì đóng các file của ngày cũ
+                for old_key in [k for k in self._writers if k[0] != key[0]]:
+                    self._writers.pop(old_key).close()
+                writer = self._writers[key] = TickWriter(_ticker_path(self.root, *key))
+            writer.append(to_ns(ts), open_, high, low, close, volume, synthetic_ts)
+
+    def append_tick(self, data) -> None:
+        """Ghi một tick có thuộc tính như RealTimeData (Ticker, Close, Open/High/Low/Volume/Time tùy chọn)."""
+        ts = getattr(data, 'Time', None)
+        if isinstance(ts, str):
+            try:
+                ts = datetime.fromisoformat(ts)
+            except ValueError:
+                ts = None
+        synthetic_ts = not isinstance(ts, datetime)
+        if synthetic_ts:
+            ts = datetime.now()
+        close = float(data.Close)
+        self.append(
+            data.Ticker,
+            ts,
+            float(getattr(data, 'Open', close)),
+            float(getattr(data, 'High', close)),
+            float(getattr(data, 'Low', close)),
+            close,
+            float(getattr(data, 'Volume', 0) or 0),
+            synthetic_ts,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+
+
+# ---------------------------------------------------------------------------
+# Đọc (chỉ đọc, không sao chép)
+# ---------------------------------------------------------------------------
+
+def open_ticker(day: str, ticker: str, root: str = TICK_STORE_DIR) -> Optional[np.ndarray]:
+    """
+    Mở dữ liệu một mã trong một ngày ở chế độ chỉ đọc.
+
+    Returns:
+        np.ndarray: Mảng bản ghi RECORD_DTYPE (view trên vùng nhớ ánh xạ, chỉ đọc) gồm các bản ghi
+                    đã ghi xong tại thời điểm mở; truy cập cột bằng arr['close'], arr['ts']...
+                    None nếu chưa có file.
+    """
+    path = _ticker_path(root, day, ticker)
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    header = np.frombuffer(mm, dtype=HEADER_DTYPE, count=1)
+    if header['magic'][0] != MAGIC:
+        raise ValueError(f"File tick không hợp lệ: {path}")
+    # Bên ghi có thể vừa nới file sau khi ta ánh xạ: chỉ lấy phần nằm trong vùng đã ánh xạ
+    mapped_records = (len(mm) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    count = min(int(header['count'][0]), mapped_records)
+    return np.frombuffer(mm, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE)
+
+
+def list_days(root: str = TICK_STORE_DIR) -> List[str]:
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if len(d) == 8 and d.isdigit())
+
+
+def list_tickers(day: str, root: str = TICK_STORE_DIR) -> List[str]:
+    day_dir = os.path.join(root, day)
+    if not os.path.isdir(day_dir):
+        return []
+    return sorted(name[:-4] for name in os.listdir(day_dir) if name.endswith('.bin'))
+
+
+def load_day(day: str, tickers: Optional[Iterable[str]] = None, root: str = TICK_STORE_DIR) -> Dict[str, np.ndarray]:
+    """Mở dữ liệu của cả thị trường (hoặc các mã chỉ định) trong một ngày: {mã: mảng bản ghi}."""
+    tickers = list_tickers(day, root) if tickers is None else tickers
+    result = {}
+    for ticker in tickers:
+        records = open_ticker(day, ticker, root)
+        if records is not None and len(records):
+            result[ticker] = records
+    return result
+
+
+def _duplicate_mask(records: np.ndarray) -> np.ndarray:
+    """
+    Đánh dấu các bản ghi trùng với bản ghi liền trước theo đúng dấu vân tay của
+    signal_detector._tick_fingerprint: (Time, Open, High, Low, Close, Volume).
+    Tick không có Time (synthetic_ts) mang Time=None ở luồng trực tiếp, nên thời điểm nhận
+    do bên ghi gán không được đưa vào phép so sánh.
+    """
+    duplicate = np.zeros(len(records), dtype=bool)
+    if len(records) < 2:
+        return duplicate
+    same = np.ones(len(records) - 1, dtype=bool)
+    for field in ('open', 'high', 'low', 'close', 'volume'):
+        same &= records[field][1:] == records[field][:-1]
+    synthetic = records['synthetic_ts'].astype(bool)
+    same_time = np.where(synthetic[1:], synthetic[:-1], ~synthetic[:-1] & (records['ts'][1:] == records['ts'][:-1]))
+    duplicate[1:] = same & same_time
+    return duplicate
+
+
+def load_recent(ticker: str, count: int, root: str = TICK_STORE_DIR, max_days: int = RECENT_MAX_DAYS) -> Optional[np.ndarray]:
+    """
+    Tối đa `count` tick gần nhất của một mã, lấy ngược qua tối đa `max_days` ngày có dữ liệu.
+    Tick trùng lặp liên tiếp bị bỏ như fast path của signal_detector, nên kết quả khớp với các nến
+    mà bộ phát hiện tín hiệu đã thêm vào bộ nhớ đệm (xem _duplicate_mask).
+
+    Returns:
+        np.ndarray: Bản sao các bản ghi RECORD_DTYPE theo thứ tự thời gian, hoặc None nếu không có tick.
+    """
+    chunks, total = [], 0
+    for day in reversed(list_days(root)[-max_days:]):
+        records = open_ticker(day, ticker, root)
+        if records is None or not len(records):
+            continue
+        chunks.append(records[~_duplicate_mask(records)][-(count - total):])
+        total += len(chunks[-1])
+        if total >= count:
+            break
+    return np.concatenate(chunks[::-1]) if chunks else None
+
+
+def iter_day_ticks(day: str, tickers: Optional[Iterable[str]] = None, root: str = TICK_STORE_DIR) -> Iterator[SimpleNamespace]:
+    """
+    Sinh các tick của một ngày theo đúng thứ tự thời gian, với thuộc tính như RealTimeData.
+    Tick gốc không có Time (synthetic_ts) cũng được phát lại không có Time, để fast path của
+    signal_detector bỏ qua đúng các tick trùng lặp như ở luồng trực tiếp.
+    """
+    day_data = load_day(day, tickers, root)
+    if not day_data:
+        return
+    names = list(day_data)
+    records = np.concatenate([day_data[t] for t in names])
+    owner = np.repeat(np.arange(len(names)), [len(day_data[t]) for t in names])
+    order = np.argsort(records['ts'], kind='stable')
+    for i in order:
+        rec = records[i]
+        tick = SimpleNamespace(
+            Ticker=names[owner[i]],
+            Open=float(rec['open']),
+            High=float(rec['high']),
+            Low=float(rec['low']),
+            Close=float(rec['close']),
+            Volume=float(rec['volume']),
+        )
+        if not rec['synthetic_ts']:
+            tick.Time = from_ns(rec['ts'])
+        yield tick
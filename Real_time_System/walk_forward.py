@@ -0,0 +1,151 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from backtest import prepare_signal_frame, simulate_trades
+
+# --- Walk-forward backtest ---
+# Chỉ báo, trạng thái thị trường và tín hiệu chỉ phụ thuộc vào dữ liệu quá khứ
+# (nến hiện tại và nến liền trước), nên được tính MỘT lần trên toàn bộ khoảng thời gian
+# rồi cắt theo từng fold. Mỗi fold chỉ còn phần mô phỏng giao dịch, chạy song song.
+SIM_COLUMNS = ['open', 'signal']
+
+
+def build_folds(
+    index: pd.DatetimeIndex,
+    train_months: int,
+    test_months: int,
+    step_months: int,
+    anchored: bool = False,
+) -> List[Dict]:
+    """
+    Tạo danh sách các fold train/test (khoảng nửa mở [start, end)) trên trục thời gian.
+
+    Args:
+        index (pd.DatetimeIndex): Trục thời gian của dữ liệu.
+        train_months (int): Độ dài cửa sổ train (tháng).
+        test_months (int): Độ dài cửa sổ test (tháng).
+        step_months (int): Bước trượt giữa hai fold liên tiếp (tháng).
+        anchored (bool): True để cố định điểm bắt đầu train (cửa sổ mở rộng dần).
+
+    Returns:
+        list: Mỗi phần tử là dict gồm fold, train_start, train_end, test_start, test_end, partial.
+              partial=True khi dữ liệu kết thúc trước test_end (cửa sổ test chưa đủ); các fold này
+              vẫn được mô phỏng nhưng không được tính vào metrics tổng hợp.
+    """
+    if train_months <= 0 or test_months <= 0 or step_months <= 0:
+        raise ValueError("train_months, test_months và step_months phải lớn hơn 0")
+    if len(index) == 0:
+        return []
+
+    first, last = index[0], index[-1]
+    # Dữ liệu được coi là phủ hết cửa sổ test nếu chỉ thiếu tối đa một khoảng nến
+    # (dùng khoảng trống lớn nhất giữa hai nến để không đánh dấu nhầm cửa sổ kết thúc vào cuối tuần/nghỉ lễ)
+    bar = index.to_series().diff().max() if len(index) > 1 else pd.Timedelta(0)
+    folds: List[Dict] = []
+    offset = 0
+    while True:
+        train_start = first if anchored else first + pd.DateOffset(months=offset)
+        test_start = first + pd.DateOffset(months=offset + train_months)
+        test_end = test_start + pd.DateOffset(months=test_months)
+        if test_start > last:
+            break
+        folds.append(
+            {
+                'fold': len(folds),
+                'train_start': train_start,
+                'train_end': test_start,
+                'test_start': test_start,
+                'test_end': test_end,
+                'partial': bool(test_end > last + bar),
+            }
+        )
+        offset += step_months
+    return folds
+
+
+def _slice_half_open(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    return df[(df.index >= start) & (df.index < end)]
+
+
+def _run_fold(task: Tuple[Dict, pd.DataFrame, pd.DataFrame, float]) -> Dict:
+    """Mô phỏng giao dịch cho phần train (in-sample) và test (out-of-sample) của một fold."""
+    fold, train_df, test_df, fee_bps = task
+    result = dict(fold)
+
+    _, _, train_metrics = simulate_trades(train_df, fee_bps_per_side=fee_bps)
+    _, _, test_metrics = simulate_trades(test_df, fee_bps_per_side=fee_bps)
+
+    result.update({f'is_{k}': v for k, v in train_metrics.items()})
+    result.update({f'oos_{k}': v for k, v in test_metrics.items()})
+    return result
+
+
+def summarize_folds(folds_df: pd.DataFrame, non_overlapping: bool) -> Dict:
+    """Tổng hợp metrics out-of-sample trên các fold có cửa sổ test đầy đủ (bỏ các fold partial)."""
+    num_partial = int(folds_df['partial'].sum()) if 'partial' in folds_df else 0
+    if 'partial' in folds_df:
+        folds_df = folds_df[~folds_df['partial']]
+    if folds_df.empty:
+        return {'num_folds': 0, 'num_partial_folds': num_partial}
+    summary = {
+        'num_folds': int(len(folds_df)),
+        'num_partial_folds': num_partial,
+        'oos_mean_return': float(folds_df['oos_total_return'].mean()),
+        'oos_median_return': float(folds_df['oos_total_return'].median()),
+        'oos_positive_folds': float((folds_df['oos_total_return'] > 0).mean()),
+        'oos_num_trades': int(folds_df['oos_num_trades'].sum()),
+        'is_mean_return': float(folds_df['is_total_return'].mean()),
+    }
+    # Chỉ ghép lợi nhuận kép khi các cửa sổ test không chồng lên nhau
+    if non_overlapping:
+        summary['oos_compounded_return'] = float((1.0 + folds_df['oos_total_return']).prod() - 1.0)
+    return summary
+
+
+def walk_forward_ticker(
+    ticker: str,
+    start: Optional[str],
+    end: Optional[str],
+    fee_bps: float,
+    train_months: int = 24,
+    test_months: int = 3,
+    step_months: int = 1,
+    anchored: bool = False,
+    workers: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Chạy walk-forward cho một mã.
+
+    Returns:
+        tuple: (DataFrame metrics theo từng fold, dict tổng hợp out-of-sample).
+    """
+    sig_df = prepare_signal_frame(ticker, start, end)
+    sim_df = sig_df[SIM_COLUMNS]
+
+    folds = build_folds(sim_df.index, train_months, test_months, step_months, anchored)
+    if not folds:
+        raise RuntimeError(f"Không đủ dữ liệu để tạo fold walk-forward cho {ticker}")
+
+    tasks = [
+        (
+            fold,
+            _slice_half_open(sim_df, fold['train_start'], fold['train_end']),
+            _slice_half_open(sim_df, fold['test_start'], fold['test_end']),
+            fee_bps,
+        )
+        for fold in folds
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) == 1:
+        results = [_run_fold(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_run_fold, tasks))
+
+    folds_df = pd.DataFrame(results)
+    summary = summarize_folds(folds_df, non_overlapping=step_months >= test_months)
+    return folds_df, summary